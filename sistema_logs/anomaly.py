@@ -0,0 +1,327 @@
+"""
+Detecção de comportamento anômalo em logs de acesso (flask anomaly score).
+
+Os logs recentes de cada usuário formam um perfil (histórico de
+ANOMALY_HISTORY_DAYS dias da tabela principal) e cada log novo recebe uma
+pontuação de 0 a 1, média ponderada (ANOMALY_WEIGHTS) de:
+- hour: quão raro é o horário do log no histórico do usuário
+- device: dispositivo que o usuário nunca acessou
+- ip: IP de origem nunca usado pelo usuário
+- failure: falha de um usuário que raramente falha
+
+Logs com pontuação >= ANOMALY_THRESHOLD passam a is_suspicious e geram
+alertas (agrupados por coalesce_alerts, nível ANOMALY_ALERT_LEVEL). Usuários
+com menos de ANOMALY_MIN_HISTORY logs no histórico não são pontuados.
+
+Histórico e logs novos são carregados em arrays NumPy e pontuados sem laço
+por linha. A execução é incremental: o último id pontuado fica em
+ANOMALY_STATE_FILE (pasta instance) e a próxima execução pontua apenas os
+logs posteriores. NumPy é dependência opcional, usada só por este comando.
+"""
+
+import json
+import os
+import time
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Integer, LargeBinary, func, select, type_coerce
+
+try:
+    import numpy as np
+except ImportError:  # Opcional: apenas os comandos deste módulo precisam
+    np = None
+
+from extensions import db
+from models import AccessLog, AlertLevel, get_brasilia_now
+from log_writer import coalesce_alerts
+from rollups import update_rollups
+from data_version import ALERTS, LOGS, bump_versions
+from cache import dashboard_cache
+from metrics import app_metrics
+
+# Componentes da pontuação (ordem das colunas da matriz de características)
+FEATURES = ('hour', 'device', 'ip', 'failure')
+
+# Status contado como falha
+FAILED_STATUS = 'failed'
+
+# Linhas lidas do banco por vez ao montar os arrays
+LOAD_CHUNK_SIZE = 100000
+
+# Máximo de ids por cláusula IN (limite de variáveis do SQLite)
+IN_CHUNK_SIZE = 500
+
+# Comandos de linha de comando: flask anomaly <comando>
+anomaly_cli = AppGroup('anomaly', help='Detecção de comportamento anômalo nos logs.')
+
+
+# ========== PONTO DE PARADA (EXECUÇÃO INCREMENTAL) ==========
+
+def state_path():
+    """Arquivo do último id pontuado (relativo à pasta instance se não for absoluto)"""
+    path = current_app.config.get('ANOMALY_STATE_FILE') or 'anomaly_state.json'
+    return path if os.path.isabs(path) else os.path.join(current_app.instance_path, path)
+
+
+def load_checkpoint():
+    """Último id pontuado, ou None se nunca houve execução"""
+    try:
+        with open(state_path()) as f:
+            return json.load(f).get('last_id')
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(last_id):
+    path = state_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'last_id': int(last_id), 'updated_at': get_brasilia_now().isoformat()}, f)
+    os.replace(path + '.tmp', path)
+
+
+# ========== CARGA EM ARRAYS ==========
+
+def load_events(ip_codes, after_id=None, upto_id=None, since=None):
+    """
+    Logs da tabela principal como arrays NumPy (uma posição por log).
+
+    Args:
+        ip_codes: Dict IP binário -> código inteiro (None -> -1), compartilhado
+                  entre as cargas para que o mesmo IP tenha o mesmo código
+        after_id, upto_id: Intervalo de ids (exclusivo, inclusivo)
+        since: Apenas logs com access_time >= since
+
+    Returns:
+        dict: Arrays id, user, device (0 = nenhum), hour, failed, ip (-1 = nenhum)
+              e suspicious
+    """
+    table = AccessLog.__table__
+    conn = db.session.connection(bind_arguments={'mapper': AccessLog})
+    if conn.dialect.name == 'sqlite':
+        # DateTime é texto 'AAAA-MM-DD HH:MM:SS...': recortar é mais barato que strftime
+        hour = func.cast(func.substr(table.c.access_time, 12, 2), Integer)
+    else:
+        hour = func.extract('hour', table.c.access_time)
+    stmt = select(table.c.id, table.c.user_id, func.coalesce(table.c.device_id, 0), hour,
+                  table.c.status == FAILED_STATUS,
+                  type_coerce(table.c.ip_address, LargeBinary),  # binário, sem converter para texto
+                  func.coalesce(table.c.is_suspicious, False))
+    if after_id is not None:
+        stmt = stmt.where(table.c.id > after_id)
+    if upto_id is not None:
+        stmt = stmt.where(table.c.id <= upto_id)
+    if since is not None:
+        stmt = stmt.where(table.c.access_time >= since.replace(tzinfo=None))
+
+    # Tuplas direto do cursor DBAPI (todas as colunas já são números ou bytes),
+    # sem montar um Row do SQLAlchemy por linha
+    ip_codes.setdefault(None, -1)
+    columns = [[] for _ in range(7)]
+    result = conn.execute(stmt)
+    try:
+        while True:
+            rows = result.cursor.fetchmany(LOAD_CHUNK_SIZE)
+            if not rows:
+                break
+            values = list(zip(*rows))
+            for ip in set(values[5]) - ip_codes.keys():
+                ip_codes[ip] = len(ip_codes) - 1
+            values[5] = map(ip_codes.__getitem__, values[5])
+            for column, column_values in zip(columns, values):
+                column.extend(column_values)
+    finally:
+        result.close()
+    ids, users, devices, hours, failed, ips, suspicious = columns
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'user': np.array(users, dtype=np.int64),
+        'device': np.array(devices, dtype=np.int64),
+        'hour': np.array(hours, dtype=np.int64),
+        'failed': np.array(failed, dtype=bool),
+        'ip': np.array(ips, dtype=np.int64),
+        'suspicious': np.array(suspicious, dtype=bool),
+    }
+
+
+# ========== PONTUAÇÃO ==========
+
+def _sorted_unique(values):
+    """Valores distintos em ordem (ordenação simples; evita o caminho por hash do np.unique)"""
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def _contains(sorted_values, values):
+    """Máscara: quais values estão em sorted_values (busca binária vetorizada)"""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return sorted_values[positions] == values
+
+
+def score_events(history, new, weights, min_history, alpha=1.0):
+    """
+    Pontua logs novos contra o perfil de cada usuário no histórico.
+
+    Args:
+        history, new: Arrays de load_events
+        weights: Peso de cada componente (FEATURES)
+        min_history: Logs mínimos no histórico para pontuar o usuário
+        alpha: Suavização das frequências (horários e falhas nunca vistos)
+
+    Returns:
+        tuple: (pontuações de 0 a 1, matriz de componentes n x len(FEATURES))
+    """
+    all_users = np.concatenate([history['user'], new['user']])
+    users = _sorted_unique(all_users)
+    codes = np.searchsorted(users, all_users)
+    hist_user, new_user = codes[:len(history['user'])], codes[len(history['user']):]
+    n_users = len(users)
+    totals = np.bincount(hist_user, minlength=n_users)
+
+    # Horário: frequência do horário relativa ao horário mais comum do usuário
+    hours = np.bincount(hist_user * 24 + history['hour'], minlength=n_users * 24).reshape(n_users, 24)
+    freq = (hours + alpha) / (totals[:, None] + 24 * alpha)
+    hour_score = 1 - freq[new_user, new['hour']] / freq.max(axis=1)[new_user]
+
+    # Dispositivo e IP nunca vistos para o usuário
+    n_devices = int(max(history['device'].max(initial=0), new['device'].max(initial=0))) + 1
+    seen_devices = _sorted_unique(hist_user * n_devices + history['device'])
+    new_device = (new['device'] > 0) & ~_contains(seen_devices, new_user * n_devices + new['device'])
+    n_ips = int(max(history['ip'].max(initial=-1), new['ip'].max(initial=-1))) + 2
+    seen_ips = _sorted_unique(hist_user * n_ips + history['ip'] + 1)
+    new_ip = (new['ip'] >= 0) & ~_contains(seen_ips, new_user * n_ips + new['ip'] + 1)
+
+    # Falha: tanto mais anômala quanto menor a taxa de falhas do usuário
+    failures = np.bincount(hist_user, weights=history['failed'], minlength=n_users)
+    failure_rate = (failures + alpha) / (totals + 2 * alpha)
+    failure_score = new['failed'] * (1 - failure_rate[new_user])
+
+    features = np.column_stack([hour_score, new_device, new_ip, failure_score]).astype(np.float64)
+    w = np.array([weights.get(name, 0.0) for name in FEATURES], dtype=np.float64)
+    scores = features @ w / w.sum()
+    scores[totals[new_user] < min_history] = 0.0
+    return scores, features
+
+
+def describe(features):
+    """Componentes relevantes de um log (ex: 'horário incomum, IP novo')"""
+    labels = {'hour': 'horário incomum', 'device': 'dispositivo novo',
+              'ip': 'IP novo', 'failure': 'falha incomum'}
+    return ', '.join(labels[name] for name, value in zip(FEATURES, features) if value >= 0.5)
+
+
+# ========== MARCAÇÃO E ALERTAS ==========
+
+def flag_logs(scored):
+    """
+    Marca logs como suspeitos e cria/agrupa alertas, em uma transação.
+    Os rollups são ajustados: cada log sai da contagem não suspeita e entra
+    na suspeita.
+
+    Args:
+        scored: Dict id do log -> (pontuação, descrição)
+
+    Returns:
+        list: Alertas novos criados
+    """
+    ids = sorted(scored)
+    logs = []
+    for i in range(0, len(ids), IN_CHUNK_SIZE):
+        logs.extend(AccessLog.query.filter(AccessLog.id.in_(ids[i:i + IN_CHUNK_SIZE])).all())
+
+    level = AlertLevel(current_app.config.get('ANOMALY_ALERT_LEVEL', 'medium'))
+    try:
+        with db.session.no_autoflush:
+            update_rollups(logs, delta=-1)
+            for log in logs:
+                log.is_suspicious = True
+            update_rollups(logs)
+            new_alerts = coalesce_alerts(logs, level=level)
+        for alert in new_alerts:
+            score, reasons = scored[alert.log.id]
+            alert.title = f'Comportamento anômalo - Usuário: {alert.user_id}'
+            alert.description = f'Pontuação {score:.2f} ({reasons}). Detalhes: {alert.log.details}'
+        if logs:
+            bump_versions(LOGS, ALERTS)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    dashboard_cache.invalidate('recent_logs')
+    dashboard_cache.incr('active_alerts', len(new_alerts))
+    app_metrics.record_logs('anomaly', 0, len(logs), new_alerts)
+    return new_alerts
+
+
+def run_scoring(since_days=1, threshold=None, reset=False, dry_run=False):
+    """
+    Pontua os logs posteriores ao último id pontuado.
+    Na primeira execução (ou com reset), pontua os últimos since_days dias;
+    os logs anteriores formam o histórico.
+
+    Returns:
+        dict: Contagens e tempos da execução, e os logs marcados
+              (id -> (pontuação, descrição))
+    """
+    config = current_app.config
+    threshold = config['ANOMALY_THRESHOLD'] if threshold is None else threshold
+    now = get_brasilia_now().replace(tzinfo=None)
+
+    checkpoint = None if reset else load_checkpoint()
+    if checkpoint is None:
+        checkpoint = (db.session.query(func.max(AccessLog.id))
+                      .filter(AccessLog.access_time < now - timedelta(days=since_days))
+                      .scalar()) or 0
+
+    # Histórico: os ANOMALY_HISTORY_DAYS dias anteriores ao último log pontuado
+    last_scored = db.session.query(AccessLog.access_time).filter(AccessLog.id == checkpoint).scalar()
+    history_since = (last_scored or now) - timedelta(days=config['ANOMALY_HISTORY_DAYS'])
+
+    started = time.perf_counter()
+    ip_codes = {}
+    history = load_events(ip_codes, upto_id=checkpoint, since=history_since)
+    new = load_events(ip_codes, after_id=checkpoint)
+    loaded = time.perf_counter()
+
+    summary = {'history': len(history['id']), 'scored': len(new['id']), 'flagged': {},
+               'alerts': 0, 'load_seconds': loaded - started, 'score_seconds': 0.0}
+    if not len(new['id']):
+        return summary
+
+    scores, features = score_events(history, new, config['ANOMALY_WEIGHTS'],
+                                    config['ANOMALY_MIN_HISTORY'])
+    flagged = np.flatnonzero((scores >= threshold) & ~new['suspicious'])
+    summary['score_seconds'] = time.perf_counter() - loaded
+    summary['flagged'] = {int(new['id'][i]): (float(scores[i]), describe(features[i]))
+                          for i in flagged}
+
+    if not dry_run:
+        if summary['flagged']:
+            summary['alerts'] = len(flag_logs(summary['flagged']))
+        save_checkpoint(new['id'].max())
+    return summary
+
+
+@anomaly_cli.command('score')
+@click.option('--since-days', type=int, default=1,
+              help='Primeira execução: dias recentes pontuados (os anteriores formam o histórico).')
+@click.option('--threshold', type=float, default=None, help='Pontuação mínima para marcar (0 a 1).')
+@click.option('--reset', is_flag=True, help='Ignora o último id pontuado salvo.')
+@click.option('--dry-run', is_flag=True, help='Mostra os logs que seriam marcados, sem gravar.')
+def score_command(since_days, threshold, reset, dry_run):
+    """Pontua logs novos e marca os anômalos como suspeitos."""
+    if np is None:
+        raise click.ClickException('NumPy não está instalado (pip install numpy).')
+    summary = run_scoring(since_days=since_days, threshold=threshold, reset=reset, dry_run=dry_run)
+    click.echo(f"Histórico: {summary['history']:,} logs; pontuados: {summary['scored']:,} "
+               f"(carga {summary['load_seconds']:.2f}s, pontuação {summary['score_seconds']:.2f}s)")
+    for log_id, (score, reasons) in list(summary['flagged'].items())[:50]:
+        click.echo(f'  log {log_id}: {score:.2f} ({reasons})')
+    verb = 'seriam marcados' if dry_run else 'marcados como suspeitos'
+    click.echo(f"✓ {len(summary['flagged'])} log(s) {verb}; {summary['alerts']} alerta(s) novo(s)")
@@ -10,14 +10,27 @@ Responsável por:
 
 from flask import Flask, render_template
 from config import config
-from extensions import db, login_manager, migrate
+from extensions import db, login_manager, migrate, init_sqlite_pragmas, create_tables
 from models import User, UserRole
+from log_writer import log_writer
+from rollups import rollups_cli
+from cache import dashboard_cache, permission_cache
+from throttle import login_throttle
+from archive import archive_cli, archive_scheduler
+from search import search_cli, init_search, highlight
+from stream import live_stream
+from anomaly import anomaly_cli
+from sketches import access_sketches, sketches_cli
+from profiling import request_profiler
+from metrics import app_metrics
 from blueprints.auth import auth_bp
 from blueprints.main import main_bp
 from blueprints.users import users_bp
 from blueprints.devices import devices_bp
 from blueprints.logs import logs_bp
 from blueprints.alerts import alerts_bp
+from blueprints.api import api_bp
+from blueprints.perf import perf_bp
 from werkzeug.security import generate_password_hash
 import pytz
 
@@ -54,6 +67,9 @@ def create_app(config_name='default'):
     
     app.jinja_env.filters['format_brasilia_time'] = format_brasilia_time
     
+    # Filtro para exibir o trecho da busca textual com os termos destacados
+    app.jinja_env.filters['highlight'] = highlight
+    
     # ========== INICIALIZAR EXTENSÕES ==========
     # SQLAlchemy: ORM para banco de dados
     # LoginManager: Gerenciador de autenticação/sessão
@@ -62,6 +78,36 @@ def create_app(config_name='default'):
     login_manager.init_app(app)
     migrate.init_app(app, db)
     
+    # PRAGMAs por engine SQLite (WAL, busy_timeout...), inclusive no bind de logs
+    init_sqlite_pragmas(app)
+    
+    # Gravador de logs de acesso (assíncrono apenas se ACCESS_LOG_ASYNC)
+    log_writer.init_app(app)
+    
+    # Cache dos contadores do dashboard (invalidado nas gravações)
+    dashboard_cache.init_app(app)
+    
+    # Cache de permissões usuário -> dispositivos (invalidado ao alterar permissões)
+    permission_cache.init_app(app)
+    
+    # Limitação de tentativas de login (janela deslizante por usuário/IP)
+    login_throttle.init_app(app)
+    
+    # Arquivamento mensal de logs antigos (thread apenas se ARCHIVE_INTERVAL)
+    archive_scheduler.init_app(app)
+    
+    # Logs e alertas ao vivo (SSE): uma consulta compartilhada por processo
+    live_stream.init_app(app)
+    
+    # Filtros de primeiro acesso por usuário (IP/dispositivo novo gera alerta)
+    access_sketches.init_app(app)
+    
+    # Tempo, templates e SQL por requisição (página /admin/perf)
+    request_profiler.init_app(app)
+    
+    # Métricas Prometheus em /metrics (somadas entre workers, ver metrics.py)
+    app_metrics.init_app(app)
+    
     # ========== CONFIGURAR LOGIN MANAGER ==========
     # Define a rota de login, mensagens de autenticação e carregamento de usuário
     login_manager.login_view = 'auth.login'  # Rota para redirecionar usuários não autenticados
@@ -82,18 +128,36 @@ def create_app(config_name='default'):
     # devices: Gerenciamento de dispositivos
     # logs: Visualização e análise de logs de acesso
     # alerts: Gerenciamento de alertas de segurança
+    # perf: Tempos por endpoint e comandos SQL lentos (admin only)
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(users_bp, url_prefix='/admin')  # Rotas prefixadas com /admin
     app.register_blueprint(devices_bp)
     app.register_blueprint(logs_bp)
     app.register_blueprint(alerts_bp)
+    app.register_blueprint(api_bp, url_prefix='/api/v1')  # API JSON versionada
+    app.register_blueprint(perf_bp, url_prefix='/admin')  # Desempenho (admin only)
+    
+    # ========== REGISTRAR COMANDOS CLI ==========
+    # flask rollups rebuild|check: manutenção das contagens horárias de logs
+    # flask archive run|list: arquivamento mensal de logs antigos
+    # flask search rebuild: reconstrução dos índices de busca textual
+    # flask anomaly score: pontuação de comportamento anômalo (requer NumPy)
+    # flask sketches rebuild: recriação dos filtros de primeiro acesso
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(anomaly_cli)
+    app.cli.add_command(sketches_cli)
     
     # ========== CRIAR BANCO DE DADOS E USUÁRIO ADMIN ==========
     # Executa dentro do contexto da aplicação para acessar o banco
     with app.app_context():
-        # Cria todas as tabelas definidas em models.py
-        db.create_all()
+        # Cria todas as tabelas definidas em models.py (cada uma no seu bind)
+        create_tables()
+    
+    # Índices de busca textual (FTS5) e triggers que os mantêm
+    init_search(app)
     
     # ========== TRATADORES DE ERRO ==========
     # Retorna páginas customizadas para erros HTTP
@@ -0,0 +1,382 @@
+"""
+Arquivamento de logs de acesso por mês.
+
+Logs mais antigos que ARCHIVE_RETENTION_DAYS saem da tabela principal
+(access_log) e vão para um arquivo SQLite por mês em ARCHIVE_DIR
+(access_log_AAAA_MM.db), removidos em blocos de ARCHIVE_CHUNK_SIZE linhas.
+Os arquivos continuam consultáveis: são anexados (ATTACH) à conexão quando
+uma consulta de logs ou exportação alcança o período arquivado. Cada arquivo
+tem apenas a tabela, os índices de consulta por tempo e o índice de busca
+textual (ver search.py), e é compactado (VACUUM) após receber linhas.
+Os arquivos guardam ação, status, user agent e IP como texto (não dependem
+das tabelas de valores do banco de logs, ver interning.py).
+
+Responsável por:
+- Listar as fontes de logs de um intervalo (tabela principal + meses)
+- Mover logs antigos para os arquivos mensais (flask archive run)
+- Listar os arquivos existentes (flask archive list)
+- Executar o arquivamento periodicamente (ArchiveScheduler)
+"""
+
+import glob
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Column, MetaData, Table, inspect, select
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import AccessLog, get_brasilia_now
+from rollups import update_rollups
+from data_version import LOGS, bump_versions
+from search import ensure_fts_index
+
+# Nome dos arquivos mensais e do schema usado no ATTACH
+ARCHIVE_FILE_PATTERN = re.compile(r'access_log_(\d{4})_(\d{2})\.db$')
+
+# Máximo de ids por cláusula IN (limite de variáveis do SQLite)
+IN_CHUNK_SIZE = 500
+
+# Comandos de linha de comando: flask archive <comando>
+archive_cli = AppGroup('archive', help='Arquivamento mensal de logs de acesso.')
+
+
+# ========== FONTES DE LOGS (TABELA PRINCIPAL + ARQUIVOS) ==========
+
+def _archive_columns():
+    """
+    Colunas de access_log sem chaves estrangeiras (o arquivo não tem
+    user/device) e com o tipo texto no lugar das colunas codificadas
+    """
+    return [Column(c.name, getattr(c.type, 'value_type', c.type), primary_key=c.primary_key)
+            for c in AccessLog.__table__.columns]
+
+
+class LogSource:
+    """
+    Uma fonte de logs: a tabela principal ou um arquivo mensal.
+    entity é usada no lugar de AccessLog para montar as consultas; start/end
+    delimitam o período do mês (None para a tabela principal).
+    """
+
+    _entities = {}  # schema -> entidade mapeada (reaproveitada entre requisições)
+
+    def __init__(self, entity=AccessLog, start=None, end=None, path=None, schema=None):
+        self.entity = entity
+        self.start = start
+        self.end = end
+        self.path = path
+        self.schema = schema
+
+    @classmethod
+    def for_month(cls, year, month, path):
+        """Fonte de um arquivo mensal (entidade sobre <schema>.access_log)"""
+        schema = f'arch_{year:04d}_{month:02d}'
+        entity = cls._entities.get(schema)
+        if entity is None:
+            table = Table('access_log', MetaData(), *_archive_columns(), schema=schema)
+            entity = aliased(AccessLog, table, adapt_on_names=True)
+            cls._entities[schema] = entity
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        return cls(entity, start, end, path, schema)
+
+    @property
+    def table(self):
+        """Tabela consultada pela entidade (access_log principal ou do arquivo)"""
+        return inspect(self.entity).selectable
+
+    def attach(self):
+        """Anexa o arquivo à conexão da sessão atual (sem efeito na tabela principal)"""
+        if self.schema:
+            attach_archive(self.path, self.schema)
+
+
+def archive_dir():
+    """Pasta dos arquivos mensais (relativa à pasta instance se não for absoluta)"""
+    path = current_app.config.get('ARCHIVE_DIR') or 'archive'
+    return path if os.path.isabs(path) else os.path.join(current_app.instance_path, path)
+
+
+def archive_months():
+    """Arquivos mensais existentes, do mais recente para o mais antigo"""
+    months = []
+    for path in glob.glob(os.path.join(archive_dir(), 'access_log_*.db')):
+        match = ARCHIVE_FILE_PATTERN.search(path)
+        if match:
+            months.append(LogSource.for_month(int(match.group(1)), int(match.group(2)), path))
+    return sorted(months, key=lambda source: source.start, reverse=True)
+
+
+def log_sources(date_from=None, date_to=None):
+    """
+    Fontes que podem conter logs do intervalo, em ordem decrescente de tempo:
+    a tabela principal primeiro e depois os meses arquivados que cruzam o
+    intervalo (todos os logs arquivados são mais antigos que os da tabela).
+
+    Args:
+        date_from: Início do intervalo (inclusive) ou None
+        date_to: Fim do intervalo ou None
+    """
+    sources = [LogSource()]
+    if logs_engine().dialect.name != 'sqlite':
+        return sources
+    for source in archive_months():
+        if date_from is not None and source.end <= date_from:
+            continue
+        if date_to is not None and source.start > date_to:
+            continue
+        sources.append(source)
+    return sources
+
+
+def logs_engine():
+    """Engine do banco de logs (bind de logs ou o banco principal)"""
+    return db.session.get_bind(AccessLog)
+
+
+def attach_archive(path, schema):
+    """
+    Executa ATTACH do arquivo na conexão da sessão com o banco de logs, se
+    ainda não estiver.
+    Quando o limite de bancos anexados do SQLite é atingido, os arquivos
+    anexados anteriormente são desanexados.
+    """
+    conn = db.session.connection(bind_arguments={'mapper': AccessLog})
+    attached = {row[1] for row in conn.exec_driver_sql('PRAGMA database_list')}
+    if schema in attached:
+        return
+    try:
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (path,))
+    except Exception as exc:
+        if 'too many attached' not in str(exc):
+            raise
+        detach_archives()
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (path,))
+
+
+def detach_archives():
+    """Desanexa da conexão da sessão todos os arquivos mensais"""
+    conn = db.session.connection(bind_arguments={'mapper': AccessLog})
+    for row in conn.exec_driver_sql('PRAGMA database_list').fetchall():
+        if row[1].startswith('arch_'):
+            conn.exec_driver_sql(f'DETACH DATABASE {row[1]}')
+
+
+# ========== ARQUIVAMENTO ==========
+
+def _ensure_archive_file(path):
+    """Cria o arquivo mensal com a tabela e índices de consulta, se não existir"""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ddl = ', '.join(f'{c.name} {c.type.compile(dialect=logs_engine().dialect)}'
+                    + (' PRIMARY KEY' if c.primary_key else '') for c in _archive_columns())
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f'CREATE TABLE access_log ({ddl})')
+        conn.execute('CREATE INDEX ix_access_log_time_id ON access_log (access_time, id)')
+        conn.execute('CREATE INDEX ix_access_log_user_time ON access_log (user_id, access_time)')
+        conn.execute('CREATE INDEX ix_access_log_device_time ON access_log (device_id, access_time)')
+        ensure_fts_index(conn, 'access_log_fts', lookups=False)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _compact_archive_file(path):
+    """Recompacta o arquivo mensal (VACUUM) depois de receber novas linhas"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    """Divide uma lista em blocos de até size itens"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _copy_to_archive(archive_table, rows):
+    """
+    Insere as linhas no arquivo mensal e devolve os ids que podem sair da
+    tabela principal.
+    Um id que já existe no arquivo com o mesmo horário e usuário é uma cópia
+    de uma execução interrompida (o commit não é atômico entre o banco de
+    logs e os arquivos anexados): não é inserido de novo, apenas removido da
+    tabela principal. Qualquer outro id repetido é um conflito e interrompe o
+    arquivamento sem remover nada (o INSERT falha pela chave primária).
+
+    Returns:
+        set: Ids copiados (ou já presentes) no arquivo
+    """
+    by_id = {row['id']: row for row in rows}
+    if not by_id:
+        return set()
+    existing = db.session.execute(
+        select(archive_table.c.id, archive_table.c.access_time, archive_table.c.user_id)
+        .where(archive_table.c.id.in_(list(by_id))),
+        bind_arguments={'mapper': AccessLog}).all()
+    already_copied = {row.id for row in existing
+                      if (row.access_time, row.user_id) == (by_id[row.id]['access_time'],
+                                                            by_id[row.id]['user_id'])}
+    pending = [dict(row) for log_id, row in by_id.items() if log_id not in already_copied]
+    if pending:
+        db.session.execute(archive_table.insert(), pending,
+                           bind_arguments={'mapper': AccessLog})
+    return set(by_id)
+
+
+def archive_old_logs(retention_days=None, chunk_size=None, now=None):
+    """
+    Move para os arquivos mensais os logs mais antigos que a retenção.
+    Cada bloco é copiado, removido da tabela principal e descontado dos
+    rollups horários na mesma transação: rollups, /logs/stats e flask rollups
+    check/rebuild cobrem apenas a tabela principal (logs arquivados não
+    entram nas contagens). As linhas passam pelo Python para que ação,
+    status, user agent e IP cheguem ao arquivo como texto.
+
+    Args:
+        retention_days: Dias mantidos na tabela principal (padrão: config)
+        chunk_size: Linhas movidas por transação (padrão: config)
+        now: Referência de tempo (padrão: agora)
+
+    Returns:
+        dict: Linhas arquivadas por mês ('AAAA-MM' -> quantidade)
+    """
+    if logs_engine().dialect.name != 'sqlite':
+        raise RuntimeError('Arquivamento disponível apenas para SQLite')
+    retention_days = retention_days or current_app.config['ARCHIVE_RETENTION_DAYS']
+    chunk_size = chunk_size or current_app.config['ARCHIVE_CHUNK_SIZE']
+    cutoff = (now or get_brasilia_now()).replace(tzinfo=None) - timedelta(days=retention_days)
+    moved = {}
+
+    while True:
+        rows = (db.session.query(AccessLog.id, AccessLog.access_time)
+                .filter(AccessLog.access_time < cutoff)
+                .order_by(AccessLog.access_time, AccessLog.id)
+                .limit(chunk_size).all())
+        db.session.commit()
+        if not rows:
+            break
+
+        # Agrupar o bloco por mês e anexar os arquivos antes de abrir a transação
+        by_month = {}
+        for row in rows:
+            by_month.setdefault((row.access_time.year, row.access_time.month), []).append(row.id)
+        detach_archives()
+        sources = {}
+        for (year, month) in by_month:
+            path = os.path.join(archive_dir(), f'access_log_{year:04d}_{month:02d}.db')
+            _ensure_archive_file(path)
+            sources[(year, month)] = source = LogSource.for_month(year, month, path)
+            source.attach()
+
+        try:
+            main = AccessLog.__table__
+            for (year, month), ids in by_month.items():
+                archive_table = sources[(year, month)].table
+                for chunk in _chunks(ids):
+                    # Leitura pela tabela mapeada: tipos decodificam ids e IPs
+                    chunk_rows = db.session.execute(
+                        select(main).where(main.c.id.in_(chunk)),
+                        bind_arguments={'mapper': AccessLog}).mappings().all()
+                    copied = _copy_to_archive(archive_table, chunk_rows)
+                    db.session.execute(main.delete().where(main.c.id.in_(copied)),
+                                       bind_arguments={'mapper': AccessLog})
+                    update_rollups([SimpleNamespace(**row) for row in chunk_rows
+                                    if row['id'] in copied], delta=-1)
+                    key = f'{year:04d}-{month:02d}'
+                    moved[key] = moved.get(key, 0) + len(copied)
+            bump_versions(LOGS)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # Desanexar antes de compactar (VACUUM precisa do arquivo livre)
+    detach_archives()
+    db.session.commit()
+    for month in moved:
+        year, month = month.split('-')
+        _compact_archive_file(os.path.join(archive_dir(), f'access_log_{year}_{month}.db'))
+    return moved
+
+
+# ========== AGENDAMENTO ==========
+
+class ArchiveScheduler:
+    """
+    Executa archive_old_logs periodicamente em uma thread de fundo.
+    Ativado em create_app quando ARCHIVE_INTERVAL (segundos) está definido;
+    em implantações com vários workers, prefira agendar flask archive run
+    (cron/systemd timer) em um único lugar.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_run = None
+        self.last_result = None
+
+    def init_app(self, app):
+        interval = app.config.get('ARCHIVE_INTERVAL')
+        app.extensions['archive_scheduler'] = self
+        if interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app, interval),
+                                            name='access-log-archiver', daemon=True)
+            self._thread.start()
+
+    def _run(self, app, interval):
+        while not self._stop.wait(interval):
+            with app.app_context():
+                try:
+                    self.last_result = archive_old_logs()
+                    self.last_run = get_brasilia_now()
+                except Exception:
+                    app.logger.exception('Falha no arquivamento de logs')
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        self._stop.set()
+
+
+# Instância única (inicializada em create_app)
+archive_scheduler = ArchiveScheduler()
+
+
+# ========== COMANDOS CLI ==========
+
+@archive_cli.command('run')
+@click.option('--days', type=int, default=None, help='Dias mantidos na tabela principal.')
+@click.option('--chunk-size', type=int, default=None, help='Linhas movidas por transação.')
+def run_command(days, chunk_size):
+    """Move logs antigos para os arquivos mensais."""
+    moved = archive_old_logs(retention_days=days, chunk_size=chunk_size)
+    if not moved:
+        click.echo('Nenhum log a arquivar.')
+    for month, count in sorted(moved.items()):
+        click.echo(f'✓ {month}: {count} logs arquivados')
+
+
+@archive_cli.command('list')
+def list_command():
+    """Lista os arquivos mensais e a quantidade de logs de cada um."""
+    for source in archive_months():
+        conn = sqlite3.connect(source.path)
+        try:
+            count = conn.execute('SELECT COUNT(*) FROM access_log').fetchone()[0]
+        finally:
+            conn.close()
+        size = os.path.getsize(source.path) / (1024 * 1024)
+        click.echo(f'{source.start:%Y-%m}  {count:>10} logs  {size:8.1f} MB  {source.path}')
@@ -0,0 +1,15 @@
+"""
+Pacote de benchmarks do Sistema de Logs.
+Scripts executados manualmente (fora da aplicação) para medir consultas e rotas
+em bases de dados sintéticas grandes.
+
+Módulos:
+- indexes: consultas das rotas com e sem os índices (SQLite puro)
+- dataset: geração de bases sintéticas pela própria aplicação
+- routes: latência, vazão e comandos SQL de cada rota (saída em JSON)
+
+Uso:
+    python -m benchmarks.indexes --rows 5000000
+    python -m benchmarks.dataset --db /tmp/bench.db --logs 2000000
+    python -m benchmarks.routes --db /tmp/bench.db --workers 8 --json run.json
+"""
@@ -0,0 +1,269 @@
+"""
+Gerador de bases sintéticas para benchmarks das rotas.
+
+Cria, pela própria aplicação (create_app, mesmos modelos, binds e tabelas de
+valores), uma base com usuários, dispositivos, permissões, logs de acesso e
+alertas. As linhas são gravadas com INSERT em lote (executemany, sem objetos
+ORM) e com ids explícitos, de modo que logs e alertas já saem vinculados.
+Os índices de busca textual são desligados durante a carga e reconstruídos
+no fim; rollups horários e filtros de primeiro acesso também são recriados,
+deixando a base igual à de uma instalação real.
+
+Todos os usuários têm a senha BENCH_PASSWORD; o usuário 1 é o admin.
+
+Uso (a partir da pasta sistema_logs):
+    python -m benchmarks.dataset --db /tmp/bench.db --logs 2000000
+    python -m benchmarks.dataset --db /tmp/bench.db --logs-db /tmp/bench_logs.db
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+# Senha de todos os usuários gerados
+BENCH_PASSWORD = 'bench'
+
+# Ações geradas: (ação, status, suspeito, peso)
+ACTIONS = [('system_login', 'success', False, 0.40), ('system_logout', 'success', False, 0.25),
+           ('device_access', 'success', False, 0.30), ('failed_login', 'failed', True, 0.04),
+           ('unauthorized_access_attempt', 'failed', True, 0.01)]
+
+USER_AGENTS = ['Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0',
+               'Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/121.0',
+               'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_2) AppleWebKit/605.1.15 Safari/605.1.15',
+               'curl/8.5.0']
+
+DETAILS = {
+    'system_login': 'Login realizado com sucesso',
+    'system_logout': 'Logout realizado',
+    'device_access': 'Acesso autorizado ao dispositivo device{device_id}',
+    'failed_login': 'Tentativa de login com senha incorreta',
+    'unauthorized_access_attempt': 'Tentativa de acesso não autorizada ao dispositivo device{device_id}',
+}
+
+# Horas com mais acessos (horário comercial)
+BUSY_HOURS = [8, 9, 10, 11, 13, 14, 15, 16, 17]
+
+
+def benchmark_app(db_path, logs_db_path=None):
+    """
+    Aplicação ligada a uma base de benchmark (tabelas criadas se faltarem).
+
+    Args:
+        db_path: Arquivo SQLite do banco principal
+        logs_db_path: Arquivo SQLite do bind de logs (None = mesmo banco)
+    """
+    from config import Config, config
+
+    class BenchmarkConfig(Config):
+        """Produção em SQLite local, sem cookie seguro (cliente de teste usa HTTP)"""
+        DEBUG = False
+        TESTING = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(db_path)
+        SQLALCHEMY_BINDS = {'logs': 'sqlite:///' + os.path.abspath(logs_db_path)} if logs_db_path else {}
+
+    config['benchmark'] = BenchmarkConfig
+    from app import create_app
+    return create_app('benchmark')
+
+
+def _drop_search_indexes():
+    """Remove índices FTS e triggers (recriados e preenchidos por init_search no fim da carga)"""
+    from extensions import db
+    from models import AccessLog
+    from search import FTS_INDEXES, fts_available
+
+    if not fts_available():
+        return
+    with db.session.get_bind(AccessLog).begin() as conn:
+        for index_name in FTS_INDEXES:
+            for suffix in ('ai', 'ad', 'au'):
+                conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {index_name}_{suffix}')
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS {index_name}')
+            conn.exec_driver_sql(f'DROP VIEW IF EXISTS {index_name}_content')
+
+
+def _insert(model, rows, chunk_size):
+    """INSERT em lote pelo Core (no bind do modelo), um commit por bloco"""
+    from extensions import db
+
+    for i in range(0, len(rows), chunk_size):
+        db.session.execute(model.__table__.insert(), rows[i:i + chunk_size],
+                           bind_arguments={'mapper': model})
+        db.session.commit()
+
+
+def generate(app, users=2000, devices=500, logs=1_000_000, permissions_per_user=5,
+             days=365, chunk_size=50000, seed=42, echo=print):
+    """
+    Popula uma base vazia com dados sintéticos.
+
+    Args:
+        app: Aplicação (ver benchmark_app)
+        users: Usuários comuns (além do admin)
+        devices: Dispositivos
+        logs: Logs de acesso (suspeitos geram um alerta cada, 1/3 ainda pendentes)
+        permissions_per_user: Dispositivos liberados por usuário
+        days: Período coberto pelos logs (até agora)
+        chunk_size: Linhas por INSERT/commit
+        seed: Semente (bases iguais para os mesmos parâmetros)
+        echo: Função de progresso
+
+    Returns:
+        dict: Quantidade de linhas por tabela
+    """
+    from extensions import db
+    from models import (AccessLog, Alert, AlertLevel, Device, DeviceType, User,
+                        UserPermission, UserRole, get_brasilia_now)
+    from interning import string_interner
+    from ip_ranges import pack_ip
+    from rollups import rebuild_rollups
+    from search import init_search
+    from sketches import rebuild_sketches
+
+    rnd = random.Random(seed)
+    with app.app_context():
+        if db.session.query(User.id).first() is not None:
+            raise SystemExit('A base já tem dados; use um arquivo novo')
+        _drop_search_indexes()
+
+        # Usuários, dispositivos e permissões (hash da senha calculado uma vez)
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        now = get_brasilia_now().replace(tzinfo=None)
+        _insert(User, [{'id': 1, 'username': 'admin', 'email': 'admin@bench', 'password_hash': password_hash,
+                        'role': UserRole.ADMIN, 'created_at': now, 'is_active': True}] +
+                [{'id': i, 'username': f'user{i}', 'email': f'user{i}@bench', 'password_hash': password_hash,
+                  'role': UserRole.USER, 'created_at': now, 'is_active': True}
+                 for i in range(2, users + 2)], chunk_size)
+        device_types = list(DeviceType)
+        device_rows = []
+        for i in range(1, devices + 1):
+            ip_address = f'10.{i // 65536}.{i // 256 % 256}.{i % 256}'
+            device_rows.append({'id': i, 'name': f'device{i}', 'ip_address': ip_address,
+                                'ip_packed': pack_ip(ip_address), 'device_type': device_types[i % len(device_types)],
+                                'location': f'Sala {i % 40}', 'created_at': now, 'is_active': True})
+        _insert(Device, device_rows, chunk_size)
+        allowed = {user_id: rnd.sample(range(1, devices + 1), min(permissions_per_user, devices))
+                   for user_id in range(2, users + 2)}
+        _insert(UserPermission, [{'user_id': user_id, 'device_id': device_id, 'granted_at': now,
+                                  'granted_by': 1, 'can_read': True}
+                                 for user_id, device_ids in allowed.items() for device_id in device_ids],
+                chunk_size)
+        echo(f'  {users + 1} usuários, {devices} dispositivos, {users * permissions_per_user} permissões')
+
+        # Valores de ação, status e user agent cadastrados antes (logs gravam os ids)
+        lookups = {'log_action': [a[0] for a in ACTIONS], 'log_status': ['success', 'failed'],
+                   'log_user_agent': USER_AGENTS}
+        for table_name, values in lookups.items():
+            string_interner.intern(table_name, values)
+        db.session.commit()
+        action_ids = {value: string_interner.id_for('log_action', value) for value in lookups['log_action']}
+        status_ids = {value: string_interner.id_for('log_status', value) for value in lookups['log_status']}
+        agent_ids = [string_interner.id_for('log_user_agent', value) for value in USER_AGENTS]
+
+        # Cada usuário usa poucos IPs (o que torna IPs novos raros, como na prática)
+        user_ips = {user_id: [pack_ip(f'192.168.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}')
+                              for _ in range(rnd.randint(1, 3))] for user_id in range(1, users + 2)}
+        outside_ips = [pack_ip(f'203.0.113.{i}') for i in range(1, 255)]
+        weights = [a[3] for a in ACTIONS]
+        start = now - timedelta(days=days)
+        step = days * 86400 / max(logs, 1)
+
+        log_rows, alert_rows = [], []
+        alert_id = 0
+        t0 = time.perf_counter()
+        for log_id in range(1, logs + 1):
+            action, status, suspicious, _ = rnd.choices(ACTIONS, weights)[0]
+            user_id = rnd.randint(2, users + 1) if rnd.random() > 0.01 else 1
+            device_id = None
+            if action == 'device_access':
+                device_id = rnd.choice(allowed.get(user_id) or [1])
+            elif action == 'unauthorized_access_attempt':
+                device_id = rnd.randint(1, devices)
+            when = start + timedelta(seconds=log_id * step)
+            when = when.replace(hour=rnd.choice(BUSY_HOURS)) if rnd.random() < 0.8 and when < now - timedelta(days=1) else when
+            details = DETAILS[action].format(device_id=device_id)
+            row = {'id': log_id, 'user_id': user_id, 'device_id': device_id, 'access_time': when,
+                   'action': action_ids[action], 'status': status_ids[status],
+                   'ip_address': rnd.choice(outside_ips if suspicious else user_ips[user_id]),
+                   'user_agent': rnd.choice(agent_ids), 'details': details,
+                   'is_suspicious': suspicious, 'alert_id': None}
+            if suspicious:
+                alert_id += 1
+                row['alert_id'] = alert_id
+                alert_rows.append({'id': alert_id, 'title': f'Acesso suspeito detectado - Usuário: {user_id}',
+                                   'description': f'Tentativa de acesso suspeito. Detalhes: {details}',
+                                   'alert_level': AlertLevel.HIGH, 'created_at': when,
+                                   'is_resolved': alert_id % 3 != 0,
+                                   'resolved_at': when + timedelta(hours=1) if alert_id % 3 else None,
+                                   'user_id': user_id, 'device_id': device_id, 'action': action,
+                                   'occurrence_count': 1, 'first_seen': when, 'last_seen': when,
+                                   'log_id': log_id})
+            log_rows.append(row)
+            if len(log_rows) >= chunk_size:
+                # Alertas antes dos logs do bloco (access_log.alert_id referencia alert)
+                _insert(Alert, alert_rows, chunk_size)
+                _insert(AccessLog, log_rows, chunk_size)
+                log_rows, alert_rows = [], []
+                echo(f'  {log_id:,} logs ({log_id / (time.perf_counter() - t0):,.0f}/s)')
+        _insert(Alert, alert_rows, chunk_size)
+        _insert(AccessLog, log_rows, chunk_size)
+        echo(f'  {logs:,} logs e {alert_id:,} alertas')
+
+        # Estruturas derivadas dos logs
+        t0 = time.perf_counter()
+        rebuild_rollups()
+        echo(f'  rollups recriados em {time.perf_counter() - t0:.1f}s')
+        t0 = time.perf_counter()
+        init_search(app)
+        echo(f'  índices de busca recriados em {time.perf_counter() - t0:.1f}s')
+        t0 = time.perf_counter()
+        rebuild_sketches()
+        echo(f'  filtros de primeiro acesso recriados em {time.perf_counter() - t0:.1f}s')
+
+        return {'users': users + 1, 'devices': devices, 'permissions': users * permissions_per_user,
+                'access_logs': logs, 'alerts': alert_id}
+
+
+def add_arguments(parser):
+    """Opções de tamanho da base (compartilhadas com benchmarks.routes)"""
+    parser.add_argument('--db', help='Arquivo SQLite do banco principal (padrão: arquivo temporário)')
+    parser.add_argument('--logs-db', help='Arquivo SQLite separado para logs (bind LOGS_DATABASE_URL)')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--devices', type=int, default=500)
+    parser.add_argument('--logs', type=int, default=1_000_000, help='Quantidade de AccessLog')
+    parser.add_argument('--permissions-per-user', type=int, default=5)
+    parser.add_argument('--days', type=int, default=365, help='Período coberto pelos logs')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera uma base sintética para benchmarks')
+    add_arguments(parser)
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Linhas por INSERT/commit')
+    args = parser.parse_args()
+
+    if args.db is None:
+        import tempfile
+        args.db = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    for path in (args.db, args.logs_db):
+        if path and os.path.exists(path):
+            raise SystemExit(f'{path} já existe; escolha um arquivo novo')
+
+    print(f'Gerando base em {args.db} ...')
+    t0 = time.perf_counter()
+    app = benchmark_app(args.db, args.logs_db)
+    counts = generate(app, args.users, args.devices, args.logs, args.permissions_per_user,
+                      args.days, args.chunk_size, args.seed)
+    print(f'Base gerada em {time.perf_counter() - t0:.1f}s: {counts}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark dos índices de AccessLog, Alert e UserPermission.
+
+Gera uma base SQLite sintética (5 milhões de logs por padrão), executa as
+consultas usadas pelas rotas sem os índices e depois com eles, e mostra para
+cada consulta o plano (EXPLAIN QUERY PLAN) e o tempo mediano.
+
+Uso (a partir da pasta sistema_logs):
+    python -m benchmarks.indexes
+    python -m benchmarks.indexes --rows 500000 --repeat 3 --db /tmp/bench.db
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateIndex
+from extensions import db
+import models  # noqa: F401  (registra as tabelas no metadata)
+
+
+# Formato usado pelo SQLAlchemy para gravar DateTime no SQLite
+TIME_FMT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Consultas equivalentes às geradas pelas rotas (parâmetros preenchidos em run)
+QUERIES = {
+    'logs: página inicial (admin)':
+        'SELECT * FROM access_log ORDER BY access_time DESC, id DESC LIMIT 51',
+    'logs: filtro por usuário':
+        'SELECT * FROM access_log WHERE user_id = :user_id '
+        'ORDER BY access_time DESC, id DESC LIMIT 51',
+    'logs: dispositivo + intervalo de datas':
+        'SELECT * FROM access_log WHERE device_id = :device_id '
+        'AND access_time >= :date_from AND access_time <= :date_to '
+        'ORDER BY access_time DESC, id DESC LIMIT 51',
+    'logs: apenas suspeitos':
+        'SELECT * FROM access_log WHERE is_suspicious = 1 '
+        'ORDER BY access_time DESC, id DESC LIMIT 51',
+    'stats: suspeitos':
+        'SELECT COUNT(*) FROM access_log WHERE is_suspicious = 1',
+    'stats: logins falhados':
+        'SELECT COUNT(*) FROM access_log WHERE action = :failed_login AND status = :failed',
+    'stats: últimas 24h':
+        'SELECT COUNT(*) FROM access_log WHERE access_time >= :last_24h',
+    'alerts: pendentes':
+        'SELECT * FROM alert WHERE is_resolved = 0 ORDER BY created_at DESC',
+    'devices: has_permission':
+        'SELECT * FROM user_permission WHERE user_id = :user_id AND device_id = :device_id LIMIT 1',
+}
+
+# Índices avaliados (definidos em models.py)
+INDEXED_TABLES = ('access_log', 'alert', 'user_permission')
+
+ACTIONS = [('system_login', 'success', 0.40), ('system_logout', 'success', 0.25),
+           ('device_access', 'success', 0.30), ('failed_login', 'failed', 0.04),
+           ('unauthorized_access_attempt', 'failed', 0.01)]
+
+# Ids nas tabelas de valores (access_log guarda ação/status/user agent como id)
+ACTION_IDS = {action: i for i, (action, _, _) in enumerate(ACTIONS, start=1)}
+STATUS_IDS = {'success': 1, 'failed': 2}
+USER_AGENT_ID = 1
+
+
+def generate(path, rows, users, devices, seed=42):
+    """Cria o schema (sem índices) e popula a base sintética em lotes"""
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    drop_indexes(engine)
+    engine.dispose()
+
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+
+    conn.executemany(
+        "INSERT INTO user (id, username, email, password_hash, role, is_active) "
+        "VALUES (?, ?, ?, 'x', 'USER', 1)",
+        ((i, f'user{i}', f'user{i}@bench') for i in range(1, users + 1)))
+    conn.executemany(
+        "INSERT INTO device (id, name, ip_address, device_type, is_active) "
+        "VALUES (?, ?, ?, 'SERVER', 1)",
+        ((i, f'device{i}', f'10.0.{i // 256}.{i % 256}') for i in range(1, devices + 1)))
+    conn.executemany(
+        'INSERT INTO user_permission (user_id, device_id, can_read) VALUES (?, ?, 1)',
+        {(rnd.randint(1, users), rnd.randint(1, devices)) for _ in range(users * 5)})
+
+    conn.executemany('INSERT INTO log_action (id, value) VALUES (?, ?)',
+                     [(i, action) for action, i in ACTION_IDS.items()])
+    conn.executemany('INSERT INTO log_status (id, value) VALUES (?, ?)',
+                     [(i, status) for status, i in STATUS_IDS.items()])
+    conn.execute('INSERT INTO log_user_agent (id, value) VALUES (?, ?)', (USER_AGENT_ID, 'Mozilla/5.0'))
+
+    weights = [a[2] for a in ACTIONS]
+    start = datetime.now() - timedelta(days=365)
+    step = 365 * 24 * 3600 / max(rows, 1)
+    batch = []
+    for i in range(rows):
+        action, status, _ = rnd.choices(ACTIONS, weights)[0]
+        suspicious = status == 'failed'
+        device_id = rnd.randint(1, devices) if 'device' in action or 'unauthorized' in action else None
+        when = (start + timedelta(seconds=i * step)).strftime(TIME_FMT)
+        ip = ipaddress.ip_address(f'192.168.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}')
+        batch.append((rnd.randint(1, users), device_id, when, ACTION_IDS[action],
+                      STATUS_IDS[status], ip.packed, USER_AGENT_ID, '', suspicious))
+        if len(batch) >= 100000:
+            insert_logs(conn, batch)
+            batch = []
+    if batch:
+        insert_logs(conn, batch)
+
+    conn.execute(
+        "INSERT INTO alert (title, description, alert_level, created_at, is_resolved, log_id) "
+        "SELECT 'Acesso suspeito', details, 'HIGH', access_time, (id % 3 = 0), id "
+        "FROM access_log WHERE is_suspicious = 1")
+    conn.commit()
+    conn.close()
+
+
+def insert_logs(conn, batch):
+    """Insere um lote de logs em uma única transação"""
+    conn.executemany(
+        'INSERT INTO access_log (user_id, device_id, access_time, action, status, '
+        'ip_address, user_agent, details, is_suspicious) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        batch)
+    conn.commit()
+
+
+def drop_indexes(engine):
+    """Remove os índices declarados nos modelos (estado "antes")"""
+    with engine.begin() as conn:
+        for table in INDEXED_TABLES:
+            for index in db.metadata.tables[table].indexes:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS {index.name}')
+
+
+def create_indexes(engine):
+    """Cria os índices declarados nos modelos (estado "depois")"""
+    with engine.begin() as conn:
+        for table in INDEXED_TABLES:
+            for index in db.metadata.tables[table].indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        conn.exec_driver_sql('ANALYZE')
+
+
+def run(path, repeat, users, devices):
+    """Executa todas as consultas e retorna {nome: (plano, tempo_mediano_ms)}"""
+    params = {
+        'user_id': users // 2,
+        'device_id': devices // 2,
+        'date_from': (datetime.now() - timedelta(days=30)).strftime(TIME_FMT),
+        'date_to': datetime.now().strftime(TIME_FMT),
+        'last_24h': (datetime.now() - timedelta(hours=24)).strftime(TIME_FMT),
+        'failed_login': ACTION_IDS['failed_login'],
+        'failed': STATUS_IDS['failed'],
+    }
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, sql in QUERIES.items():
+        plan = ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        results[name] = (plan, statistics.median(timings))
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de índices do Sistema de Logs')
+    parser.add_argument('--rows', type=int, default=5_000_000, help='Quantidade de AccessLog')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--devices', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5, help='Execuções por consulta')
+    parser.add_argument('--db', help='Arquivo SQLite (padrão: arquivo temporário)')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')
+    if os.path.exists(path):
+        os.remove(path)
+
+    print(f'Gerando {args.rows:,} logs em {path} ...')
+    t0 = time.perf_counter()
+    generate(path, args.rows, args.users, args.devices)
+    print(f'Base gerada em {time.perf_counter() - t0:.1f}s\n')
+
+    before = run(path, args.repeat, args.users, args.devices)
+
+    engine = create_engine(f'sqlite:///{path}')
+    t0 = time.perf_counter()
+    create_indexes(engine)
+    engine.dispose()
+    print(f'Índices criados em {time.perf_counter() - t0:.1f}s\n')
+
+    after = run(path, args.repeat, args.users, args.devices)
+
+    for name in QUERIES:
+        plan_before, ms_before = before[name]
+        plan_after, ms_after = after[name]
+        print(f'== {name}')
+        print(f'   antes : {ms_before:10.2f} ms  {plan_before}')
+        print(f'   depois: {ms_after:10.2f} ms  {plan_after}')
+
+
+if __name__ == '__main__':
+    main()
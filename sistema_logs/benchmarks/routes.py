@@ -0,0 +1,231 @@
+"""
+Benchmark das rotas da aplicação sobre uma base sintética.
+
+Cada rota é chamada pelo cliente de teste do Flask (sem servidor HTTP, mede
+a aplicação e o banco), em várias threads ao mesmo tempo, com o papel de
+usuário que ela exige (admin ou usuário comum com permissões). Para cada
+rota são reportados:
+- latência p50/p95/p99 (e média) em ms
+- vazão (requisições por segundo, todas as threads)
+- comandos SQL por requisição (média e máximo, todos os binds)
+- respostas com status inesperado
+
+Com --json o resultado (parâmetros, versão do código e métricas por rota) é
+gravado em arquivo, para comparar execuções entre versões.
+
+A base é gerada por benchmarks.dataset se o arquivo --db ainda não existir;
+se existir, é reaproveitada (as rotas de acesso e login gravam logs nela).
+
+Uso (a partir da pasta sistema_logs):
+    python -m benchmarks.routes --db /tmp/bench.db --logs 2000000
+    python -m benchmarks.routes --db /tmp/bench.db --workers 8 --requests 400 --json run.json
+    python -m benchmarks.routes --db /tmp/bench.db --only logs --only alerts
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from benchmarks.dataset import BENCH_PASSWORD, add_arguments, benchmark_app, generate
+
+# Rotas medidas: nome -> (método, caminho, papel). O caminho pode usar
+# {user_id} e {device_id} (usuário comum e dispositivo que ele pode acessar).
+# Papel: 'admin', 'user' ou None (anônimo; login grava um log a cada chamada)
+ROUTES = {
+    'login': ('POST', '/login', None),
+    'dashboard': ('GET', '/', 'admin'),
+    'logs': ('GET', '/logs', 'admin'),
+    'logs (usuário + suspeitos)': ('GET', '/logs?user_id={user_id}&suspicious=true', 'admin'),
+    'logs (busca textual)': ('GET', '/logs?q=senha', 'admin'),
+    'logs (usuário comum)': ('GET', '/logs', 'user'),
+    'logs/stats': ('GET', '/logs/stats', 'admin'),
+    'devices': ('GET', '/devices', 'user'),
+    'devices/access': ('GET', '/devices/access/{device_id}', 'user'),
+    'alerts': ('GET', '/alerts', 'admin'),
+    'admin/users': ('GET', '/admin/users', 'admin'),
+}
+
+# Status considerados sucesso (login responde com redirecionamento)
+EXPECTED_STATUS = {'login': (302,)}
+
+
+class StatementCounter:
+    """Comandos SQL executados por thread (listener em todas as engines da aplicação)"""
+
+    def __init__(self, engines):
+        self._local = threading.local()
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def percentile(sorted_values, pct):
+    """Percentil pelo posto mais próximo (valores já ordenados)"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def login(client, username):
+    response = client.post('/login', data={'username': username, 'password': BENCH_PASSWORD})
+    if response.status_code != 302:
+        raise SystemExit(f'Falha no login de {username} ({response.status_code})')
+
+
+def bench_identity(app):
+    """Usuário comum com permissão em algum dispositivo (usado nas rotas de papel 'user')"""
+    from extensions import db
+    from models import User, UserPermission
+
+    with app.app_context():
+        permission = db.session.query(UserPermission).order_by(UserPermission.id).first()
+        if permission is None:
+            raise SystemExit('Base sem permissões; gere com benchmarks.dataset')
+        user = db.session.get(User, permission.user_id)
+        return {'user_id': user.id, 'username': user.username, 'device_id': permission.device_id}
+
+
+def run_route(app, counter, name, identity, workers, requests_per_route):
+    """
+    Executa uma rota requests_per_route vezes, dividida entre workers threads.
+
+    Returns:
+        dict: Métricas da rota
+    """
+    method, path, role = ROUTES[name]
+    path = path.format(**identity)
+    expected = EXPECTED_STATUS.get(name, (200,))
+    usernames = {'admin': 'admin', 'user': identity['username']}
+
+    def worker(count):
+        client = app.test_client()
+        if role:
+            login(client, usernames[role])
+        samples, errors = [], 0
+        for _ in range(count):
+            counter.reset()
+            t0 = time.perf_counter()
+            if method == 'POST':
+                response = client.post(path, data={'username': identity['username'], 'password': BENCH_PASSWORD})
+            else:
+                response = client.get(path)
+            response.get_data()
+            samples.append(((time.perf_counter() - t0) * 1000, counter.count))
+            errors += response.status_code not in expected
+        return samples, errors
+
+    # Uma chamada de aquecimento (caches, planos de consulta)
+    worker(1)
+
+    counts = [requests_per_route // workers + (i < requests_per_route % workers) for i in range(workers)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(worker, [c for c in counts if c]))
+    elapsed = time.perf_counter() - t0
+
+    samples = [sample for worker_samples, _ in results for sample in worker_samples]
+    latencies = sorted(ms for ms, _ in samples)
+    statements = [n for _, n in samples]
+    return {
+        'method': method,
+        'path': path,
+        'role': role,
+        'requests': len(samples),
+        'errors': sum(errors for _, errors in results),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': sum(latencies) / len(latencies),
+        'throughput_rps': len(samples) / elapsed,
+        'sql_per_request': sum(statements) / len(statements),
+        'sql_max': max(statements),
+    }
+
+
+def git_revision():
+    """Commit atual do código (None fora de um repositório git)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def table_counts(app):
+    from extensions import db
+    from models import AccessLog, Alert, Device, User
+
+    with app.app_context():
+        return {'users': db.session.query(User).count(), 'devices': db.session.query(Device).count(),
+                'access_logs': db.session.query(AccessLog).count(), 'alerts': db.session.query(Alert).count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das rotas do Sistema de Logs')
+    add_arguments(parser)
+    parser.add_argument('--workers', type=int, default=4, help='Threads simultâneas')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições por rota (somando as threads)')
+    parser.add_argument('--only', action='append', choices=list(ROUTES), help='Medir apenas estas rotas')
+    parser.add_argument('--json', help='Arquivo de saída com os resultados em JSON')
+    args = parser.parse_args()
+
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = benchmark_app(args.db, args.logs_db)
+    if not table_counts(app)['users']:
+        print(f'Gerando base em {args.db} ...')
+        generate(app, args.users, args.devices, args.logs, args.permissions_per_user, args.days, seed=args.seed)
+    dataset = table_counts(app)
+    print(f'Base: {args.db} {dataset}\n')
+
+    with app.app_context():
+        from extensions import db
+        counter = StatementCounter(db.engines.values())
+    identity = bench_identity(app)
+
+    results = {}
+    print(f'{"rota":30} {"req":>5} {"err":>4} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"sql":>6}')
+    for name in args.only or ROUTES:
+        r = results[name] = run_route(app, counter, name, identity, args.workers, args.requests)
+        print(f'{name:30} {r["requests"]:5} {r["errors"]:4} {r["p50_ms"]:8.1f} {r["p95_ms"]:8.1f} '
+              f'{r["p99_ms"]:8.1f} {r["throughput_rps"]:8.1f} {r["sql_per_request"]:6.1f}')
+
+    if args.json:
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': {'db': args.db, 'logs_db': args.logs_db, **dataset},
+            'workers': args.workers,
+            'requests_per_route': args.requests,
+            'routes': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'\nResultados gravados em {args.json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ Responsável por:
 - Exibir alertas de segurança gerados automaticamente
 - Resolver alertas (marcar como tratados)
 - Visualizar detalhes de cada alerta
+- Buscar texto no título e na descrição (q=, índice FTS5, ver search.py)
 """
 
 from flask import Blueprint, flash, redirect, render_template, request, jsonify, url_for
@@ -12,6 +13,9 @@ from flask_login import login_required, current_user
 from datetime import datetime
 from extensions import db
 from models import Alert, UserRole, AlertLevel
+from cache import dashboard_cache
+from data_version import ALERTS, bump_versions
+from search import search_alerts, fts_query, snippet_column, rank_column
 
 # Criação do blueprint
 alerts_bp = Blueprint('alerts', __name__)
@@ -25,7 +29,9 @@ def alerts():
     """
     Exibe lista de alertas de segurança.
     Apenas administradores podem ver alertas.
-    Permite filtrar por alertas resolvidos/não resolvidos.
+    Permite filtrar por alertas resolvidos/não resolvidos e buscar texto
+    (q=) no título e na descrição; com busca, os alertas vêm ordenados por
+    relevância, com o trecho encontrado destacado.
     """
     # Verificar se é administrador
     if current_user.role != UserRole.ADMIN:
@@ -42,10 +48,23 @@ def alerts():
     if not show_resolved:
         query = query.filter_by(is_resolved=False)
     
-    # Obter alertas ordenados pelos mais recentes
-    alerts_list = query.order_by(Alert.created_at.desc()).all()
+    # Busca textual: mais relevantes primeiro, com o trecho encontrado
+    search = request.args.get('q', '').strip()
+    snippets = {}
+    if fts_query(search):
+        relevance = rank_column('alert_fts')
+        rows = (search_alerts(query, search)
+                .add_columns(snippet_column('alert_fts'), relevance)
+                .order_by(relevance, Alert.created_at.desc())
+                .all())
+        alerts_list = [row[0] for row in rows]
+        snippets = {row[0].id: row.snippet for row in rows}
+    else:
+        # Obter alertas ordenados pelos mais recentes
+        alerts_list = query.order_by(Alert.created_at.desc()).all()
     
-    return render_template('alerts.html', alerts=alerts_list, AlertLevel=AlertLevel)
+    return render_template('alerts.html', alerts=alerts_list, AlertLevel=AlertLevel,
+                           snippets=snippets, search=search)
 
 
 # ========== ROTA: RESOLVER ALERTA ==========
@@ -68,7 +87,9 @@ def resolve_alert(alert_id):
     # Marcar como resolvido
     alert.is_resolved = True
     alert.resolved_at = datetime.utcnow()
+    bump_versions(ALERTS)
     db.session.commit()
+    dashboard_cache.invalidate('active_alerts')
     
     # Responder com JSON se for requisição AJAX
     if request.is_json:
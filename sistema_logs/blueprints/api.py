@@ -0,0 +1,354 @@
+"""
+Blueprint da API JSON versionada (api), prefixo /api/v1.
+Responsável por:
+- Listar logs com os mesmos filtros e a mesma visibilidade da tela de logs
+- Listar alertas (admin only, mesmos filtros da tela de alertas)
+- Listar dispositivos (filtro por IP/faixa CIDR)
+- Receber lotes de eventos de acesso dos dispositivos (ingest, ver ingest.py)
+
+Todas as listagens aceitam:
+- fields: Campos retornados, separados por vírgula (padrão: todos)
+- after: Cursor da página seguinte (next_cursor da resposta anterior)
+- per_page: Registros por página (limitado por LOGS_MAX_PAGE_SIZE)
+
+Respostas trazem ETag (e Last-Modified em logs e alertas). Com
+If-None-Match/If-Modified-Since, uma listagem que não mudou responde 304
+sem consultar as linhas: a versão dos dados é um contador incrementado a
+cada alteração, lido pela chave primária (ver data_version.py).
+"""
+
+import hashlib
+import hmac
+from datetime import datetime
+from functools import wraps
+
+import pytz
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user
+
+from models import Alert, Device, UserRole, brasilia_tz
+from archive import log_sources
+from ip_ranges import ip_range_condition
+from search import search_alerts, fts_query
+from cache import permission_cache
+from data_version import ALERTS, LOGS, current_versions
+from ingest import IngestError, ingest_events, parse_batch
+from blueprints.logs import (decode_cursor, filtered_logs_query, log_date_range,
+                             log_listing_query, paginate_by_cursor, with_names)
+
+# Criação do blueprint
+api_bp = Blueprint('api', __name__)
+
+# Campos disponíveis em cada recurso (parâmetro fields)
+LOG_FIELDS = ('id', 'user_id', 'username', 'device_id', 'device_name', 'action', 'status',
+              'ip_address', 'access_time', 'user_agent', 'details', 'is_suspicious')
+ALERT_FIELDS = ('id', 'title', 'description', 'alert_level', 'created_at', 'is_resolved',
+                'resolved_at', 'user_id', 'device_id', 'action', 'occurrence_count',
+                'first_seen', 'last_seen', 'log_id')
+DEVICE_FIELDS = ('id', 'name', 'ip_address', 'device_type', 'description', 'location',
+                 'is_active', 'created_at', 'can_access')
+
+
+# ========== FUNÇÕES AUXILIARES ==========
+
+def api_error(message, status, **extra):
+    """Resposta de erro em JSON"""
+    return jsonify({'error': message, **extra}), status
+
+
+def api_login_required(view):
+    """Como login_required, mas responde 401 em JSON em vez de redirecionar"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return api_error('Autenticação necessária', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def requested_fields(available):
+    """
+    Campos pedidos no parâmetro fields (todos se ausente).
+
+    Returns:
+        tuple: Campos na ordem de available, ou None se algum não existe
+    """
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return available
+    wanted = {field.strip() for field in raw.split(',') if field.strip()}
+    if wanted - set(available):
+        return None
+    return tuple(field for field in available if field in wanted)
+
+
+def page_size():
+    per_page = request.args.get('per_page', current_app.config['LOGS_PAGE_SIZE'], type=int)
+    return max(1, min(per_page, current_app.config['LOGS_MAX_PAGE_SIZE']))
+
+
+def to_json_value(value):
+    """Valores do banco em JSON (datas em ISO, enums pelo valor)"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return getattr(value, 'value', value)
+
+
+def to_utc(dt, tz=brasilia_tz):
+    """Datetime sem fuso (gravado em tz) como UTC, para Last-Modified"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = tz.localize(dt)
+    return dt.astimezone(pytz.utc)
+
+
+def make_etag(version):
+    """
+    ETag da listagem: versão dos dados + usuário (visibilidade) + parâmetros.
+    """
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    raw = f'{version}|{current_user.id}|{current_user.role.value}|{request.path}?{args}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Verifica as condições do cliente antes de montar a listagem.
+    If-None-Match tem precedência; If-Modified-Since só vale sem ele.
+
+    Returns:
+        bool: True se o cliente já tem esta versão (responder 304)
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_response(payload, etag, last_modified=None):
+    """Resposta JSON com ETag e Last-Modified (ou 304 sem corpo)"""
+    if not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Cliente sempre revalida (a resposta depende do usuário logado)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# ========== VERSÃO DOS DADOS (CONSULTAS BARATAS) ==========
+
+def data_version_logs():
+    """
+    Versão dos logs: contador incrementado a cada alteração (ver
+    data_version.py) e horário dessa alteração. Renomear um usuário ou
+    dispositivo também incrementa (username/device_name são lidos na hora).
+
+    Returns:
+        tuple: (versão, última alteração em UTC ou None)
+    """
+    version, updated_at = current_versions(LOGS)[LOGS]
+    return f'{LOGS}:{version}', to_utc(updated_at)
+
+
+def data_version_alerts():
+    """
+    Versão dos alertas: contador incrementado a cada alteração (alertas
+    novos, ocorrências agrupadas, resolução) e horário dessa alteração.
+
+    Returns:
+        tuple: (versão, última alteração em UTC ou None)
+    """
+    version, updated_at = current_versions(ALERTS)[ALERTS]
+    return f'{ALERTS}:{version}', to_utc(updated_at)
+
+
+# ========== ROTA: LOGS ==========
+
+@api_bp.route('/logs')
+@api_login_required
+def list_logs():
+    """
+    Lista logs em JSON, do mais recente para o mais antigo.
+    Aceita os filtros de logs() (user_id, device_id, date_from, date_to,
+    suspicious, ip, q) e os parâmetros comuns (fields, after, before,
+    per_page). Usuários comuns veem apenas seus próprios logs.
+    """
+    fields = requested_fields(LOG_FIELDS)
+    if fields is None:
+        return api_error('Campo inválido em fields', 400, available=list(LOG_FIELDS))
+    try:
+        date_range = log_date_range(request.args)
+    except ValueError:
+        return api_error('Data inválida (use AAAA-MM-DD)', 400)
+    after, before = request.args.get('after'), request.args.get('before')
+    if any(cursor and decode_cursor(cursor) is None for cursor in (after, before)):
+        return api_error('Cursor inválido (use next_cursor/prev_cursor da resposta)', 400)
+
+    version, last_modified = data_version_logs()
+    etag = make_etag(version)
+    if not_modified(etag, last_modified):
+        return conditional_response(None, etag, last_modified)
+
+    extra_columns = ('user_agent',) if 'user_agent' in fields else ()
+    rows, next_cursor, prev_cursor = paginate_by_cursor(
+        lambda entity: log_listing_query(filtered_logs_query(request.args, entity), entity, extra_columns),
+        log_sources(*date_range),
+        after=after,
+        before=before,
+        per_page=page_size()
+    )
+    # Nomes apenas se pedidos (uma consulta IN por tabela)
+    if {'username', 'device_name'} & set(fields):
+        rows = with_names(rows)
+
+    payload = {
+        'data': [{field: to_json_value(getattr(row, field)) for field in fields} for row in rows],
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+    }
+    return conditional_response(payload, etag, last_modified)
+
+
+# ========== ROTA: ALERTAS ==========
+
+@api_bp.route('/alerts')
+@api_login_required
+def list_alerts():
+    """
+    Lista alertas em JSON, dos mais recentes para os mais antigos.
+    Apenas administradores (mesma regra de alerts.py).
+    Filtros: show_resolved (padrão: apenas pendentes) e q (busca textual).
+    Cursor: after=<id> (next_cursor da resposta anterior).
+    """
+    if current_user.role != UserRole.ADMIN:
+        return api_error('Acesso negado', 403)
+    fields = requested_fields(ALERT_FIELDS)
+    if fields is None:
+        return api_error('Campo inválido em fields', 400, available=list(ALERT_FIELDS))
+
+    version, last_modified = data_version_alerts()
+    etag = make_etag(version)
+    if not_modified(etag, last_modified):
+        return conditional_response(None, etag, last_modified)
+
+    query = Alert.query
+    if not request.args.get('show_resolved', False, type=bool):
+        query = query.filter_by(is_resolved=False)
+    search = request.args.get('q', '').strip()
+    if fts_query(search):
+        query = search_alerts(query, search)
+    after = request.args.get('after', type=int)
+    if after:
+        query = query.filter(Alert.id < after)
+
+    per_page = page_size()
+    alerts = query.order_by(Alert.id.desc()).limit(per_page + 1).all()
+    next_cursor = str(alerts[per_page - 1].id) if len(alerts) > per_page else None
+
+    payload = {
+        'data': [{field: to_json_value(getattr(alert, field)) for field in fields}
+                 for alert in alerts[:per_page]],
+        'next_cursor': next_cursor,
+    }
+    return conditional_response(payload, etag, last_modified)
+
+
+# ========== ROTA: DISPOSITIVOS ==========
+
+@api_bp.route('/devices')
+@api_login_required
+def list_devices():
+    """
+    Lista dispositivos em JSON, por id.
+    Filtro: ip (IP ou faixa CIDR). can_access indica se o usuário logado
+    pode acessar o dispositivo (administradores podem todos).
+    Cursor: after=<id> (next_cursor da resposta anterior).
+
+    Dispositivos não têm data de alteração: a resposta traz apenas ETag,
+    calculado sobre o conteúdo (a tabela é pequena).
+    """
+    fields = requested_fields(DEVICE_FIELDS)
+    if fields is None:
+        return api_error('Campo inválido em fields', 400, available=list(DEVICE_FIELDS))
+
+    query = Device.query
+    ip_filter = request.args.get('ip', '').strip()
+    if ip_filter:
+        try:
+            query = query.filter(ip_range_condition(Device.ip_packed, ip_filter))
+        except ValueError:
+            return api_error('IP ou faixa CIDR inválida', 400)
+    after = request.args.get('after', type=int)
+    if after:
+        query = query.filter(Device.id > after)
+
+    per_page = page_size()
+    devices = query.order_by(Device.id).limit(per_page + 1).all()
+    is_admin = current_user.role == UserRole.ADMIN
+    permitted = permission_cache.grants(current_user.id)
+
+    data = []
+    for device in devices[:per_page]:
+        record = {field: to_json_value(getattr(device, field, None)) for field in fields}
+        if 'can_access' in fields:
+            record['can_access'] = is_admin or device.id in permitted
+        data.append(record)
+    payload = {
+        'data': data,
+        'next_cursor': str(devices[per_page - 1].id) if len(devices) > per_page else None,
+    }
+    etag = make_etag(hashlib.sha1(repr(payload).encode()).hexdigest())
+    return conditional_response(payload, etag)
+
+
+# ========== ROTA: INGESTÃO DE EVENTOS ==========
+
+def ingest_authorized():
+    """
+    Agentes autenticam com Authorization: Bearer <token> (INGEST_API_TOKENS);
+    administradores logados também podem enviar lotes.
+    """
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        token = auth[len('Bearer '):].strip().encode()
+        return any(hmac.compare_digest(token, allowed.encode())
+                   for allowed in current_app.config.get('INGEST_API_TOKENS', ()))
+    return current_user.is_authenticated and current_user.role == UserRole.ADMIN
+
+
+@api_bp.route('/ingest', methods=['POST'])
+def ingest():
+    """
+    Recebe um lote de eventos de acesso e grava os válidos em uma transação.
+    Corpo: NDJSON (Content-Type: application/x-ndjson) ou array JSON
+    (application/json). Cada evento: user_id, action e status obrigatórios;
+    device_id, ip_address, user_agent, details, access_time (ISO 8601) e
+    is_suspicious opcionais.
+
+    Resposta: contagens do lote e os eventos rejeitados (índice e motivo);
+    422 se nenhum evento foi aceito.
+    """
+    if not ingest_authorized():
+        return api_error('Autenticação necessária', 401)
+    max_bytes = current_app.config['INGEST_MAX_BYTES']
+    if request.content_length is not None and request.content_length > max_bytes:
+        return api_error(f'Lote maior que {max_bytes} bytes', 413)
+
+    try:
+        events = parse_batch(request.get_data(cache=False), request.content_type)
+    except IngestError as exc:
+        return api_error(str(exc), 400)
+    max_events = current_app.config['INGEST_MAX_EVENTS']
+    if len(events) > max_events:
+        return api_error(f'Lote com mais de {max_events} eventos', 413)
+
+    result = ingest_events(events)
+    # 422 apenas se nenhum evento do lote foi aceito
+    status = 422 if result['received'] and not result['accepted'] else 200
+    return jsonify(result), status
@@ -4,14 +4,18 @@ Responsável por:
 - Login de usuários
 - Logout de usuários  
 - Registro de logs de acesso/autenticação
-- Detecção de tentativas suspeitas (senhas incorretas, etc)
+- Detecção de tentativas suspeitas (senhas incorretas, IP ou dispositivo novo, etc)
+- Limitação de tentativas de login por usuário/IP (ver throttle.py)
 """
 
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
-from extensions import db
-from models import User, AccessLog
+from models import User, AccessLog, get_brasilia_now
+from log_writer import log_writer, persist_events
+from throttle import login_throttle
+from sketches import access_sketches
+from metrics import app_metrics
 
 # Criação do blueprint
 auth_bp = Blueprint('auth', __name__)
@@ -22,6 +26,10 @@ def log_access(user_id, device_id, action, status, ip_address, user_agent, detai
     Função utilitária para registrar acessos no banco de dados.
     Cria um log de acesso e um alerta se for suspeito.
     
+    Com ACCESS_LOG_ASYNC ativo, o evento vai para a fila do gravador em lote
+    (log_writer) e é gravado em segundo plano; se a fila estiver cheia, a
+    gravação é feita aqui mesmo, de forma síncrona.
+    
     Args:
         user_id: ID do usuário que acessou
         device_id: ID do dispositivo acessado (pode ser None para login no sistema)
@@ -32,15 +40,23 @@ def log_access(user_id, device_id, action, status, ip_address, user_agent, detai
         details: Descrição adicional opcional
         is_suspicious: Se True, cria um alerta de segurança
     
+    Logins e acessos bem-sucedidos a partir de um IP ou dispositivo que o
+    usuário nunca usou também são marcados como suspeitos (ver sketches.py).
+    
     Returns:
-        AccessLog: Objeto de log criado
+        AccessLog: Objeto de log criado (sem id quando gravado em segundo plano)
     """
-    from models import AccessLog, Alert, AlertLevel
+    # Primeiro acesso a partir de um IP ou dispositivo: suspeito (gera alerta)
+    novelties = access_sketches.observe(user_id, device_id, ip_address, action, status)
+    if novelties:
+        is_suspicious = True
+        details = '; '.join([details] + novelties if details else novelties)
     
-    # Criar e adicionar log
-    log = AccessLog(
+    # Horário registrado no momento do evento, não no momento da gravação
+    event = dict(
         user_id=user_id,
         device_id=device_id,
+        access_time=get_brasilia_now(),
         action=action,
         status=status,
         ip_address=ip_address,
@@ -48,20 +64,13 @@ def log_access(user_id, device_id, action, status, ip_address, user_agent, detai
         details=details,
         is_suspicious=is_suspicious
     )
-    db.session.add(log)
     
-    # Se suspeito, criar alerta automático
-    if is_suspicious:
-        alert = Alert(
-            title=f"Acesso suspeito detectado - Usuário: {user_id}",
-            description=f"Tentativa de acesso suspeito. Detalhes: {details}",
-            alert_level=AlertLevel.HIGH,
-            log_id=log.id
-        )
-        db.session.add(alert)
+    # Modo assíncrono: devolve um log transitório com os dados do evento
+    if log_writer.submit(event):
+        return AccessLog(**event)
     
-    db.session.commit()
-    return log
+    # Modo síncrono (ou fila cheia): grava log e alerta na mesma transação
+    return persist_events([event])[0]
 
 
 # ========== ROTA: LOGIN ==========
@@ -78,6 +87,13 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
+        # Rejeitar logo tentativas bloqueadas (sem consultar o banco nem verificar hash)
+        retry_after = login_throttle.retry_after(username, request.remote_addr)
+        if retry_after:
+            app_metrics.record_login('blocked')
+            flash(f'Muitas tentativas de login. Tente novamente em {retry_after} segundos.', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
+        
         # Buscar usuário no banco
         user = User.query.filter_by(username=username).first()
         
@@ -85,6 +101,8 @@ def login():
         if user and check_password_hash(user.password_hash, password) and user.is_active:
             # Login bem-sucedido
             login_user(user)  # Flask-Login cria a sessão
+            login_throttle.record_success(username)
+            app_metrics.record_login('success')
             
             # Registrar log de acesso bem-sucedido
             log_access(
@@ -99,6 +117,10 @@ def login():
             flash('Login realizado com sucesso!', 'success')
             return redirect(url_for('main.dashboard'))
         else:
+            # Contabilizar falha (inclusive para usuários inexistentes)
+            locked_keys = login_throttle.record_failure(username, request.remote_addr)
+            app_metrics.record_login('failed')
+            
             # Login falhou - tentar registrar com usuário se encontrado
             if user:
                 log_access(
@@ -111,6 +133,19 @@ def login():
                     details='Tentativa de login com senha incorreta',
                     is_suspicious=True  # Marca como suspeito -> gera alerta
                 )
+                # Um único registro agregado quando a sequência de falhas gera bloqueio
+                if locked_keys:
+                    log_access(
+                        user_id=user.id,
+                        device_id=None,
+                        action='login_lockout',
+                        status='failed',
+                        ip_address=request.remote_addr,
+                        user_agent=request.headers.get('User-Agent'),
+                        details=f'Login bloqueado após {login_throttle.max_per_user} ou mais falhas '
+                                f'em {login_throttle.window}s ({", ".join(locked_keys)})',
+                        is_suspicious=True
+                    )
             flash('Usuário ou senha inválidos!', 'error')
     
     return render_template('login.html')
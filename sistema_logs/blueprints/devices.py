@@ -1,7 +1,7 @@
 """
 Blueprint de gerenciamento de dispositivos (devices).
 Responsável por:
-- Listar dispositivos
+- Listar dispositivos (filtro por IP ou faixa CIDR)
 - Controlar acesso aos dispositivos (verificar permissões)
 - Registrar acessos aos dispositivos nos logs
 - Criar alertas para acessos não autorizados
@@ -13,6 +13,11 @@ from flask_login import login_required, current_user
 from extensions import db
 from models import Device, UserPermission, AccessLog, Alert, AlertLevel, UserRole, DeviceType, User
 from blueprints.auth import log_access
+from blueprints.users import apply_permission_changes
+from cache import dashboard_cache, permission_cache, Grant
+from ip_ranges import ip_range_condition
+from rollups import discard_rollups
+from data_version import ALERTS, LOGS, bump_versions
 
 # Criação do blueprint
 devices_bp = Blueprint('devices', __name__)
@@ -36,12 +41,8 @@ def has_permission(user_id, device_id):
     if current_user.role == UserRole.ADMIN:
         return True
     
-    # Verificar se existe um registro de permissão
-    permission = UserPermission.query.filter_by(
-        user_id=user_id, 
-        device_id=device_id
-    ).first()
-    return permission is not None
+    # Verificar se existe um registro de permissão (cache em memória)
+    return permission_cache.get(user_id, device_id) is not None
 
 
 # ========== ROTA: LISTAR DISPOSITIVOS ==========
@@ -52,13 +53,22 @@ def devices():
     """
     Exibe lista de dispositivos disponíveis.
     Marca quais dispositivos o usuário tem acesso.
+    
+    Filtro opcional (parâmetro GET):
+    - ip: IP ou faixa CIDR (ex: 10.20.0.0/16), busca por intervalo em ip_packed
     """
-    # Obter todos os dispositivos
-    devices_list = Device.query.all()
+    # Obter todos os dispositivos (ou os da faixa de IP informada)
+    query = Device.query
+    ip_filter = request.args.get('ip', '').strip()
+    if ip_filter:
+        try:
+            query = query.filter(ip_range_condition(Device.ip_packed, ip_filter))
+        except ValueError:
+            flash('IP ou faixa CIDR inválida.', 'error')
+    devices_list = query.all()
     
     # Para usuários não-admin, obter apenas dispositivos que tem permissão
-    user_permissions = UserPermission.query.filter_by(user_id=current_user.id).all()
-    permitted_devices = [perm.device_id for perm in user_permissions]
+    permitted_devices = permission_cache.grants(current_user.id)
     
     return render_template('devices.html', 
                          devices=devices_list, 
@@ -134,8 +144,13 @@ def add_device():
                 dev = Device.query.get(did)
                 if dev:
                     # Remove permissões relacionadas automaticamente por cascade
+                    # Logs do dispositivo são removidos em cascata (contagens dos rollups junto)
+                    discard_rollups(device_id=dev.id)
+                    bump_versions(LOGS, ALERTS)
                     db.session.delete(dev)
                     db.session.commit()
+                    dashboard_cache.invalidate('total_devices', 'recent_logs')
+                    permission_cache.clear()
                     flash('Dispositivo deletado com sucesso.', 'success')
                 else:
                     flash('Dispositivo não encontrado.', 'error')
@@ -166,6 +181,9 @@ def add_device():
             if not device:
                 flash('Dispositivo não encontrado.', 'error')
                 return redirect(url_for('devices.devices'))
+            # Novo nome aparece nos logs listados pela API (device_name): muda a versão (ETag)
+            if name != device.name:
+                bump_versions(LOGS)
             device.name = name
             device.ip_address = ip_address
             device.device_type = device_type
@@ -192,36 +210,20 @@ def add_device():
             return redirect(url_for('devices.devices'))
 
         # Processar permissões por usuário (se o template enviou)
-        users_all = User.query.all()
-        for u in users_all:
-            can_read = bool(request.form.get(f'perm_{u.id}_read'))
-            can_write = bool(request.form.get(f'perm_{u.id}_write'))
-            can_execute = bool(request.form.get(f'perm_{u.id}_execute'))
-
-            perm = UserPermission.query.filter_by(user_id=u.id, device_id=device.id).first()
-            if can_read or can_write or can_execute:
-                if perm:
-                    perm.can_read = can_read
-                    perm.can_write = can_write
-                    perm.can_execute = can_execute
-                else:
-                    perm = UserPermission(
-                        user_id=u.id,
-                        device_id=device.id,
-                        can_read=can_read,
-                        can_write=can_write,
-                        can_execute=can_execute,
-                        granted_by=current_user.id
-                    )
-                    db.session.add(perm)
-            else:
-                # se não marcou nenhuma perm, remover registro existente
-                if perm:
-                    db.session.delete(perm)
+        # Diferença calculada em memória e aplicada em operações em lote
+        desired = {
+            (row.id, device.id): Grant(bool(request.form.get(f'perm_{row.id}_read')),
+                                       bool(request.form.get(f'perm_{row.id}_write')),
+                                       bool(request.form.get(f'perm_{row.id}_execute')))
+            for row in User.query.with_entities(User.id)
+        }
+        changes = apply_permission_changes(desired, granted_by=current_user.id)
 
         # Commit final
         try:
             db.session.commit()
+            dashboard_cache.invalidate('total_devices', 'recent_logs')
+            permission_cache.invalidate(*changes['user_ids'])
             flash('Dispositivo salvo com sucesso!', 'success')
         except Exception:
             db.session.rollback()
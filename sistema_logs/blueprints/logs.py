@@ -2,45 +2,149 @@
 Blueprint de visualização de logs (logs).
 Responsável por:
 - Visualizar logs de acesso aos dispositivos
-- Filtrar logs por usuário, dispositivo, data e suspeita
+- Filtrar logs por usuário, dispositivo, data, suspeita e IP/faixa CIDR
+- Exportar logs filtrados em CSV/NDJSON (streaming no servidor)
+- Transmitir logs e alertas novos ao vivo (SSE, /logs/stream, ver stream.py)
+- Consultar também os arquivos mensais quando o período alcança logs arquivados
+- Buscar texto em detalhes e user agent (q=, índice FTS5, ver search.py)
 - Exibir estatísticas de logs (admin only)
 """
 
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app, Response, stream_with_context, flash
 from flask_login import login_required, current_user
-from models import AccessLog, UserRole, get_brasilia_now
+from sqlalchemy import false, tuple_
+from extensions import db
+from models import AccessLog, User, Device, UserRole, get_brasilia_now
+from rollups import rollup_count
+from archive import log_sources
+from search import search_logs, fts_query, snippet_column, rank_column
+from ip_ranges import ip_range_condition, parse_ip_filter
+from throttle import login_throttle
+from stream import live_stream, LogFilter, format_sse
 from datetime import datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+import base64
+import csv
+import io
+import json
 import pytz
 
 # Criação do blueprint
 logs_bp = Blueprint('logs', __name__)
 
 
-# ========== ROTA: VISUALIZAR LOGS ==========
+# ========== FUNÇÕES AUXILIARES: PROJEÇÃO PARA LISTAGENS ==========
 
-@logs_bp.route('/logs')
-@login_required
-def logs():
+# Colunas de AccessLog exibidas nas listagens
+LISTING_COLUMNS = ('id', 'user_id', 'device_id', 'access_time', 'action', 'status',
+                   'ip_address', 'details', 'is_suspicious')
+
+
+def log_listing_query(query, entity=AccessLog, extra_columns=()):
     """
-    Exibe logs de acesso com suporte a filtros:
+    Converte uma query de AccessLog em uma projeção plana para listagens,
+    trazendo só as colunas exibidas. Os nomes de usuário e dispositivo são
+    completados depois por with_names (sem JOIN, pois os logs podem estar
+    em outro banco, ver extensions.py).
+    
+    Deve ser aplicada depois dos filtros.
+    
+    Args:
+        query: Query de AccessLog já filtrada
+        entity: AccessLog ou a entidade de um arquivo mensal (ver archive.py)
+        extra_columns: Colunas adicionais (ex: ('user_agent',) na exportação)
+    
+    Returns:
+        Query: Linhas com os atributos do log
+    """
+    return query.with_entities(*[getattr(entity, column)
+                                 for column in LISTING_COLUMNS + tuple(extra_columns)])
+
+
+def with_names(rows, names=None):
+    """
+    Completa linhas de log com username e device_name.
+    Busca os nomes com uma consulta IN por tabela para o lote inteiro,
+    evitando um carregamento lazy (log.user/log.device) por linha.
+    
+    Args:
+        rows: Linhas de log_listing_query
+        names: Dict reaproveitado entre lotes (ex: exportação), opcional
+    
+    Returns:
+        list: Objetos com os atributos do log, username e device_name
+    """
+    names = names if names is not None else {}
+    users = names.setdefault('users', {})
+    devices = names.setdefault('devices', {})
+    
+    missing_users = {row.user_id for row in rows} - users.keys()
+    if missing_users:
+        users.update(User.query.with_entities(User.id, User.username)
+                     .filter(User.id.in_(missing_users)).all())
+    missing_devices = {row.device_id for row in rows if row.device_id} - devices.keys()
+    if missing_devices:
+        devices.update(Device.query.with_entities(Device.id, Device.name)
+                       .filter(Device.id.in_(missing_devices)).all())
+    
+    return [SimpleNamespace(**row._asdict(),
+                            username=users.get(row.user_id),
+                            device_name=devices.get(row.device_id))
+            for row in rows]
+
+
+# ========== FUNÇÕES AUXILIARES: FILTROS DE LOGS ==========
+
+def log_date_range(args):
+    """
+    Lê o intervalo de datas dos filtros (date_from/date_to em YYYY-MM-DD).
+    
+    Returns:
+        tuple: (inicio, fim) como datetime ou None; fim já inclui o último dia
+    """
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    if date_from:
+        date_from = datetime.strptime(date_from, '%Y-%m-%d')
+    if date_to:
+        # Adiciona 1 dia para incluir todas as horas do último dia
+        date_to = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
+    return date_from or None, date_to or None
+
+
+def filtered_logs_query(args, entity=AccessLog):
+    """
+    Monta a query de AccessLog com os filtros da tela de logs.
+    Compartilhada pela listagem e pelas exportações para que todas
+    respeitem os mesmos filtros e a mesma restrição de visibilidade.
+    
+    Filtros aceitos (parâmetros GET):
     - user_id: Filtrar por usuário (admin only)
     - device_id: Filtrar por dispositivo
     - date_from: Data inicial (formato: YYYY-MM-DD)
     - date_to: Data final (formato: YYYY-MM-DD)
     - suspicious: Mostrar apenas acessos suspeitos (True/False)
+    - ip: IP ou faixa CIDR de origem (ex: 10.20.0.0/16); inválido = nenhum log
+    - q: Texto buscado em detalhes e user agent (busca textual)
     
     Usuários comuns veem apenas seus próprios logs.
-    Administradores veem todos os logs.
+    
+    Args:
+        args: Parâmetros da requisição (request.args)
+        entity: AccessLog ou a entidade de um arquivo mensal (ver archive.py)
+    
+    Returns:
+        Query: Query de AccessLog filtrada (sem ordenação)
     """
     # ========== OBTER PARÂMETROS DE FILTRO ==========
-    user_filter = request.args.get('user_id', type=int)
-    device_filter = request.args.get('device_id', type=int)
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    suspicious_only = request.args.get('suspicious', type=bool)
+    user_filter = args.get('user_id', type=int)
+    device_filter = args.get('device_id', type=int)
+    date_from, date_to = log_date_range(args)
+    suspicious_only = args.get('suspicious', type=bool)
     
     # Começar com query base
-    query = AccessLog.query
+    query = db.session.query(entity)
     
     # Se não é admin, mostrar apenas seus próprios logs
     if current_user.role != UserRole.ADMIN:
@@ -56,23 +160,383 @@ def logs():
     
     # Filtro por data inicial
     if date_from:
-        date_from = datetime.strptime(date_from, '%Y-%m-%d')
-        query = query.filter(AccessLog.access_time >= date_from)
+        query = query.filter(entity.access_time >= date_from)
     
     # Filtro por data final
     if date_to:
-        # Adiciona 1 dia para incluir todas as horas do último dia
-        date_to = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
-        query = query.filter(AccessLog.access_time <= date_to)
+        query = query.filter(entity.access_time <= date_to)
     
     # Filtro para acessos suspeitos
     if suspicious_only:
         query = query.filter_by(is_suspicious=True)
     
-    # Obter resultados ordenados pelos mais recentes
-    logs_list = query.order_by(AccessLog.access_time.desc()).all()
+    # Filtro por IP/faixa CIDR (intervalo binário no índice, ver ip_ranges.py)
+    ip_filter = args.get('ip', '').strip()
+    if ip_filter:
+        try:
+            query = query.filter(ip_range_condition(entity.ip_address, ip_filter))
+        except ValueError:
+            query = query.filter(false())
+    
+    # Busca textual (combinada com os filtros acima)
+    query = search_logs(query, entity, args.get('q', ''))
+    
+    return query
+
+
+# ========== FUNÇÕES AUXILIARES: PAGINAÇÃO POR CURSOR ==========
+
+def encode_cursor(log):
+    """
+    Gera um cursor opaco a partir da posição (access_time, id) de um log.
+    
+    Args:
+        log: Linha de log (precisa dos atributos access_time e id)
+    
+    Returns:
+        str: Cursor codificado em base64 (seguro para URL)
+    """
+    raw = f"{log.access_time.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodifica um cursor gerado por encode_cursor.
+    
+    Returns:
+        tuple: (access_time, id) ou None se o cursor for inválido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        access_time, log_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(access_time), int(log_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def paginate_by_cursor(build_query, sources, after=None, before=None, per_page=50):
+    """
+    Pagina logs por keyset (access_time, id), do mais recente para o mais
+    antigo. O custo de cada página independe da profundidade, pois a posição
+    é dada por um filtro indexável e não por OFFSET.
+    
+    A página pode juntar linhas de várias fontes (tabela principal e arquivos
+    mensais, ver archive.py): cada fonte é consultada com o mesmo limite e as
+    linhas são intercaladas pela chave. Arquivos cujo mês não pode mais
+    alterar a página são ignorados sem consulta.
+    
+    Args:
+        build_query: Função entity -> query de listagem já filtrada
+        sources: Fontes de logs (archive.log_sources)
+        after: Cursor da última linha da página anterior (página seguinte)
+        before: Cursor da primeira linha da página atual (página anterior)
+        per_page: Quantidade de linhas por página
+    
+    Returns:
+        tuple: (linhas, cursor_proximo, cursor_anterior); cursores são None
+               quando não há mais páginas naquela direção
+    """
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+    sort_key = lambda row: (row.access_time, row.id)
+    rows = []
+    
+    if before:
+        # Voltando: busca em ordem crescente a partir do cursor e inverte
+        ordered = sources[:1] + [s for s in reversed(sources[1:]) if s.end > before[0]]
+        for source in ordered:
+            if source.start is not None and len(rows) > per_page and rows[per_page].access_time < source.start:
+                break
+            source.attach()
+            entity = source.entity
+            rows += (build_query(entity)
+                     .filter(tuple_(entity.access_time, entity.id) > before)
+                     .order_by(entity.access_time.asc(), entity.id.asc())
+                     .limit(per_page + 1).all())
+            rows.sort(key=sort_key)
+        has_prev = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        ordered = [s for s in sources if after is None or s.start is None or s.start <= after[0]]
+        for source in ordered:
+            if source.end is not None and len(rows) > per_page and rows[per_page].access_time >= source.end:
+                break
+            source.attach()
+            entity = source.entity
+            query = build_query(entity)
+            if after:
+                query = query.filter(tuple_(entity.access_time, entity.id) < after)
+            rows += (query.order_by(entity.access_time.desc(), entity.id.desc())
+                     .limit(per_page + 1).all())
+            rows.sort(key=sort_key, reverse=True)
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = after is not None
+    
+    next_cursor = encode_cursor(rows[-1]) if rows and has_next else None
+    prev_cursor = encode_cursor(rows[0]) if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def rank_by_relevance(build_query, sources, per_page=50):
+    """
+    Logs mais relevantes para a busca textual (bm25), juntando as fontes.
+    Cada fonte devolve seus per_page melhores e o resultado é intercalado
+    pela relevância.
+    
+    Args:
+        build_query: Função entity -> query de listagem com busca aplicada
+        sources: Fontes de logs (archive.log_sources)
+        per_page: Quantidade de linhas
+    
+    Returns:
+        list: Linhas ordenadas da mais para a menos relevante
+    """
+    rows = []
+    for source in sources:
+        source.attach()
+        relevance = rank_column('access_log_fts')
+        rows += (build_query(source.entity)
+                 .add_columns(relevance)
+                 .order_by(relevance)
+                 .limit(per_page).all())
+    rows.sort(key=lambda row: row.relevance)
+    return rows[:per_page]
+
+
+# ========== ROTA: VISUALIZAR LOGS ==========
+
+@logs_bp.route('/logs')
+@login_required
+def logs():
+    """
+    Exibe logs de acesso com suporte a filtros:
+    - user_id: Filtrar por usuário (admin only)
+    - device_id: Filtrar por dispositivo
+    - date_from: Data inicial (formato: YYYY-MM-DD)
+    - date_to: Data final (formato: YYYY-MM-DD)
+    - suspicious: Mostrar apenas acessos suspeitos (True/False)
+    - ip: IP ou faixa CIDR de origem (ex: 10.20.0.0/16, 2001:db8::/32)
+    - q: Busca textual em detalhes e user agent (trecho destacado por linha)
+    - sort=relevance: Com q, lista os logs mais relevantes (sem paginação)
+    
+    Paginação por cursor (keyset), preservando os filtros acima:
+    - after: Cursor para a página seguinte (registros mais antigos)
+    - before: Cursor para a página anterior (registros mais recentes)
+    - per_page: Registros por página (limitado por LOGS_MAX_PAGE_SIZE)
+    
+    Usuários comuns veem apenas seus próprios logs.
+    Administradores veem todos os logs.
+    """
+    # Fontes que podem ter logs do período (tabela principal + arquivos mensais)
+    sources = log_sources(*log_date_range(request.args))
+    
+    ip_filter = request.args.get('ip', '').strip()
+    if ip_filter:
+        try:
+            parse_ip_filter(ip_filter)
+        except ValueError:
+            flash('IP ou faixa CIDR inválida.', 'error')
+    
+    # ========== PAGINAÇÃO ==========
+    per_page = request.args.get('per_page', current_app.config['LOGS_PAGE_SIZE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['LOGS_MAX_PAGE_SIZE']))
+    
+    # Filtros e restrição de visibilidade aplicados em cada fonte;
+    # com busca textual, cada linha traz também o trecho encontrado
+    searching = bool(fts_query(request.args.get('q', '')))
+    
+    def build_query(entity):
+        query = log_listing_query(filtered_logs_query(request.args, entity), entity)
+        return query.add_columns(snippet_column('access_log_fts')) if searching else query
+    
+    if searching and request.args.get('sort') == 'relevance':
+        # Mais relevantes primeiro (bm25), apenas a primeira página
+        logs_list = rank_by_relevance(build_query, sources, per_page)
+        next_cursor = prev_cursor = None
+    else:
+        # Obter apenas a página solicitada, ordenada pelos mais recentes
+        logs_list, next_cursor, prev_cursor = paginate_by_cursor(
+            build_query,
+            sources,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=per_page
+        )
+    
+    # Nomes de usuário e dispositivo da página (uma consulta por tabela)
+    logs_list = with_names(logs_list)
+    
+    # Parâmetros de filtro a preservar nos links de navegação
+    filter_args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    
+    return render_template('logs.html',
+                         logs=logs_list,
+                         next_cursor=next_cursor,
+                         prev_cursor=prev_cursor,
+                         filter_args=filter_args)
+
+
+# ========== EXPORTAÇÃO DE LOGS (STREAMING) ==========
+
+# Colunas exportadas (na ordem do CSV)
+EXPORT_COLUMNS = ['id', 'username', 'device_name', 'action', 'status', 'ip_address',
+                  'access_time', 'user_agent', 'details', 'is_suspicious']
+
+
+def iter_export_rows(args):
+    """
+    Percorre os logs filtrados em blocos com cursor do lado do servidor
+    (yield_per), mantendo em memória apenas um bloco por vez. Percorre a
+    tabela principal e depois os arquivos mensais do período, do mais
+    recente para o mais antigo.
+    
+    Args:
+        args: Parâmetros da requisição (mesmos filtros de logs())
+    
+    Yields:
+        dict: Um registro de log por vez, com as colunas de EXPORT_COLUMNS
+    """
+    chunk_size = current_app.config['LOGS_EXPORT_CHUNK_SIZE']
+    names = {}
+    for source in log_sources(*log_date_range(args)):
+        source.attach()
+        entity = source.entity
+        export_rows = iter(log_listing_query(filtered_logs_query(args, entity), entity, ('user_agent',))
+                           .order_by(entity.access_time.desc(), entity.id.desc())
+                           .yield_per(chunk_size))
+        while True:
+            chunk = list(islice(export_rows, chunk_size))
+            if not chunk:
+                break
+            for row in with_names(chunk, names):
+                record = {column: getattr(row, column) for column in EXPORT_COLUMNS}
+                record['access_time'] = row.access_time.isoformat() if row.access_time else None
+                yield record
+
+
+def export_args_error(args):
+    """
+    Valida os filtros da exportação antes de iniciar o streaming: depois que
+    os cabeçalhos são enviados, um erro só interromperia o arquivo no meio.
+    
+    Returns:
+        Resposta 400 em JSON se algum filtro for inválido, ou None
+    """
+    try:
+        log_date_range(args)
+    except ValueError:
+        return jsonify({'error': 'Data inválida (use AAAA-MM-DD)'}), 400
+    return None
+
+
+def export_filename(extension):
+    """Nome do arquivo exportado com data/hora da geração"""
+    return f"logs_{get_brasilia_now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+@logs_bp.route('/logs/export.csv')
+@login_required
+def export_csv():
+    """
+    Exporta os logs filtrados em CSV, gerando o arquivo aos poucos.
+    Aceita os mesmos filtros de logs(); usuários comuns exportam apenas
+    seus próprios logs.
+    """
+    args = request.args.copy()
+    error = export_args_error(args)
+    if error:
+        return error
+    chunk_size = current_app.config['LOGS_EXPORT_CHUNK_SIZE']
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM UTF-8 para compatibilidade com Excel (mesmo formato do exportTableToCSV)
+        buffer.write('\ufeff')
+        writer.writerow(EXPORT_COLUMNS)
+        for count, record in enumerate(iter_export_rows(args), 1):
+            writer.writerow([record[column] for column in EXPORT_COLUMNS])
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={export_filename("csv")}'}
+    )
+
+
+@logs_bp.route('/logs/export.ndjson')
+@login_required
+def export_ndjson():
+    """
+    Exporta os logs filtrados em NDJSON (um objeto JSON por linha).
+    Aceita os mesmos filtros de logs(); usuários comuns exportam apenas
+    seus próprios logs.
+    """
+    args = request.args.copy()
+    error = export_args_error(args)
+    if error:
+        return error
+    
+    def generate():
+        for record in iter_export_rows(args):
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={export_filename("ndjson")}'}
+    )
+
+
+# ========== TRANSMISSÃO AO VIVO (SSE) ==========
+
+@logs_bp.route('/logs/stream')
+@login_required
+def stream():
+    """
+    Envia os logs novos à medida que são gravados (Server-Sent Events).
+    Aceita os mesmos filtros de logs(), com a mesma visibilidade (usuários
+    comuns recebem apenas seus próprios logs); administradores recebem
+    também os alertas novos com alerts=1.
+    
+    Todas as conexões do processo compartilham uma única consulta periódica
+    (ver stream.py). Ao reconectar, o navegador envia Last-Event-ID e recebe
+    os eventos que perdeu.
+    """
+    try:
+        log_filter = LogFilter(request.args, current_user.id, current_user.role == UserRole.ADMIN)
+    except ValueError:
+        return jsonify({'error': 'Filtro inválido'}), 400
+    
+    subscriber = live_stream.subscribe(log_filter, request.headers.get('Last-Event-ID'))
+    if subscriber is None:
+        return jsonify({'error': 'Limite de conexões ao vivo atingido'}), 503
+    heartbeat = live_stream.heartbeat
+    
+    def generate():
+        try:
+            # Intervalo de reconexão do navegador (ms)
+            yield 'retry: 5000\n\n'
+            while not subscriber.dropped:
+                event = subscriber.get(timeout=heartbeat)
+                # Comentário periódico mantém a conexão e detecta clientes que saíram
+                yield format_sse(event) if event else ': ping\n\n'
+        finally:
+            live_stream.unsubscribe(subscriber)
     
-    return render_template('logs.html', logs=logs_list)
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 # ========== ROTA: ESTATÍSTICAS DE LOGS ==========
@@ -83,36 +547,40 @@ def logs_stats():
     """
     Retorna estatísticas de logs em formato JSON.
     Apenas administradores podem acessar.
+    Os valores vêm dos rollups horários (ver rollups.py).
     
     Retorna:
     - total_logs: Total de logs no sistema
     - suspicious_logs: Logs marcados como suspeitos
     - failed_logins: Tentativas de login falhadas
     - recent_logs_24h: Logs das últimas 24 horas
+    - login_throttle: Contadores da limitação de login deste processo
     """
     # Verificar se é administrador
     if current_user.role != UserRole.ADMIN:
         return jsonify({'error': 'Acesso negado'}), 403
     
     # ========== CALCULAR ESTATÍSTICAS ==========
+    # Lidas dos rollups horários (poucas linhas pré-agregadas), não de AccessLog
     
     # Total de logs
-    total_logs = AccessLog.query.count()
+    total_logs = rollup_count()
     
     # Logs suspeitos
-    suspicious_logs = AccessLog.query.filter_by(is_suspicious=True).count()
+    suspicious_logs = rollup_count(is_suspicious=True)
     
     # Tentativas de login falhadas
-    failed_logins = AccessLog.query.filter_by(action='failed_login', status='failed').count()
+    failed_logins = rollup_count(action='failed_login', status='failed')
     
     # Logs das últimas 24 horas
     last_24h = get_brasilia_now() - timedelta(hours=24)
-    recent_logs = AccessLog.query.filter(AccessLog.access_time >= last_24h).count()
+    recent_logs = rollup_count(since=last_24h)
     
     # Retornar como JSON
     return jsonify({
         'total_logs': total_logs,
         'suspicious_logs': suspicious_logs,
         'failed_logins': failed_logins,
-        'recent_logs_24h': recent_logs
+        'recent_logs_24h': recent_logs,
+        'login_throttle': dict(login_throttle.stats)
     })
\ No newline at end of file
@@ -9,6 +9,8 @@ Responsável por:
 from flask import Blueprint, render_template
 from flask_login import login_required, current_user
 from models import User, Device, AccessLog, Alert, UserRole
+from blueprints.logs import log_listing_query, with_names
+from cache import dashboard_cache
 
 # Criação do blueprint
 main_bp = Blueprint('main', __name__)
@@ -26,16 +28,24 @@ def dashboard():
     - Total de dispositivos
     - Últimos 10 acessos registrados
     - Número de alertas não resolvidos
+    
+    Os valores vêm do dashboard_cache (ver cache.py), invalidado pelas
+    rotas e gravações que os alteram.
     """
     # Contar total de usuários e dispositivos
-    total_users = User.query.count()
-    total_devices = Device.query.count()
+    total_users = dashboard_cache.get('total_users', User.query.count)
+    total_devices = dashboard_cache.get('total_devices', Device.query.count)
     
     # Pegar últimos 10 acessos (ordenados por data mais recente)
-    recent_logs = AccessLog.query.order_by(AccessLog.access_time.desc()).limit(10).all()
+    # Projeção plana + nomes de usuário e dispositivo em uma consulta por tabela
+    recent_logs = dashboard_cache.get('recent_logs', lambda: with_names(
+        log_listing_query(AccessLog.query)
+        .order_by(AccessLog.access_time.desc(), AccessLog.id.desc())
+        .limit(10).all()))
     
     # Contar alertas não resolvidos
-    active_alerts = Alert.query.filter_by(is_resolved=False).count()
+    active_alerts = dashboard_cache.get(
+        'active_alerts', Alert.query.filter_by(is_resolved=False).count)
     
     return render_template('dashboard.html',
                          total_users=total_users,
@@ -0,0 +1,43 @@
+"""
+Blueprint de desempenho (perf).
+Acesso restrito apenas a administradores.
+Responsável por:
+- Exibir percentis de tempo, renderização e SQL por endpoint (ver profiling.py)
+- Listar os comandos SQL mais lentos com o plano de execução
+- Zerar as medidas acumuladas
+"""
+
+from flask import Blueprint, render_template, flash, redirect, url_for
+from flask_login import login_required
+from blueprints.users import admin_required
+from profiling import request_profiler, explain
+
+# Criação do blueprint (registrado com url_prefix /admin)
+perf_bp = Blueprint('perf', __name__)
+
+
+# ========== ROTA: DESEMPENHO ==========
+
+@perf_bp.route('/perf')
+@login_required
+@admin_required
+def perf():
+    """
+    Exibe os tempos por endpoint das requisições recentes deste processo e
+    os comandos SQL mais lentos, com o plano de execução de cada um.
+    """
+    slow = [(statement, explain(statement)) for statement in request_profiler.slow_statements()]
+    return render_template('perf.html', endpoints=request_profiler.endpoint_stats(), slow=slow,
+                           enabled=request_profiler.enabled)
+
+
+# ========== ROTA: ZERAR MEDIDAS ==========
+
+@perf_bp.route('/perf/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_perf():
+    """Descarta as medidas acumuladas (percentis e comandos lentos)"""
+    request_profiler.reset()
+    flash('Medidas de desempenho zeradas.', 'success')
+    return redirect(url_for('perf.perf'))
@@ -6,6 +6,7 @@ Responsável por:
 - Criar novos usuários
 - Ativar/desativar usuários
 - Gerenciar permissões de usuários em dispositivos
+- Aplicar matrizes de permissões em lote via JSON
 """
 
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
@@ -14,6 +15,9 @@ from werkzeug.security import generate_password_hash
 from extensions import db
 from models import User, UserRole, UserPermission, Device
 from werkzeug.security import check_password_hash
+from cache import dashboard_cache, permission_cache, Grant
+from rollups import discard_rollups
+from data_version import ALERTS, LOGS, bump_versions
 
 # Criação do blueprint com url_prefix (todas as rotas começam com /admin)
 users_bp = Blueprint('users', __name__)
@@ -36,6 +40,88 @@ def admin_required(func):
     return decorated_view
 
 
+# ========== FUNÇÃO AUXILIAR: ALTERAÇÃO DE PERMISSÕES EM LOTE ==========
+
+# Quantidade máxima de ids por cláusula IN (limite de variáveis do SQLite)
+IN_CHUNK_SIZE = 500
+
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    """Divide uma lista em blocos de até size elementos"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def apply_permission_changes(desired, granted_by):
+    """
+    Aplica um conjunto de permissões desejadas com operações em lote.
+    Carrega as permissões existentes dos pares informados, calcula a
+    diferença em memória e executa INSERT/UPDATE/DELETE em massa, sem uma
+    consulta por par usuário/dispositivo. Não faz commit: o chamador
+    controla a transação.
+    
+    Args:
+        desired: dict (user_id, device_id) -> Grant, ou None para remover.
+                 Um Grant sem nenhum bit ligado também remove a permissão.
+        granted_by: ID do administrador que concede as novas permissões
+    
+    Returns:
+        dict: Contagens created/updated/deleted/unchanged e user_ids
+              (usuários com alguma alteração, para invalidar caches)
+    """
+    user_ids = sorted({user_id for user_id, _ in desired})
+    device_ids = sorted({device_id for _, device_id in desired})
+    
+    # Buscar existentes pelo eixo com menos ids (ex: um único usuário ou dispositivo)
+    column, ids = ((UserPermission.user_id, user_ids) if len(user_ids) <= len(device_ids)
+                   else (UserPermission.device_id, device_ids))
+    existing = {}
+    for chunk in _chunks(ids):
+        rows = (UserPermission.query
+                .filter(column.in_(chunk))
+                .with_entities(UserPermission.id, UserPermission.user_id, UserPermission.device_id,
+                               UserPermission.can_read, UserPermission.can_write,
+                               UserPermission.can_execute)
+                .all())
+        existing.update({(row.user_id, row.device_id): row
+                         for row in rows if (row.user_id, row.device_id) in desired})
+    
+    # ========== CALCULAR DIFERENÇA ==========
+    inserts, updates, deletes = [], [], []
+    changed_users = set()
+    for (user_id, device_id), grant in desired.items():
+        row = existing.get((user_id, device_id))
+        if grant is None or not any(grant):
+            if row is not None:
+                deletes.append(row.id)
+                changed_users.add(user_id)
+        elif row is None:
+            inserts.append(dict(user_id=user_id, device_id=device_id,
+                                can_read=grant.can_read, can_write=grant.can_write,
+                                can_execute=grant.can_execute, granted_by=granted_by))
+            changed_users.add(user_id)
+        elif (bool(row.can_read), bool(row.can_write), bool(row.can_execute)) != tuple(grant):
+            updates.append(dict(id=row.id, can_read=grant.can_read, can_write=grant.can_write,
+                                can_execute=grant.can_execute))
+            changed_users.add(user_id)
+    
+    # ========== APLICAR EM LOTE ==========
+    if inserts:
+        db.session.bulk_insert_mappings(UserPermission, inserts)
+    if updates:
+        db.session.bulk_update_mappings(UserPermission, updates)
+    for chunk in _chunks(deletes):
+        UserPermission.query.filter(UserPermission.id.in_(chunk)).delete(synchronize_session=False)
+    
+    return {
+        'created': len(inserts),
+        'updated': len(updates),
+        'deleted': len(deletes),
+        'unchanged': len(desired) - len(inserts) - len(updates) - len(deletes),
+        'user_ids': changed_users
+    }
+
+
 # ========== ROTA: LISTAR USUÁRIOS ==========
 
 @users_bp.route('/users')
@@ -83,6 +169,7 @@ def add_user():
         
         db.session.add(new_user)
         db.session.commit()
+        dashboard_cache.incr('total_users')
         
         flash('Usuário criado com sucesso!', 'success')
         return redirect(url_for('users.users'))
@@ -140,6 +227,10 @@ def edit_user(user_id):
             flash('Email já está em uso por outro usuário.', 'error')
             return redirect(url_for('users.edit_user', user_id=user.id))
 
+        # Novo nome aparece nos logs listados pela API (username): muda a versão (ETag)
+        if username != user.username:
+            bump_versions(LOGS)
+
         # Atualizar campos
         user.username = username
         user.email = email
@@ -188,8 +279,13 @@ def delete_user(user_id):
             return redirect(url_for('users.users'))
 
     try:
+        # Logs do usuário são removidos em cascata (contagens dos rollups junto)
+        discard_rollups(user_id=user.id)
+        bump_versions(LOGS, ALERTS)
         db.session.delete(user)
         db.session.commit()
+        dashboard_cache.invalidate('total_users', 'recent_logs')
+        permission_cache.invalidate(user.id)
         flash('Usuário deletado com sucesso.', 'success')
     except Exception:
         db.session.rollback()
@@ -215,35 +311,16 @@ def user_permissions(user_id):
     devices = Device.query.all()
 
     if request.method == 'POST':
-        # Processar cada dispositivo
+        # Um checkbox por dispositivo: acesso permitido (somente leitura) ou não
+        desired = {
+            (user.id, d.id): Grant(True, False, False) if request.form.get(f'perm_{d.id}') else None
+            for d in devices
+        }
         try:
-            for d in devices:
-                    # Agora há apenas um checkbox por dispositivo: acesso permitido ou não
-                    allowed = bool(request.form.get(f'perm_{d.id}'))
-
-                    perm = UserPermission.query.filter_by(user_id=user.id, device_id=d.id).first()
-                    if allowed:
-                        # criar/atualizar permissão: definir can_read=True, demais False (modelo mantém campos)
-                        if perm:
-                            perm.can_read = True
-                            perm.can_write = False
-                            perm.can_execute = False
-                        else:
-                            perm = UserPermission(
-                                user_id=user.id,
-                                device_id=d.id,
-                                can_read=True,
-                                can_write=False,
-                                can_execute=False,
-                                granted_by=current_user.id
-                            )
-                            db.session.add(perm)
-                    else:
-                        # remover permissão se existir
-                        if perm:
-                            db.session.delete(perm)
-
+            # Diferença calculada em memória e aplicada em operações em lote
+            changes = apply_permission_changes(desired, granted_by=current_user.id)
             db.session.commit()
+            permission_cache.invalidate(*changes['user_ids'])
             flash('Permissões atualizadas com sucesso.', 'success')
         except Exception:
             db.session.rollback()
@@ -257,4 +334,73 @@ def user_permissions(user_id):
     return render_template('user_permissions.html', 
                          user=user, 
                          devices=devices, 
-                         user_permissions=user_permissions)
\ No newline at end of file
+                         user_permissions=user_permissions)
+
+
+# ========== API: APLICAR MATRIZ DE PERMISSÕES ==========
+
+@users_bp.route('/permissions', methods=['POST'])
+@login_required
+def apply_permission_matrix():
+    """
+    Aplica várias permissões (muitos usuários x muitos dispositivos) em uma
+    única transação. Apenas administradores.
+    
+    Corpo JSON:
+        {"grants": [{"user_id": 1, "device_id": 2,
+                     "can_read": true, "can_write": false, "can_execute": false}, ...]}
+    
+    Pares não listados não são alterados; um par com todos os bits falsos
+    tem a permissão removida.
+    
+    Retorna:
+    - created/updated/deleted/unchanged: Contagens das alterações
+    """
+    # Verificar se é administrador
+    if current_user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    grants = payload.get('grants')
+    if not isinstance(grants, list):
+        return jsonify({'error': 'Campo "grants" (lista) é obrigatório'}), 400
+    
+    # ========== VALIDAR ENTRADA ==========
+    desired = {}
+    try:
+        for item in grants:
+            key = (int(item['user_id']), int(item['device_id']))
+            # Apenas booleanos JSON: bool("false") seria True
+            flags = [item.get(flag, False) for flag in ('can_read', 'can_write', 'can_execute')]
+            if not all(isinstance(value, bool) for value in flags):
+                raise ValueError(item)
+            desired[key] = Grant(*flags)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Cada item precisa de user_id e device_id inteiros '
+                                 'e can_read/can_write/can_execute booleanos (true/false)'}), 400
+    
+    # Verificar se usuários e dispositivos existem (uma consulta por bloco de ids)
+    user_ids = sorted({u for u, _ in desired})
+    device_ids = sorted({d for _, d in desired})
+    found_users = {row.id for chunk in _chunks(user_ids)
+                   for row in User.query.filter(User.id.in_(chunk)).with_entities(User.id)}
+    found_devices = {row.id for chunk in _chunks(device_ids)
+                     for row in Device.query.filter(Device.id.in_(chunk)).with_entities(Device.id)}
+    missing_users = sorted(set(user_ids) - found_users)
+    missing_devices = sorted(set(device_ids) - found_devices)
+    if missing_users or missing_devices:
+        return jsonify({'error': 'Usuários ou dispositivos inexistentes',
+                        'missing_users': missing_users,
+                        'missing_devices': missing_devices}), 400
+    
+    # ========== APLICAR ==========
+    try:
+        changes = apply_permission_changes(desired, granted_by=current_user.id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return jsonify({'error': 'Erro ao atualizar permissões'}), 500
+    
+    permission_cache.invalidate(*changes['user_ids'])
+    changes.pop('user_ids')
+    return jsonify(changes)
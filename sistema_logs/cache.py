@@ -0,0 +1,189 @@
+"""
+Caches em memória por processo.
+
+CounterCache (dashboard_cache): valores do dashboard.
+Guarda contadores e listas baratas de reaproveitar (total de usuários,
+dispositivos, alertas ativos e logs recentes). Cada valor é invalidado pelo
+código que o altera (cadastro/remoção de usuários e dispositivos, gravação de
+logs e alertas, resolução de alertas) e também expira após
+DASHBOARD_CACHE_TTL segundos, o que cobre alterações feitas por outros
+processos/workers.
+
+PermissionCache (permission_cache): permissões de usuários em dispositivos.
+Mapeia usuário -> {device_id: Grant(read, write, execute)}, carregado uma vez
+por usuário e invalidado quando as permissões, o usuário ou o dispositivo
+mudam. Cada usuário tem um contador de geração incrementado pela
+invalidação: uma carga que começou antes dela não é guardada (a leitura do
+banco pode ser anterior à revogação). As permissões também expiram após
+PERMISSION_CACHE_TTL segundos, o que cobre revogações feitas por outros
+processos/workers. Limitado a PERMISSION_CACHE_SIZE usuários (LRU).
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from models import UserPermission
+
+
+class CounterCache:
+    """
+    Cache chave -> valor com expiração (TTL) e estatísticas de acerto.
+    Segue o padrão das extensões Flask (instância no módulo + init_app).
+    """
+
+    def __init__(self, app=None, ttl=60):
+        self.ttl = ttl
+        self._values = {}  # chave -> (valor, expira_em)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lê o TTL da configuração e começa com o cache vazio"""
+        self.ttl = app.config.get('DASHBOARD_CACHE_TTL', self.ttl)
+        self.clear()
+        app.extensions['dashboard_cache'] = self
+
+    def get(self, key, loader):
+        """
+        Retorna o valor em cache ou calcula com loader() e guarda.
+
+        Args:
+            key: Nome do valor (ex: 'total_users')
+            loader: Função sem argumentos que calcula o valor
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and entry[1] > now:
+                self.stats['hits'] += 1
+                return entry[0]
+            self.stats['misses'] += 1
+        value = loader()
+        with self._lock:
+            self._values[key] = (value, now + self.ttl)
+        return value
+
+    def incr(self, key, delta=1):
+        """Soma delta a um contador já em cache (sem efeito se não estiver)"""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None:
+                self._values[key] = (entry[0] + delta, entry[1])
+
+    def invalidate(self, *keys):
+        """Remove valores do cache (recalculados na próxima leitura)"""
+        with self._lock:
+            for key in keys:
+                if self._values.pop(key, None) is not None:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._values.clear()
+
+    def hit_ratio(self):
+        """Fração de leituras atendidas pelo cache"""
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+
+# Bits de permissão de um usuário em um dispositivo
+Grant = namedtuple('Grant', 'can_read can_write can_execute')
+
+
+class PermissionCache:
+    """
+    Cache LRU de permissões por usuário.
+    A consulta ao banco acontece apenas na primeira leitura de cada usuário
+    (ou depois de uma invalidação ou da expiração); as verificações seguintes
+    são consultas a um dict.
+    """
+
+    def __init__(self, app=None, max_users=10000, ttl=30):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._grants = OrderedDict()  # user_id -> ({device_id: Grant}, expira_em)
+        self._generations = {}        # user_id -> invalidações desde o último clear
+        self._epoch = 0               # incrementado por clear
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lê o limite de usuários e o TTL da configuração e começa com o cache vazio"""
+        self.max_users = app.config.get('PERMISSION_CACHE_SIZE', self.max_users)
+        self.ttl = app.config.get('PERMISSION_CACHE_TTL', self.ttl)
+        self.clear()
+        app.extensions['permission_cache'] = self
+
+    def grants(self, user_id):
+        """
+        Permissões de um usuário.
+
+        Returns:
+            dict: device_id -> Grant (apenas dispositivos com permissão)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._grants.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._grants.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry[0]
+            self.stats['misses'] += 1
+            generation = (self._epoch, self._generations.get(user_id, 0))
+
+        grants = self._load(user_id)
+        with self._lock:
+            # Invalidado durante a carga: devolve o que leu, mas não guarda
+            if generation != (self._epoch, self._generations.get(user_id, 0)):
+                return grants
+            self._grants[user_id] = (grants, now + self.ttl)
+            self._grants.move_to_end(user_id)
+            while len(self._grants) > self.max_users:
+                self._grants.popitem(last=False)
+                self.stats['evictions'] += 1
+        return grants
+
+    def get(self, user_id, device_id):
+        """Grant do usuário no dispositivo, ou None se não houver permissão"""
+        return self.grants(user_id).get(device_id)
+
+    def invalidate(self, *user_ids):
+        """Descarta as permissões em cache dos usuários informados"""
+        with self._lock:
+            for user_id in user_ids:
+                self._grants.pop(user_id, None)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        """Descarta todas as permissões (ex: dispositivo removido)"""
+        with self._lock:
+            self._grants.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    @staticmethod
+    def _load(user_id):
+        """Carrega do banco as permissões de um usuário"""
+        rows = (UserPermission.query
+                .filter_by(user_id=user_id)
+                .with_entities(UserPermission.device_id,
+                               UserPermission.can_read,
+                               UserPermission.can_write,
+                               UserPermission.can_execute)
+                .all())
+        return {row.device_id: Grant(bool(row.can_read), bool(row.can_write), bool(row.can_execute))
+                for row in rows}
+
+
+# Instância única usada pelo dashboard (inicializada em create_app)
+dashboard_cache = CounterCache()
+
+# Instância única usada pelas verificações de acesso a dispositivos
+permission_cache = PermissionCache()
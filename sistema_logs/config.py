@@ -23,6 +23,19 @@ class Config:
     # Desativa aviso de modificações de modelos (melhora performance)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # ========== BANCO DE LOGS (BIND OPCIONAL) ==========
+    # Com LOGS_DATABASE_URL, AccessLog/Alert/rollups ficam em um banco próprio e
+    # a gravação de logs não disputa o lock do banco de usuários e dispositivos
+    SQLALCHEMY_BINDS = {'logs': os.environ['LOGS_DATABASE_URL']} if os.environ.get('LOGS_DATABASE_URL') else {}
+    
+    # PRAGMAs aplicados a cada conexão SQLite, por bind (None = banco principal).
+    # WAL: leituras não bloqueiam a escrita; busy_timeout: espera o lock em vez de falhar
+    SQLITE_PRAGMAS = {
+        None: {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000},
+        'logs': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000,
+                 'cache_size': -32000, 'temp_store': 'MEMORY'},
+    }
+    
     # ========== CONFIGURAÇÕES DE SESSÃO ==========
     # Tempo de expiração da sessão: 2 horas
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
@@ -36,6 +49,190 @@ class Config:
     
     # SameSite: Proteção contra CSRF ('Lax' ou 'Strict')
     SESSION_COOKIE_SAMESITE = 'Lax'
+    
+    # ========== CONFIGURAÇÕES DE LOGS ==========
+    # Quantidade de registros por página na tela de logs (paginação por cursor)
+    LOGS_PAGE_SIZE = 50
+    
+    # Limite máximo aceito no parâmetro per_page
+    LOGS_MAX_PAGE_SIZE = 500
+    
+    # Linhas buscadas do banco por vez nas exportações CSV/NDJSON
+    LOGS_EXPORT_CHUNK_SIZE = 1000
+    
+    # ========== GRAVAÇÃO DE LOGS DE ACESSO ==========
+    # Modo assíncrono: eventos vão para uma fila e são gravados em lotes
+    ACCESS_LOG_ASYNC = os.environ.get('ACCESS_LOG_ASYNC', '').lower() in ('1', 'true', 'yes')
+    
+    # Capacidade da fila (acima disso, a gravação volta a ser síncrona)
+    ACCESS_LOG_QUEUE_SIZE = 10000
+    
+    # Tamanho máximo do lote e janela de tempo (segundos) de cada commit
+    ACCESS_LOG_BATCH_SIZE = 500
+    ACCESS_LOG_FLUSH_INTERVAL = 0.5
+    
+    # Espera máxima (segundos) por espaço na fila antes de gravar na hora
+    ACCESS_LOG_ENQUEUE_TIMEOUT = 0.05
+    
+    # Janela (segundos) para agrupar eventos suspeitos repetidos em um só alerta
+    ALERT_COALESCE_WINDOW = 900
+    
+    # ========== INGESTÃO EM LOTE (API) ==========
+    # Tokens aceitos em /api/v1/ingest (Authorization: Bearer), separados por vírgula
+    INGEST_API_TOKENS = [t.strip() for t in os.environ.get('INGEST_API_TOKENS', '').split(',') if t.strip()]
+    
+    # Limites de cada lote (eventos e tamanho do corpo em bytes)
+    INGEST_MAX_EVENTS = 50000
+    INGEST_MAX_BYTES = 32 * 1024 * 1024
+    
+    # Linhas por executemany dentro da transação do lote
+    INGEST_INSERT_CHUNK_SIZE = 5000
+    
+    # ========== RECEPTOR DE SYSLOG (syslog_listener.py) ==========
+    # Endereço e porta de escuta (UDP; TCP na mesma porta se SYSLOG_TCP)
+    SYSLOG_HOST = os.environ.get('SYSLOG_HOST', '0.0.0.0')
+    SYSLOG_PORT = int(os.environ.get('SYSLOG_PORT', 5514))
+    SYSLOG_TCP = True
+    
+    # Padrões que convertem mensagens em logs de acesso (o primeiro que casar vale).
+    # Grupos nomeados: user (username), ip (IP do cliente), action, status
+    SYSLOG_PATTERNS = [
+        {'app': 'sshd', 'regex': r'Accepted \S+ for (?P<user>\S+) from (?P<ip>\S+)',
+         'action': 'ssh_login', 'status': 'success'},
+        {'app': 'sshd', 'regex': r'Failed \S+ for invalid user (?P<user>\S+) from (?P<ip>\S+)',
+         'action': 'ssh_login', 'status': 'failed', 'suspicious': True},
+        {'app': 'sshd', 'regex': r'Failed \S+ for (?P<user>\S+) from (?P<ip>\S+)',
+         'action': 'ssh_login', 'status': 'failed'},
+    ]
+    
+    # Usuário atribuído quando a mensagem não cita um usuário cadastrado (None = descartar)
+    SYSLOG_DEFAULT_USER = os.environ.get('SYSLOG_DEFAULT_USER')
+    
+    # Aceitar mensagens de IPs que não são dispositivos cadastrados (device_id vazio)
+    SYSLOG_ACCEPT_UNKNOWN_DEVICES = False
+    
+    # Eventos por lote gravado e tempo máximo (segundos) de espera de um lote parcial
+    SYSLOG_BATCH_SIZE = 1000
+    SYSLOG_FLUSH_INTERVAL = 0.5
+    
+    # Eventos pendentes de gravação (acima disso, mensagens novas são descartadas)
+    SYSLOG_QUEUE_SIZE = 50000
+    
+    # Intervalo (segundos) de recarga dos IPs de dispositivos e nomes de usuários
+    SYSLOG_REFRESH_INTERVAL = 60
+    
+    # ========== DETECÇÃO DE ANOMALIAS (flask anomaly score) ==========
+    # Dias de histórico que formam o perfil de cada usuário
+    ANOMALY_HISTORY_DAYS = 30
+    
+    # Logs mínimos no histórico para pontuar um usuário
+    ANOMALY_MIN_HISTORY = 20
+    
+    # Pontuação (0 a 1) a partir da qual o log é marcado como suspeito
+    ANOMALY_THRESHOLD = 0.6
+    
+    # Peso de cada componente: horário, dispositivo novo, IP novo e falha
+    ANOMALY_WEIGHTS = {'hour': 1.0, 'device': 1.0, 'ip': 1.0, 'failure': 1.0}
+    
+    # Nível dos alertas gerados (separados dos alertas das regras fixas)
+    ANOMALY_ALERT_LEVEL = 'medium'
+    
+    # Arquivo com o último id pontuado (relativo à pasta instance)
+    ANOMALY_STATE_FILE = 'anomaly_state.json'
+    
+    # ========== PRIMEIRO ACESSO POR IP/DISPOSITIVO (sketches.py) ==========
+    # Marcar como suspeito o login/acesso a partir de IP ou dispositivo novo para o usuário
+    # (cada um gera alerta HIGH). Desligado por padrão: ao ativar, executar antes
+    # flask sketches rebuild para que acessos já conhecidos não gerem alertas
+    NEW_ACCESS_DETECTION = False
+    
+    # IPs (ou dispositivos) distintos por usuário para os quais o filtro é dimensionado
+    NEW_ACCESS_EXPECTED_ITEMS = 256
+    
+    # Probabilidade de um IP novo passar por conhecido (com até EXPECTED_ITEMS valores)
+    # 256 valores a 1%: cerca de 300 bytes por filtro, dois filtros por usuário
+    NEW_ACCESS_FP_RATE = 0.01
+    
+    # Usuários com filtros em memória por processo (os demais são lidos do banco)
+    NEW_ACCESS_MAX_USERS = 10000
+    
+    # Ações verificadas (somente com status 'success')
+    NEW_ACCESS_ACTIONS = ('system_login', 'device_access')
+    
+    # ========== MEDIÇÃO DE DESEMPENHO (/admin/perf) ==========
+    # Medir tempo, templates e SQL de cada requisição (custo baixo; pode ficar ligado)
+    PERF_MONITORING = True
+    
+    # Requisições recentes por endpoint usadas nos percentis
+    PERF_WINDOW_SIZE = 1000
+    
+    # Comandos SQL a partir desta duração (ms) são guardados com o plano de execução
+    PERF_SLOW_QUERY_MS = 100
+    
+    # Quantidade máxima de comandos lentos guardados (os mais antigos são descartados)
+    PERF_SLOW_QUERIES_KEPT = 200
+    
+    # ========== MÉTRICAS PROMETHEUS (/metrics) ==========
+    # Expor /metrics (requer prometheus_client). Com vários workers, definir
+    # PROMETHEUS_MULTIPROC_DIR no ambiente (ver metrics.py)
+    METRICS_ENABLED = True
+    
+    # Token exigido em Authorization: Bearer (sem token, /metrics é aberto)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # ========== TRANSMISSÃO AO VIVO (SSE) ==========
+    # Intervalo (segundos) da consulta de logs/alertas novos (uma por processo)
+    LIVE_STREAM_POLL_INTERVAL = 1.0
+    
+    # Intervalo (segundos) do comentário que mantém a conexão aberta
+    LIVE_STREAM_HEARTBEAT = 15
+    
+    # Eventos pendentes por conexão (acima disso o cliente é desconectado)
+    LIVE_STREAM_QUEUE_SIZE = 500
+    
+    # Eventos recentes guardados para reenviar em reconexões
+    LIVE_STREAM_BACKLOG = 1000
+    
+    # Máximo de conexões simultâneas por processo
+    LIVE_STREAM_MAX_SUBSCRIBERS = 1000
+    
+    # ========== CACHE DO DASHBOARD ==========
+    # Validade máxima (segundos) dos contadores em cache, mesmo sem invalidação
+    DASHBOARD_CACHE_TTL = 60
+    
+    # ========== CACHE DE PERMISSÕES ==========
+    # Máximo de usuários com permissões em memória (os menos usados saem primeiro)
+    PERMISSION_CACHE_SIZE = 10000
+    
+    # Validade máxima (segundos) das permissões em cache: revogações feitas em
+    # outro processo/worker passam a valer aqui depois desse tempo
+    PERMISSION_CACHE_TTL = 30
+    
+    # ========== LIMITAÇÃO DE TENTATIVAS DE LOGIN ==========
+    LOGIN_THROTTLE_ENABLED = True
+    
+    # Janela deslizante (segundos) e falhas permitidas por usuário e por IP
+    LOGIN_THROTTLE_WINDOW = 300
+    LOGIN_THROTTLE_MAX_PER_USER = 5
+    LOGIN_THROTTLE_MAX_PER_IP = 20
+    
+    # Bloqueio inicial (segundos), dobrado a cada bloqueio seguido até o máximo
+    LOGIN_THROTTLE_LOCKOUT = 60
+    LOGIN_THROTTLE_MAX_LOCKOUT = 3600
+    
+    # Arquivo SQLite para compartilhar contadores entre workers (None = memória)
+    LOGIN_THROTTLE_STORAGE = os.environ.get('LOGIN_THROTTLE_STORAGE')
+    
+    # ========== ARQUIVAMENTO DE LOGS ==========
+    # Pasta dos arquivos mensais (relativa à pasta instance se não for absoluta)
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+    
+    # Dias de logs mantidos na tabela principal e linhas movidas por transação
+    ARCHIVE_RETENTION_DAYS = 90
+    ARCHIVE_CHUNK_SIZE = 5000
+    
+    # Intervalo (segundos) do arquivamento automático em segundo plano (None = desligado)
+    ARCHIVE_INTERVAL = int(os.environ['ARCHIVE_INTERVAL']) if os.environ.get('ARCHIVE_INTERVAL') else None
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,65 @@
+"""
+Versão dos dados de logs e de alertas (DataVersion).
+
+Cada conjunto ('logs', 'alerts') tem um contador incrementado na mesma
+transação de toda alteração: gravação de logs (persist_events, ingestão),
+marcação por anomalia, resolução de alertas, exclusão de usuários e
+dispositivos (logs em cascata) e arquivamento. A API usa o contador e o
+horário da última alteração como ETag/Last-Modified: validar uma requisição
+condicional custa uma leitura por chave primária, sem varrer AccessLog/Alert.
+
+O contador é uma linha por conjunto: gravações concorrentes no PostgreSQL
+esperam o lock dessa linha até o commit (no SQLite a escrita já é única).
+
+Responsável por:
+- Incrementar as versões na transação corrente (bump_versions)
+- Ler as versões atuais (current_versions)
+"""
+
+from extensions import db
+from models import DataVersion, get_brasilia_now
+
+# Conjuntos versionados
+LOGS = 'logs'
+ALERTS = 'alerts'
+
+
+def _dialect():
+    """Dialeto do banco das versões (pode ser o bind de logs, ver extensions.py)"""
+    return db.session.get_bind(DataVersion).dialect.name
+
+
+def bump_versions(*names):
+    """
+    Incrementa as versões informadas, na transação corrente (sem commit).
+
+    Args:
+        *names: LOGS e/ou ALERTS
+    """
+    if not names:
+        return
+    if _dialect() == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    now = get_brasilia_now().replace(tzinfo=None)
+    stmt = insert(DataVersion).values([{'name': name, 'version': 1, 'updated_at': now}
+                                       for name in sorted(set(names))])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': DataVersion.version + 1, 'updated_at': stmt.excluded.updated_at}
+    )
+    db.session.execute(stmt)
+
+
+def current_versions(*names):
+    """
+    Versões atuais (uma consulta por chave primária).
+
+    Returns:
+        dict: nome -> (versão, última alteração em Brasília sem fuso, ou None)
+    """
+    rows = (db.session.query(DataVersion.name, DataVersion.version, DataVersion.updated_at)
+            .filter(DataVersion.name.in_(names)).all())
+    found = {row.name: (row.version, row.updated_at) for row in rows}
+    return {name: found.get(name, (0, None)) for name in names}
@@ -7,17 +7,90 @@ Extensões incluídas:
 - SQLAlchemy: ORM para gerenciar banco de dados
 - LoginManager: Autenticação e gerenciamento de sessão
 - Migrate: Controle de versão do banco (Alembic)
+
+Bind de logs: tabelas marcadas com info={'bind_key': LOGS_BIND} (AccessLog,
+Alert e rollups) vão para o banco de SQLALCHEMY_BINDS['logs'] quando ele está
+configurado (LOGS_DATABASE_URL); sem ele, ficam no banco principal.
 """
 
+from functools import partial
+
 from flask_sqlalchemy import SQLAlchemy  # ORM para banco de dados
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager      # Gerenciador de autenticação
 from flask_migrate import Migrate         # Migrations do banco de dados
+from sqlalchemy import event, inspect
+from sqlalchemy.sql.util import find_tables
+
+from ip_ranges import register_sqlite_functions
+
+# Chave do bind opcional dos dados de logs e alertas
+LOGS_BIND = 'logs'
+
+
+class BindSession(Session):
+    """
+    Sessão que escolhe o banco pela chave bind_key do info da tabela.
+    Os modelos continuam em uma única MetaData (chaves estrangeiras e
+    create_all funcionam normalmente quando tudo está no mesmo banco); a
+    tabela só muda de banco se o bind estiver em SQLALCHEMY_BINDS.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            tables = [inspect(mapper).local_table] if mapper is not None else []
+            if clause is not None:
+                tables += find_tables(clause, include_crud=True)
+            for table in tables:
+                key = getattr(table, 'info', {}).get('bind_key')
+                if key is not None and key in self._db.engines:
+                    return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 
 # Instância do SQLAlchemy (ORM)
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': BindSession})
 
 # Gerenciador de login (autenticação e sessões)
 login_manager = LoginManager()
 
 # Sistema de migrations/versionamento do banco
-migrate = Migrate()
\ No newline at end of file
+migrate = Migrate()
+
+
+def _set_sqlite_pragmas(pragmas, dbapi_connection, connection_record):
+    """Aplica os PRAGMAs a cada nova conexão SQLite do pool"""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def init_sqlite_pragmas(app):
+    """
+    Registra os PRAGMAs de SQLITE_PRAGMAS em cada engine SQLite da aplicação
+    (chave None = banco principal, LOGS_BIND = banco de logs) e as funções
+    SQL auxiliares (ip_pack, ver ip_ranges.py).
+    Deve ser chamada logo após db.init_app, antes da primeira conexão.
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS', {})
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+            event.listen(engine, 'connect', register_sqlite_functions)
+            if pragmas.get(key):
+                event.listen(engine, 'connect', partial(_set_sqlite_pragmas, pragmas[key]))
+
+
+def create_tables():
+    """
+    Cria as tabelas que não existem, cada uma no banco do seu bind.
+    Substitui db.create_all(), que criaria todas no banco principal.
+    """
+    engines = {}
+    for table in db.metadata.tables.values():
+        engine = db.engines.get(table.info.get('bind_key'), db.engine)
+        engines.setdefault(engine, []).append(table)
+    for engine, tables in engines.items():
+        db.metadata.create_all(engine, tables=tables)
@@ -0,0 +1,271 @@
+"""
+Ingestão em lote de eventos de acesso enviados por dispositivos (rota /api/v1/ingest).
+
+Um lote (NDJSON, um evento por linha, ou array JSON) é validado de uma vez:
+usuários e dispositivos citados são conferidos com uma consulta IN por
+tabela, e os valores de ação, status e user agent são cadastrados nas
+tabelas de valores antes da gravação (ver interning.py). Os eventos válidos
+são gravados em uma única transação:
+- eventos comuns: INSERT com executemany (sem objetos ORM por linha)
+- eventos suspeitos: objetos AccessLog agrupados em alertas (coalesce_alerts,
+  mesma regra de log_access)
+- rollups horários atualizados na mesma transação (update_rollups)
+
+Eventos inválidos não impedem a gravação dos demais; o resultado informa o
+índice e o motivo de cada rejeição.
+
+Configurações (config.py): INGEST_API_TOKENS, INGEST_MAX_EVENTS,
+INGEST_MAX_BYTES, INGEST_INSERT_CHUNK_SIZE.
+"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app
+
+from extensions import db
+from models import AccessLog, Device, User, brasilia_tz, get_brasilia_now
+from interning import IN_CHUNK_SIZE, string_interner
+from ip_ranges import pack_ip
+from log_writer import coalesce_alerts
+from rollups import update_rollups
+from data_version import ALERTS, LOGS, bump_versions
+from cache import dashboard_cache
+from metrics import app_metrics
+
+# Campos aceitos em cada evento (demais campos são rejeitados)
+EVENT_FIELDS = ('user_id', 'device_id', 'action', 'status', 'ip_address', 'user_agent',
+                'details', 'access_time', 'is_suspicious')
+
+# Tamanho máximo dos textos (mesmos limites das colunas de AccessLog)
+MAX_LENGTHS = {'action': 50, 'status': 20}
+
+# Campos gravados como ids das tabelas de valores
+LOOKUP_FIELDS = (('action', 'log_action'), ('status', 'log_status'), ('user_agent', 'log_user_agent'))
+
+# Linha NDJSON que não é JSON válido (rejeitada na validação)
+INVALID_JSON = object()
+
+# Rejeições detalhadas na resposta (as demais são apenas contadas)
+MAX_REPORTED_ERRORS = 100
+
+
+class IngestError(ValueError):
+    """Lote inteiro recusado (corpo inválido ou grande demais)"""
+
+
+# ========== LEITURA DO LOTE ==========
+
+def parse_batch(body, content_type):
+    """
+    Converte o corpo da requisição em lista de eventos (dicts ainda não validados).
+
+    Args:
+        body: Bytes do corpo
+        content_type: 'application/x-ndjson' (um evento por linha) ou
+                      'application/json' (array de eventos ou {"events": [...]})
+
+    Returns:
+        list: Eventos; linhas NDJSON inválidas viram INVALID_JSON
+
+    Raises:
+        IngestError: Se o corpo não puder ser lido
+    """
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise IngestError('Corpo não está em UTF-8')
+
+    if 'ndjson' in (content_type or ''):
+        events = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                events.append(INVALID_JSON)
+        return events
+
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        raise IngestError('JSON inválido')
+    if isinstance(payload, dict):
+        payload = payload.get('events')
+    if not isinstance(payload, list):
+        raise IngestError('Esperado um array de eventos ou {"events": [...]}')
+    return payload
+
+
+def _parse_time(value):
+    """
+    Horário do evento em Brasília, sem fuso (formato gravado no banco).
+    Horários com fuso são convertidos; sem fuso, são tomados como Brasília.
+    """
+    if value is None:
+        return get_brasilia_now().replace(tzinfo=None)
+    if not isinstance(value, str):
+        raise ValueError(value)
+    dt = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(brasilia_tz).replace(tzinfo=None)
+    return dt
+
+
+def validate_event(raw):
+    """
+    Valida e normaliza um evento (sem consultar o banco).
+
+    Returns:
+        dict: Evento com os campos de AccessLog (ip_address já em binário)
+
+    Raises:
+        ValueError: Com o motivo da rejeição
+    """
+    if raw is INVALID_JSON:
+        raise ValueError('linha não é JSON válido')
+    if not isinstance(raw, dict):
+        raise ValueError('evento não é um objeto JSON')
+    unknown = raw.keys() - set(EVENT_FIELDS)
+    if unknown:
+        raise ValueError(f'campos desconhecidos: {", ".join(sorted(unknown))}')
+
+    user_id = raw.get('user_id')
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise ValueError('user_id obrigatório (inteiro)')
+    device_id = raw.get('device_id')
+    if device_id is not None and (not isinstance(device_id, int) or isinstance(device_id, bool)):
+        raise ValueError('device_id deve ser inteiro')
+
+    for field in ('action', 'status'):
+        value = raw.get(field)
+        if not isinstance(value, str) or not value:
+            raise ValueError(f'{field} obrigatório (texto)')
+        if len(value) > MAX_LENGTHS[field]:
+            raise ValueError(f'{field} com mais de {MAX_LENGTHS[field]} caracteres')
+    for field in ('user_agent', 'details'):
+        if raw.get(field) is not None and not isinstance(raw[field], str):
+            raise ValueError(f'{field} deve ser texto')
+
+    ip_address = raw.get('ip_address')
+    if ip_address is not None:
+        ip_address = pack_ip(ip_address)
+        if ip_address is None:
+            raise ValueError('ip_address inválido')
+
+    try:
+        access_time = _parse_time(raw.get('access_time'))
+    except ValueError:
+        raise ValueError('access_time inválido (use ISO 8601)')
+
+    is_suspicious = raw.get('is_suspicious', False)
+    if not isinstance(is_suspicious, bool):
+        raise ValueError('is_suspicious deve ser booleano')
+
+    return {'user_id': user_id, 'device_id': device_id, 'action': raw['action'],
+            'status': raw['status'], 'ip_address': ip_address,
+            'user_agent': raw.get('user_agent'), 'details': raw.get('details') or '',
+            'access_time': access_time, 'is_suspicious': is_suspicious}
+
+
+def _existing_ids(model, ids):
+    """Ids que existem na tabela do modelo (consultas IN em blocos)"""
+    ids = sorted(ids)
+    found = set()
+    for i in range(0, len(ids), IN_CHUNK_SIZE):
+        chunk = ids[i:i + IN_CHUNK_SIZE]
+        found.update(row_id for row_id, in db.session.query(model.id).filter(model.id.in_(chunk)))
+    return found
+
+
+# ========== GRAVAÇÃO ==========
+
+def ingest_events(raw_events):
+    """
+    Valida e grava um lote de eventos em uma única transação.
+
+    Args:
+        raw_events: Eventos lidos por parse_batch
+
+    Returns:
+        dict: received, accepted, rejected, alerts_created e errors
+              (lista de {index, error}, limitada a MAX_REPORTED_ERRORS)
+    """
+    valid, errors = [], []
+    for index, raw in enumerate(raw_events):
+        try:
+            valid.append((index, validate_event(raw)))
+        except ValueError as exc:
+            errors.append((index, str(exc)))
+
+    # Usuários e dispositivos citados: uma consulta por tabela para o lote inteiro
+    users = _existing_ids(User, {event['user_id'] for _, event in valid})
+    devices = _existing_ids(Device, {event['device_id'] for _, event in valid if event['device_id']})
+    events = []
+    for index, event in valid:
+        if event['user_id'] not in users:
+            errors.append((index, 'user_id inexistente'))
+        elif event['device_id'] and event['device_id'] not in devices:
+            errors.append((index, 'device_id inexistente'))
+        else:
+            events.append(event)
+
+    new_alerts = []
+    if events:
+        new_alerts = _write_events(events)
+
+    errors.sort()
+    return {
+        'received': len(raw_events),
+        'accepted': len(events),
+        'rejected': len(errors),
+        'alerts_created': len(new_alerts),
+        'errors': [{'index': index, 'error': error} for index, error in errors[:MAX_REPORTED_ERRORS]],
+    }
+
+
+def _write_events(events):
+    """
+    Grava eventos já validados (uma transação).
+
+    Returns:
+        list: Alertas novos criados
+    """
+    chunk_size = current_app.config.get('INGEST_INSERT_CHUNK_SIZE', 5000)
+    try:
+        # Valores novos ganham id antes do INSERT (gravados como inteiros)
+        for field, table_name in LOOKUP_FIELDS:
+            string_interner.intern(table_name, {event[field] for event in events})
+        update_rollups([SimpleNamespace(**event) for event in events])
+
+        # Suspeitos (poucos): pelo ORM, para vincular logs e alertas
+        suspicious = [AccessLog(**event) for event in events if event['is_suspicious']]
+        with db.session.no_autoflush:
+            new_alerts = coalesce_alerts(suspicious)
+        db.session.add_all(suspicious)
+
+        # Demais: executemany com os ids já resolvidos (uma consulta ao cache
+        # por valor distinto, não por linha)
+        plain = [event for event in events if not event['is_suspicious']]
+        for field, table_name in LOOKUP_FIELDS:
+            ids = {value: string_interner.id_for(table_name, value)
+                   for value in {event[field] for event in plain} if value is not None}
+            for event in plain:
+                if event[field] is not None:
+                    event[field] = ids[event[field]]
+        table = AccessLog.__table__
+        for i in range(0, len(plain), chunk_size):
+            db.session.execute(table.insert(), plain[i:i + chunk_size],
+                               bind_arguments={'mapper': AccessLog})
+        bump_versions(LOGS, *([ALERTS] if suspicious else []))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    dashboard_cache.invalidate('recent_logs')
+    dashboard_cache.incr('active_alerts', len(new_alerts))
+    app_metrics.record_logs('ingest', len(events), len(suspicious), new_alerts)
+    return new_alerts
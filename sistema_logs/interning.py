@@ -0,0 +1,234 @@
+"""
+Codificação compacta de colunas repetitivas de AccessLog.
+
+- InternedString: guarda textos muito repetidos (ação, status, user agent)
+  como ids inteiros de uma tabela de valores (log_action, log_status,
+  log_user_agent). Para o código, a coluna continua sendo texto: comparações
+  como AccessLog.action == 'failed_login' viram comparação de inteiros.
+- PackedIP: guarda IPv4/IPv6 em binário (4 ou 16 bytes) em vez de texto.
+
+O mapeamento valor <-> id fica em cache no processo (string_interner).
+Valores novos são cadastrados na mesma transação que grava os logs (evento
+before_flush e update_rollups) e só entram no cache compartilhado depois do
+commit; em rollback são descartados.
+"""
+
+import threading
+from collections import defaultdict
+
+from sqlalchemy import LargeBinary, Integer, String, TypeDecorator, event, inspect, select
+
+from extensions import db, BindSession
+from ip_ranges import pack_ip, unpack_ip
+
+# Máximo de valores por INSERT/IN ao cadastrar valores novos
+IN_CHUNK_SIZE = 500
+
+
+class StringInterner:
+    """
+    Cache valor <-> id das tabelas de valores, por processo.
+    Cada tabela é carregada inteira na primeira consulta (são pequenas).
+    """
+
+    def __init__(self):
+        self._ids = defaultdict(dict)     # tabela -> {valor: id} (já gravados)
+        self._values = defaultdict(dict)  # tabela -> {id: valor}
+        self._loaded = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()   # valores cadastrados na transação corrente
+        self.stats = {'hits': 0, 'misses': 0, 'interned': 0}
+
+    def _pending(self):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = defaultdict(dict)
+        return pending
+
+    def _load(self, table_name, where=None):
+        """Lê valores do banco em uma conexão própria (fora da transação da sessão)"""
+        table = db.metadata.tables[table_name]
+        query = select(table.c.id, table.c.value)
+        if where is not None:
+            query = query.where(where(table))
+        with db.session.get_bind(clause=table).connect() as conn:
+            rows = conn.execute(query).all()
+        with self._lock:
+            for row_id, value in rows:
+                self._ids[table_name][value] = row_id
+                self._values[table_name][row_id] = value
+            if where is None:
+                self._loaded.add(table_name)
+
+    def id_for(self, table_name, value):
+        """
+        Id de um valor (usado ao gravar e ao filtrar).
+
+        Returns:
+            int: Id do valor, ou -1 se ele nunca foi cadastrado (não casa com nada)
+        """
+        row_id = self._pending()[table_name].get(value) or self._ids[table_name].get(value)
+        if row_id is None:
+            self.stats['misses'] += 1
+            # Cadastrado por outro processo depois do carregamento?
+            self._load(table_name, where=lambda t: t.c.value == value)
+            row_id = self._ids[table_name].get(value, -1)
+        else:
+            self.stats['hits'] += 1
+        return row_id
+
+    def value_for(self, table_name, row_id):
+        """Valor de um id (usado ao ler)"""
+        if table_name not in self._loaded:
+            self._load(table_name)
+        value = self._values[table_name].get(row_id)
+        if value is None:
+            # Cadastrado nesta transação (ainda não publicado no cache)
+            value = next((v for v, i in self._pending()[table_name].items() if i == row_id), None)
+        if value is None:
+            self._load(table_name, where=lambda t: t.c.id == row_id)
+            value = self._values[table_name].get(row_id)
+        return value
+
+    def intern(self, table_name, values, session=None):
+        """
+        Garante que os valores tenham id, cadastrando os que faltam na
+        transação da sessão (INSERT ... ON CONFLICT DO NOTHING).
+
+        Args:
+            table_name: Tabela de valores (ex: 'log_action')
+            values: Textos a cadastrar
+            session: Sessão da transação corrente (padrão: db.session)
+        """
+        session = session or db.session
+        if table_name not in self._loaded:
+            self._load(table_name)
+        pending = self._pending()[table_name]
+        missing = sorted({v for v in values if v is not None
+                          and v not in pending and v not in self._ids[table_name]})
+        if not missing:
+            return
+        table = db.metadata.tables[table_name]
+        bind = session.get_bind(clause=table)
+        if bind.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        for i in range(0, len(missing), IN_CHUNK_SIZE):
+            chunk = missing[i:i + IN_CHUNK_SIZE]
+            session.execute(insert(table).values([{'value': v} for v in chunk])
+                            .on_conflict_do_nothing(index_elements=['value']))
+            rows = session.execute(select(table.c.id, table.c.value).where(table.c.value.in_(chunk)))
+            pending.update((value, row_id) for row_id, value in rows)
+        self.stats['interned'] += len(missing)
+
+    def commit(self):
+        """Publica no cache os valores cadastrados na transação que terminou"""
+        pending = self._pending()
+        with self._lock:
+            for table_name, ids in pending.items():
+                self._ids[table_name].update(ids)
+                self._values[table_name].update((i, v) for v, i in ids.items())
+        pending.clear()
+
+    def rollback(self):
+        """Descarta os valores cadastrados na transação desfeita"""
+        self._pending().clear()
+
+    def clear(self):
+        """Esvazia o cache (recarregado na próxima consulta)"""
+        with self._lock:
+            self._ids.clear()
+            self._values.clear()
+            self._loaded.clear()
+
+
+# Instância única usada pelos tipos de coluna abaixo
+string_interner = StringInterner()
+
+
+class InternedString(TypeDecorator):
+    """
+    Texto guardado como id inteiro de uma tabela de valores.
+    value_type é o tipo de texto equivalente (usado nos arquivos mensais,
+    que guardam o texto para não depender das tabelas de valores).
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def __init__(self, lookup_table, value_type=None):
+        super().__init__()
+        self.lookup_table = lookup_table
+        self.value_type = value_type or String()
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return string_interner.id_for(self.lookup_table, value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return string_interner.value_for(self.lookup_table, value)
+
+
+class PackedIP(TypeDecorator):
+    """
+    Endereço IP guardado em binário (4 bytes IPv4, 16 bytes IPv6).
+    Textos que não são IP válidos são gravados como NULL; textos já gravados
+    (arquivos mensais) são lidos como estão.
+    """
+
+    impl = LargeBinary(16)
+    cache_ok = True
+    value_type = String(45)
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        return pack_ip(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return unpack_ip(value)
+
+
+# ========== CADASTRO AUTOMÁTICO NA GRAVAÇÃO (ORM) ==========
+
+_interned_attributes_cache = {}
+
+
+def interned_attributes(cls):
+    """Atributos InternedString de um modelo: [(atributo, tabela de valores)]"""
+    attrs = _interned_attributes_cache.get(cls)
+    if attrs is None:
+        attrs = [(prop.key, prop.columns[0].type.lookup_table)
+                 for prop in inspect(cls).column_attrs
+                 if isinstance(prop.columns[0].type, InternedString)]
+        _interned_attributes_cache[cls] = attrs
+    return attrs
+
+
+@event.listens_for(BindSession, 'before_flush')
+def _intern_before_flush(session, flush_context, instances):
+    """Cadastra os valores novos dos objetos que serão gravados neste flush"""
+    values = defaultdict(set)
+    for obj in list(session.new) + list(session.dirty):
+        for attr, table_name in interned_attributes(type(obj)):
+            value = getattr(obj, attr, None)
+            if isinstance(value, str):
+                values[table_name].add(value)
+    for table_name, table_values in values.items():
+        string_interner.intern(table_name, table_values, session)
+
+
+@event.listens_for(BindSession, 'after_commit')
+def _intern_after_commit(session):
+    string_interner.commit()
+
+
+@event.listens_for(BindSession, 'after_rollback')
+def _intern_after_rollback(session):
+    string_interner.rollback()
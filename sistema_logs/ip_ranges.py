@@ -0,0 +1,87 @@
+"""
+Filtro de logs e dispositivos por IP ou faixa CIDR.
+
+Os IPs são comparados na forma binária (4 bytes IPv4, 16 bytes IPv6), que
+tem a mesma ordem dos endereços: uma faixa como 10.20.0.0/16 vira um
+intervalo [primeiro, último] resolvido por busca no índice, em vez de LIKE
+sobre texto. Colunas indexadas:
+- AccessLog.ip_address (PackedIP, ver interning.py)
+- Device.ip_packed (cópia binária de Device.ip_address)
+
+Nos arquivos mensais (ver archive.py) o IP é texto; lá o filtro usa a função
+SQL ip_pack, registrada em cada conexão SQLite (sem índice: meses arquivados
+são lidos por inteiro).
+"""
+
+import ipaddress
+import socket
+
+from sqlalchemy import String, and_, func
+
+
+def pack_ip(value):
+    """
+    IP em binário (4 ou 16 bytes).
+
+    Returns:
+        bytes: Endereço empacotado, ou None se o texto não for um IP válido
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    # Caminho rápido para IPv4 (caso comum); IPv6 e demais formatos via ipaddress
+    try:
+        return socket.inet_pton(socket.AF_INET, text)
+    except OSError:
+        pass
+    try:
+        return ipaddress.ip_address(text).packed
+    except ValueError:
+        return None
+
+
+def unpack_ip(value):
+    """IP binário de volta para texto"""
+    return str(ipaddress.ip_address(bytes(value))) if value is not None else None
+
+
+def parse_ip_filter(text):
+    """
+    Converte um IP ou bloco CIDR em um intervalo binário.
+    Um IP sem prefixo vale como faixa de um único endereço.
+
+    Args:
+        text: Ex: '10.20.0.0/16', '10.20.1.5', '2001:db8::/32'
+
+    Returns:
+        tuple: (primeiro, último) endereços empacotados
+
+    Raises:
+        ValueError: Se o texto não for um IP ou CIDR válido
+    """
+    network = ipaddress.ip_network(text.strip(), strict=False)
+    return network.network_address.packed, network.broadcast_address.packed
+
+
+def ip_range_condition(column, text):
+    """
+    Condição SQL "IP da coluna dentro da faixa".
+    Em colunas binárias é um intervalo no índice; o tamanho separa IPv4 de
+    IPv6 (um IPv6 cujo prefixo coincide com a faixa IPv4 não casa).
+
+    Args:
+        column: Coluna com IP binário, ou texto (arquivos mensais)
+        text: IP ou CIDR (ver parse_ip_filter)
+
+    Raises:
+        ValueError: Se o texto não for um IP ou CIDR válido
+    """
+    first, last = parse_ip_filter(text)
+    if isinstance(column.type, String):
+        column = func.ip_pack(column)
+    return and_(column.between(first, last), func.length(column) == len(first))
+
+
+def register_sqlite_functions(dbapi_connection, connection_record=None):
+    """Registra ip_pack(texto) em uma conexão SQLite (evento connect da engine)"""
+    dbapi_connection.create_function('ip_pack', 1, pack_ip, deterministic=True)
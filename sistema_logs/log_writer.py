@@ -0,0 +1,259 @@
+"""
+Gravação de logs de acesso (AccessLog) e alertas automáticos.
+
+Concentra o caminho de escrita usado por log_access():
+- persist_events: grava um lote de eventos em uma única transação
+- coalesce_alerts: agrupa eventos suspeitos repetidos em um único alerta
+- AccessLogWriter: modo assíncrono opcional, com fila limitada em memória e
+  uma thread que agrupa os eventos em commits (por tamanho ou janela de tempo)
+
+Configurações (config.py):
+- ACCESS_LOG_ASYNC: ativa o modo assíncrono (padrão: False, grava na hora)
+- ACCESS_LOG_QUEUE_SIZE: capacidade máxima da fila
+- ACCESS_LOG_BATCH_SIZE: eventos por commit
+- ACCESS_LOG_FLUSH_INTERVAL: tempo máximo (s) que um evento espera na fila
+- ACCESS_LOG_ENQUEUE_TIMEOUT: espera máxima (s) com a fila cheia antes de
+  gravar de forma síncrona (backpressure)
+- ALERT_COALESCE_WINDOW: janela (s) de agrupamento de eventos suspeitos
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app
+
+from extensions import db
+from models import AccessLog, Alert, AlertLevel, get_brasilia_now
+from rollups import update_rollups
+from data_version import ALERTS, LOGS, bump_versions
+from cache import dashboard_cache
+from sketches import access_sketches
+from metrics import app_metrics
+
+
+def _naive(dt):
+    """Datetime sem fuso (formato em que o SQLite grava/retorna as datas)"""
+    return dt.replace(tzinfo=None) if dt is not None else None
+
+
+def coalesce_alerts(logs, level=AlertLevel.HIGH):
+    """
+    Vincula logs suspeitos a alertas, agrupando por incidente.
+    Eventos do mesmo (usuário, dispositivo, ação, nível) dentro de
+    ALERT_COALESCE_WINDOW segundos do último evento visto entram no mesmo
+    alerta aberto (contagem e last_seen atualizados); caso contrário um novo
+    alerta é criado. Roda na transação corrente, sem commit.
+    
+    Args:
+        logs: Objetos AccessLog suspeitos, ainda não gravados
+        level: Nível de severidade dos alertas
+    
+    Returns:
+        list: Alertas novos criados (os agrupados em alertas existentes não entram)
+    """
+    window = timedelta(seconds=current_app.config.get('ALERT_COALESCE_WINDOW', 900))
+    groups = {}
+    for log in sorted(logs, key=lambda l: _naive(l.access_time)):
+        groups.setdefault((log.user_id, log.device_id, log.action), []).append(log)
+    
+    new_alerts = []
+    for (user_id, device_id, action), group in groups.items():
+        first_time = _naive(group[0].access_time)
+        # Incidente aberto do mesmo grupo visto dentro da janela
+        alert = (Alert.query
+                 .filter_by(user_id=user_id, device_id=device_id, action=action,
+                            alert_level=level, is_resolved=False)
+                 .filter(Alert.last_seen >= first_time - window)
+                 .order_by(Alert.last_seen.desc())
+                 .first())
+        for log in group:
+            log_time = _naive(log.access_time)
+            if alert is None or log_time - _naive(alert.last_seen) > window:
+                alert = Alert(
+                    title=f"Acesso suspeito detectado - Usuário: {log.user_id}",
+                    description=f"Tentativa de acesso suspeito. Detalhes: {log.details}",
+                    alert_level=level,
+                    user_id=user_id,
+                    device_id=device_id,
+                    action=action,
+                    occurrence_count=0,
+                    first_seen=log_time,
+                    last_seen=log_time,
+                    log=log
+                )
+                db.session.add(alert)
+                new_alerts.append(alert)
+            alert.occurrence_count = (alert.occurrence_count or 0) + 1
+            alert.last_seen = max(_naive(alert.last_seen), log_time)
+            log.alert = alert
+    return new_alerts
+
+
+def persist_events(events):
+    """
+    Grava uma lista de eventos de acesso em uma única transação.
+    Eventos suspeitos são agrupados em alertas (coalesce_alerts) e os rollups
+    horários, os filtros de primeiro acesso (sketches.py) e a versão dos dados
+    (data_version.py) são atualizados na mesma transação.
+
+    Args:
+        events: Lista de dicts com os campos de AccessLog
+
+    Returns:
+        list: Objetos AccessLog gravados (na mesma ordem dos eventos)
+    """
+    logs = [AccessLog(**event) for event in events]
+    for log in logs:
+        if log.access_time is None:
+            log.access_time = get_brasilia_now()
+    # no_autoflush: logs e alertas são inseridos juntos no commit, já com alert_id
+    with db.session.no_autoflush:
+        new_alerts = coalesce_alerts([log for log in logs if log.is_suspicious])
+    db.session.add_all(logs)
+    update_rollups(logs)
+    access_sketches.save()
+    bump_versions(LOGS, *([ALERTS] if any(log.is_suspicious for log in logs) else []))
+    db.session.commit()
+    
+    # Atualizar valores do dashboard afetados pela gravação
+    dashboard_cache.invalidate('recent_logs')
+    dashboard_cache.incr('active_alerts', len(new_alerts))
+    app_metrics.record_logs('web', len(logs), sum(1 for log in logs if log.is_suspicious), new_alerts)
+    return logs
+
+
+class AccessLogWriter:
+    """
+    Gravador assíncrono de logs de acesso.
+    Segue o padrão das extensões Flask: a instância é criada no módulo e
+    ligada à aplicação em create_app() via init_app().
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {'enqueued': 0, 'written': 0, 'batches': 0,
+                      'sync_fallbacks': 0, 'errors': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lê as configurações da aplicação e registra o drain no encerramento"""
+        self.app = app
+        self.enabled = app.config.get('ACCESS_LOG_ASYNC', False)
+        self.batch_size = app.config.get('ACCESS_LOG_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('ACCESS_LOG_FLUSH_INTERVAL', 0.5)
+        self.enqueue_timeout = app.config.get('ACCESS_LOG_ENQUEUE_TIMEOUT', 0.05)
+        self._queue = queue.Queue(maxsize=app.config.get('ACCESS_LOG_QUEUE_SIZE', 10000))
+        app.extensions['access_log_writer'] = self
+        if self.enabled:
+            atexit.register(self.stop)
+
+    def submit(self, event):
+        """
+        Coloca um evento na fila de gravação.
+
+        Returns:
+            bool: True se o evento foi enfileirado; False se o modo assíncrono
+                  está desligado ou a fila continuou cheia (o chamador deve
+                  gravar de forma síncrona)
+        """
+        if not self.enabled or self._stopping.is_set():
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.stats['sync_fallbacks'] += 1
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def flush(self, timeout=None):
+        """Bloqueia até que todos os eventos enfileirados tenham sido gravados"""
+        if self._thread is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+
+    def stop(self, timeout=10):
+        """Para de aceitar eventos, grava o que restou na fila e encerra a thread"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        """Inicia a thread sob demanda (também após fork de workers)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        """Aguarda o primeiro evento e junta outros até encher o lote ou estourar a janela"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stopping.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Loop da thread de gravação"""
+        with self.app.app_context():
+            while not (self._stopping.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+                    db.session.remove()
+
+    def _write(self, batch):
+        """Grava um lote; se falhar, tenta evento a evento para não perder o lote inteiro"""
+        try:
+            persist_events(batch)
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('Falha ao gravar lote de %d logs de acesso', len(batch))
+            for event in batch:
+                try:
+                    persist_events([event])
+                    self.stats['written'] += 1
+                except Exception:
+                    db.session.rollback()
+                    self.stats['errors'] += 1
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+
+# Instância única usada por log_access() (inicializada em create_app)
+log_writer = AccessLogWriter()
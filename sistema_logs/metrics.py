@@ -0,0 +1,219 @@
+"""
+Métricas no formato Prometheus (rota /metrics).
+
+Métricas expostas:
+- http_request_duration_seconds / http_requests_total: por endpoint, método
+  (e status, no contador)
+- db_query_duration_seconds / db_queries_total: comandos SQL por bind
+  ('default' ou 'logs')
+- db_pool_connections_open / db_pool_connections_in_use / db_pool_size /
+  db_pool_checkouts_total: pool de conexões por bind
+- access_logs_written_total: logs gravados por origem ('web' = log_access,
+  'ingest' = API em lote e receptor de syslog); a taxa de ingestão é
+  rate(access_logs_written_total[1m])
+- suspicious_events_total / alerts_created_total: eventos suspeitos gravados
+  e alertas novos (por nível); logs marcados depois pela detecção de
+  anomalias contam na origem 'anomaly' (sem somar em access_logs_written_total)
+- logins_total: tentativas de login por resultado (success, failed, blocked)
+
+Vários processos (gunicorn com vários workers): defina a variável de ambiente
+PROMETHEUS_MULTIPROC_DIR com uma pasta vazia antes de iniciar o servidor.
+Cada worker grava seus valores em arquivos nessa pasta e /metrics soma todos
+os workers (multiprocess do prometheus_client). Para que as conexões de
+workers encerrados deixem de contar, o servidor deve chamar
+mark_process_dead(pid) ao encerrar um worker (no gunicorn, hook child_exit).
+
+Requer o pacote prometheus_client (opcional: sem ele /metrics responde 503).
+"""
+
+import hmac
+import os
+import time
+
+from flask import Response, current_app, g, request
+
+try:
+    import prometheus_client
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge,
+                                   Histogram, generate_latest, multiprocess)
+except ImportError:  # Opcional: apenas /metrics precisa
+    prometheus_client = None
+
+from sqlalchemy import event
+
+from extensions import db
+
+# Faixas dos histogramas de SQL (comandos costumam levar menos de 1 ms)
+DB_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+
+# Endpoint registrado para requisições sem rota (404)
+NO_ENDPOINT = '(sem rota)'
+
+
+def multiprocess_enabled():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def mark_process_dead(pid):
+    """Descarta os valores ao vivo (conexões abertas) de um worker encerrado"""
+    if prometheus_client is not None and multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+class AppMetrics:
+    """
+    Métricas da aplicação (contadores, histogramas e pool de conexões).
+    Segue o padrão das extensões Flask (instância no módulo + init_app).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._engines = set()
+        if prometheus_client is not None:
+            self._create_metrics()
+        if app is not None:
+            self.init_app(app)
+
+    def _create_metrics(self):
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Tempo de resposta por endpoint', ['endpoint', 'method'])
+        self.requests = Counter(
+            'http_requests_total', 'Requisições por endpoint e status', ['endpoint', 'method', 'status'])
+        self.query_duration = Histogram(
+            'db_query_duration_seconds', 'Tempo dos comandos SQL', ['bind'], buckets=DB_BUCKETS)
+        self.queries = Counter('db_queries_total', 'Comandos SQL executados', ['bind'])
+        self.pool_open = Gauge('db_pool_connections_open', 'Conexões abertas no pool', ['bind'],
+                               multiprocess_mode='livesum')
+        self.pool_in_use = Gauge('db_pool_connections_in_use', 'Conexões em uso', ['bind'],
+                                 multiprocess_mode='livesum')
+        self.pool_size = Gauge('db_pool_size', 'Tamanho configurado do pool (por processo)', ['bind'],
+                               multiprocess_mode='max')
+        self.pool_checkouts = Counter('db_pool_checkouts_total', 'Conexões retiradas do pool', ['bind'])
+        self.logs_written = Counter('access_logs_written_total', 'Logs de acesso gravados', ['source'])
+        self.suspicious_events = Counter('suspicious_events_total', 'Eventos suspeitos gravados', ['source'])
+        self.alerts_created = Counter('alerts_created_total', 'Alertas novos criados', ['level'])
+        self.logins = Counter('logins_total', 'Tentativas de login', ['result'])
+
+    def init_app(self, app):
+        self.enabled = prometheus_client is not None and app.config.get('METRICS_ENABLED', True)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.extensions['app_metrics'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        with app.app_context():
+            for key, engine in db.engines.items():
+                if engine not in self._engines:
+                    self._instrument_engine(engine, key or 'default')
+                    self._engines.add(engine)
+
+    # ---------- Requisições ----------
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish_request(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        status = 500 if exc is not None else g.pop('metrics_status', 200)
+        endpoint = request.endpoint or NO_ENDPOINT
+        self.request_duration.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        self.requests.labels(endpoint, request.method, str(status)).inc()
+
+    # ---------- Banco de dados ----------
+
+    def _instrument_engine(self, engine, bind):
+        query_duration = self.query_duration.labels(bind)
+        queries = self.queries.labels(bind)
+        pool_open, pool_in_use = self.pool_open.labels(bind), self.pool_in_use.labels(bind)
+        pool_checkouts = self.pool_checkouts.labels(bind)
+        if hasattr(engine.pool, 'size'):
+            self.pool_size.labels(bind).set(engine.pool.size())
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('metrics_start')
+            if starts:
+                query_duration.observe(time.perf_counter() - starts.pop())
+                queries.inc()
+
+        @event.listens_for(engine, 'connect')
+        def connect(dbapi_connection, connection_record):
+            pool_open.inc()
+
+        @event.listens_for(engine, 'close')
+        def close(dbapi_connection, connection_record):
+            pool_open.dec()
+
+        @event.listens_for(engine, 'checkout')
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            pool_in_use.inc()
+            pool_checkouts.inc()
+
+        @event.listens_for(engine, 'checkin')
+        def checkin(dbapi_connection, connection_record):
+            pool_in_use.dec()
+
+    # ---------- Eventos da aplicação ----------
+
+    def record_logs(self, source, logs, suspicious, new_alerts):
+        """
+        Contabiliza uma gravação de logs já confirmada (após o commit).
+
+        Args:
+            source: 'web' (log_access), 'ingest' (API em lote / syslog) ou
+                    'anomaly' (logs já gravados marcados por anomaly.flag_logs)
+            logs: Quantidade de logs gravados
+            suspicious: Quantos deles são suspeitos
+            new_alerts: Alertas novos criados na gravação
+        """
+        if not self.enabled:
+            return
+        if logs:
+            self.logs_written.labels(source).inc(logs)
+        if suspicious:
+            self.suspicious_events.labels(source).inc(suspicious)
+        for alert in new_alerts:
+            level = getattr(alert.alert_level, 'value', alert.alert_level)
+            self.alerts_created.labels(level).inc()
+
+    def record_login(self, result):
+        """Contabiliza uma tentativa de login ('success', 'failed' ou 'blocked')"""
+        if self.enabled:
+            self.logins.labels(result).inc()
+
+    # ---------- Exposição ----------
+
+    def metrics_view(self):
+        """Métricas no formato texto do Prometheus (todos os workers, se multiprocess)"""
+        if not self.enabled:
+            return Response('Métricas desativadas (METRICS_ENABLED ou prometheus_client ausente)\n',
+                            status=503, mimetype='text/plain')
+        token = current_app.config.get('METRICS_TOKEN')
+        if token:
+            auth = request.headers.get('Authorization', '')
+            if not (auth.startswith('Bearer ') and hmac.compare_digest(auth[7:].strip(), token)):
+                return Response('Token inválido\n', status=401, mimetype='text/plain',
+                                headers={'WWW-Authenticate': 'Bearer'})
+        if multiprocess_enabled():
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+# Instância única usada pela aplicação (inicializada em create_app)
+app_metrics = AppMetrics()
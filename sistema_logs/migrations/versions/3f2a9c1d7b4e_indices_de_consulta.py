@@ -0,0 +1,59 @@
+"""Índices para as consultas de AccessLog, Alert e UserPermission
+
+Cria o conjunto de índices usado pelas rotas de logs, dashboard e alertas.
+Em bancos criados por db.create_all() depois desta versão os índices já
+existem, por isso todas as criações usam if_not_exists.
+
+Revision ID: 3f2a9c1d7b4e
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b4e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ========== ACCESS LOG ==========
+    op.create_index('ix_access_log_time_id', 'access_log',
+                    ['access_time', 'id'], if_not_exists=True)
+    op.create_index('ix_access_log_user_time', 'access_log',
+                    ['user_id', 'access_time'], if_not_exists=True)
+    op.create_index('ix_access_log_device_time', 'access_log',
+                    ['device_id', 'access_time'], if_not_exists=True)
+    op.create_index('ix_access_log_suspicious_time', 'access_log',
+                    ['access_time', 'id'], if_not_exists=True,
+                    sqlite_where=sa.text('is_suspicious = 1'),
+                    postgresql_where=sa.text('is_suspicious'))
+    op.create_index('ix_access_log_action_status', 'access_log',
+                    ['action', 'status'], if_not_exists=True)
+
+    # ========== ALERT ==========
+    op.create_index('ix_alert_resolved_created', 'alert',
+                    ['is_resolved', 'created_at'], if_not_exists=True)
+
+    # ========== USER PERMISSION ==========
+    # Remove permissões duplicadas (mantém a mais antiga) antes do índice único
+    op.execute(
+        'DELETE FROM user_permission WHERE id NOT IN ('
+        'SELECT MIN(id) FROM user_permission GROUP BY user_id, device_id)'
+    )
+    op.create_index('ix_user_permission_user_device', 'user_permission',
+                    ['user_id', 'device_id'], unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_permission_user_device', table_name='user_permission')
+    op.drop_index('ix_alert_resolved_created', table_name='alert')
+    op.drop_index('ix_access_log_action_status', table_name='access_log')
+    op.drop_index('ix_access_log_suspicious_time', table_name='access_log')
+    op.drop_index('ix_access_log_device_time', table_name='access_log')
+    op.drop_index('ix_access_log_user_time', table_name='access_log')
+    op.drop_index('ix_access_log_time_id', table_name='access_log')
@@ -0,0 +1,59 @@
+"""Tabela de rollups horários de logs de acesso
+
+A tabela é populada aqui a partir de access_log (mesmo agrupamento de
+flask rollups rebuild); se já tiver linhas, é mantida como está.
+
+Revision ID: 8c41d2e7a9f0
+Revises: 3f2a9c1d7b4e
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2e7a9f0'
+down_revision = '3f2a9c1d7b4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'access_log_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('action', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('is_suspicious', sa.Boolean(), nullable=False),
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_access_log_rollup_key', 'access_log_rollup',
+                    ['hour', 'action', 'status', 'is_suspicious', 'device_id', 'user_id'],
+                    unique=True, if_not_exists=True)
+
+    # Backfill: uma linha por (hora, ação, status, suspeito, dispositivo, usuário)
+    if op.get_bind().dialect.name == 'postgresql':
+        hour = "date_trunc('hour', access_time)"
+    else:
+        hour = "strftime('%Y-%m-%d %H:00:00.000000', access_time)"
+    op.execute(
+        'INSERT INTO access_log_rollup '
+        '(hour, action, status, is_suspicious, device_id, user_id, count) '
+        f'SELECT {hour}, action, status, coalesce(is_suspicious, false), '
+        'coalesce(device_id, 0), user_id, count(*) '
+        'FROM access_log '
+        'WHERE access_time IS NOT NULL AND NOT EXISTS (SELECT 1 FROM access_log_rollup) '
+        f'GROUP BY {hour}, action, status, coalesce(is_suspicious, false), '
+        'coalesce(device_id, 0), user_id'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_access_log_rollup_key', table_name='access_log_rollup')
+    op.drop_table('access_log_rollup')
@@ -0,0 +1,100 @@
+"""access_log com AUTOINCREMENT (ids de logs arquivados não são reaproveitados)
+
+Sem AUTOINCREMENT o SQLite reusa os maiores ids depois que essas linhas são
+arquivadas, e o mesmo id passa a existir na tabela principal e em um arquivo
+mensal. A tabela é recriada com AUTOINCREMENT (mesmas colunas, linhas e
+índices) e a sequência começa acima do maior id já arquivado.
+
+Os triggers e a view da busca textual (access_log_fts_*) são removidos aqui e
+recriados por init_search na próxima inicialização da aplicação; o índice
+FTS em si é mantido (as linhas mantêm os ids).
+
+Revision ID: a7d3e9f1c5b2
+Revises: f6c2a8d4b1e7
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+import glob
+import os
+import re
+import sqlite3
+
+from alembic import op
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9f1c5b2'
+down_revision = 'f6c2a8d4b1e7'
+branch_labels = None
+depends_on = None
+
+
+def _max_archived_id():
+    """Maior id nos arquivos mensais (ARCHIVE_DIR, ver archive.py)"""
+    path = current_app.config.get('ARCHIVE_DIR') or 'archive'
+    if not os.path.isabs(path):
+        path = os.path.join(current_app.instance_path, path)
+    max_id = 0
+    for filename in glob.glob(os.path.join(path, 'access_log_*.db')):
+        conn = sqlite3.connect(filename)
+        try:
+            max_id = max(max_id, conn.execute('SELECT max(id) FROM access_log').fetchone()[0] or 0)
+        finally:
+            conn.close()
+    return max_id
+
+
+def _drop_search_objects(conn):
+    for suffix in ('ai', 'ad', 'au'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS access_log_fts_{suffix}')
+    conn.exec_driver_sql('DROP VIEW IF EXISTS access_log_fts_content')
+
+
+def _rebuild(conn, autoincrement):
+    """Recria access_log com ou sem AUTOINCREMENT (linhas e índices preservados)"""
+    table_sql = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'access_log'").scalar()
+    if table_sql is None or ('AUTOINCREMENT' in table_sql.upper()) == autoincrement:
+        return
+    index_sql = [row[0] for row in conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'access_log' "
+        "AND sql IS NOT NULL")]
+
+    if autoincrement:
+        new_sql = re.sub(r'\bid INTEGER NOT NULL( PRIMARY KEY)?', 'id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT',
+                         table_sql, count=1)
+        new_sql = re.sub(r',\s*PRIMARY KEY \(id\)', '', new_sql, count=1)
+    else:
+        new_sql = re.sub(r'\bid INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT\b',
+                         'id INTEGER NOT NULL PRIMARY KEY', table_sql, count=1)
+    # Depois de um RENAME o SQLite guarda o nome entre aspas ("access_log")
+    new_sql = re.sub(r'^CREATE TABLE "?access_log"?', 'CREATE TABLE access_log_new', new_sql, count=1)
+
+    _drop_search_objects(conn)
+    conn.exec_driver_sql(new_sql)
+    conn.exec_driver_sql('INSERT INTO access_log_new SELECT * FROM access_log')
+    conn.exec_driver_sql('DROP TABLE access_log')
+    conn.exec_driver_sql('ALTER TABLE access_log_new RENAME TO access_log')
+    for sql in index_sql:
+        conn.exec_driver_sql(sql)
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return  # PostgreSQL: sequências nunca reaproveitam ids
+    _rebuild(conn, autoincrement=True)
+
+    # Próximos ids acima de qualquer id já gravado (tabela principal ou arquivos)
+    max_id = max(_max_archived_id(),
+                 conn.exec_driver_sql('SELECT coalesce(max(id), 0) FROM access_log').scalar())
+    conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'access_log'")
+    conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('access_log', ?)", (max_id,))
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return
+    _rebuild(conn, autoincrement=False)
@@ -0,0 +1,105 @@
+"""Agrupamento de alertas (occurrence_count, first/last_seen, logs vinculados)
+
+Alertas antigos foram gravados com log_id vazio (o log ainda não tinha id).
+Cada um é ligado ao log suspeito do mesmo usuário (id no título) gravado no
+mesmo instante (até 5 segundos de diferença, o mais próximo); a partir dele
+são preenchidos user_id/device_id/action e access_log.alert_id. Alertas sem
+log correspondente (título alterado, log apagado) ficam sem essas chaves e
+não recebem novas ocorrências: eventos novos abrem outro alerta.
+
+Revision ID: b7e3f5a1c2d8
+Revises: 8c41d2e7a9f0
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f5a1c2d8'
+down_revision = '8c41d2e7a9f0'
+branch_labels = None
+depends_on = None
+
+
+# Título dos alertas gravados por log_access antes do agrupamento
+LEGACY_TITLE = 'Acesso suspeito detectado - Usuário: '
+LINK_TOLERANCE = timedelta(seconds=5)
+
+
+def _link_alerts_to_logs(conn):
+    """Preenche alert.log_id com o log suspeito mais próximo do mesmo usuário"""
+    alert = sa.table('alert', sa.column('id', sa.Integer), sa.column('title', sa.String),
+                     sa.column('created_at', sa.DateTime), sa.column('log_id', sa.Integer))
+    log = sa.table('access_log', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                   sa.column('access_time', sa.DateTime), sa.column('is_suspicious', sa.Boolean))
+    alerts = conn.execute(sa.select(alert.c.id, alert.c.title, alert.c.created_at)
+                          .where(alert.c.log_id.is_(None), alert.c.created_at.isnot(None),
+                                 alert.c.title.like(LEGACY_TITLE + '%'))).all()
+    linked = set()
+    for alert_id, title, created_at in alerts:
+        try:
+            user_id = int(title[len(LEGACY_TITLE):])
+        except ValueError:
+            continue
+        candidates = conn.execute(
+            sa.select(log.c.id, log.c.access_time)
+            .where(log.c.user_id == user_id, log.c.is_suspicious == sa.true(),
+                   log.c.access_time.between(created_at - LINK_TOLERANCE, created_at + LINK_TOLERANCE))
+        ).all()
+        candidates = [c for c in candidates if c.id not in linked]
+        if candidates:
+            best = min(candidates, key=lambda c: (abs(c.access_time - created_at), c.id))
+            linked.add(best.id)
+            conn.execute(alert.update().where(alert.c.id == alert_id).values(log_id=best.id))
+
+
+def upgrade():
+    # Colunas simples (o SQLite não adiciona FOREIGN KEY via ALTER TABLE;
+    # a chave estrangeira fica declarada no modelo)
+    op.add_column('alert', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.add_column('alert', sa.Column('device_id', sa.Integer(), nullable=True))
+    op.add_column('alert', sa.Column('action', sa.String(length=50), nullable=True))
+    op.add_column('alert', sa.Column('occurrence_count', sa.Integer(), nullable=True))
+    op.add_column('alert', sa.Column('first_seen', sa.DateTime(), nullable=True))
+    op.add_column('alert', sa.Column('last_seen', sa.DateTime(), nullable=True))
+    op.add_column('access_log', sa.Column('alert_id', sa.Integer(), nullable=True))
+
+    # Ligar alertas antigos ao seu log suspeito (mesmo usuário e instante)
+    _link_alerts_to_logs(op.get_bind())
+
+    # Alertas existentes viram incidentes de uma ocorrência
+    op.execute(
+        'UPDATE alert SET '
+        'occurrence_count = 1, first_seen = created_at, last_seen = created_at, '
+        'user_id = (SELECT user_id FROM access_log WHERE access_log.id = alert.log_id), '
+        'device_id = (SELECT device_id FROM access_log WHERE access_log.id = alert.log_id), '
+        'action = (SELECT action FROM access_log WHERE access_log.id = alert.log_id)'
+    )
+    op.execute(
+        'UPDATE access_log SET alert_id = '
+        '(SELECT MIN(alert.id) FROM alert WHERE alert.log_id = access_log.id) '
+        'WHERE is_suspicious = 1'
+    )
+
+    op.create_index('ix_access_log_alert', 'access_log', ['alert_id'], if_not_exists=True)
+    op.create_index('ix_alert_group', 'alert',
+                    ['user_id', 'device_id', 'action', 'alert_level', 'is_resolved', 'last_seen'],
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_alert_group', table_name='alert')
+    op.drop_index('ix_access_log_alert', table_name='access_log')
+    with op.batch_alter_table('access_log') as batch_op:
+        batch_op.drop_column('alert_id')
+    with op.batch_alter_table('alert') as batch_op:
+        batch_op.drop_column('last_seen')
+        batch_op.drop_column('first_seen')
+        batch_op.drop_column('occurrence_count')
+        batch_op.drop_column('action')
+        batch_op.drop_column('device_id')
+        batch_op.drop_column('user_id')
@@ -0,0 +1,31 @@
+"""Tabela de versão dos dados de logs e alertas (ETag/Last-Modified da API)
+
+Revision ID: c3f8a1e6d2b4
+Revises: a7d3e9f1c5b2
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a1e6d2b4'
+down_revision = 'a7d3e9f1c5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'data_version',
+        sa.Column('name', sa.String(length=20), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
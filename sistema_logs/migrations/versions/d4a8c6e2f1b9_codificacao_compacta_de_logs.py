@@ -0,0 +1,198 @@
+"""Codificação compacta de AccessLog (tabelas de valores e IP em binário)
+
+action, status e user_agent passam a ser ids de log_action, log_status e
+log_user_agent; ip_address passa a ser binário (IPs inválidos viram NULL).
+As linhas existentes são convertidas em blocos de BATCH_SIZE, por id.
+
+O índice de busca access_log_fts é removido e recriado por create_app()
+(init_search) sobre o novo formato.
+
+Revision ID: d4a8c6e2f1b9
+Revises: b7e3f5a1c2d8
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+import ipaddress
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8c6e2f1b9'
+down_revision = 'b7e3f5a1c2d8'
+branch_labels = None
+depends_on = None
+
+# Linhas de access_log convertidas por UPDATE em lote
+BATCH_SIZE = 10000
+
+# Coluna -> tabela de valores
+LOOKUPS = {'action': 'log_action', 'status': 'log_status', 'user_agent': 'log_user_agent'}
+
+
+def _pack_ip(value):
+    try:
+        return ipaddress.ip_address(str(value).strip()).packed if value is not None else None
+    except ValueError:
+        return None
+
+
+def _unpack_ip(value):
+    return str(ipaddress.ip_address(bytes(value))) if value is not None else None
+
+
+def _drop_search_index():
+    """Remove o índice FTS de access_log (triggers usam as colunas convertidas)"""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('access_log_fts_ai', 'access_log_fts_ad', 'access_log_fts_au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS access_log_fts')
+    op.execute('DROP VIEW IF EXISTS access_log_fts_content')
+
+
+def _convert_rows(select_sql, update_sql, convert):
+    """Percorre access_log em blocos por id aplicando convert a cada linha"""
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text(select_sql), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(sa.text(update_sql), [convert(row) for row in rows])
+        last_id = rows[-1][0]
+
+
+def _lookup_maps():
+    """{coluna: {valor: id}} das tabelas de valores"""
+    conn = op.get_bind()
+    return {column: dict(conn.execute(sa.text(f'SELECT value, id FROM {table}')).all())
+            for column, table in LOOKUPS.items()}
+
+
+def _drop_log_indexes():
+    op.drop_index('ix_access_log_action_status', table_name='access_log', if_exists=True)
+    op.drop_index('ix_access_log_suspicious_time', table_name='access_log', if_exists=True)
+    op.drop_index('ix_access_log_rollup_key', table_name='access_log_rollup', if_exists=True)
+
+
+def _create_log_indexes():
+    op.create_index('ix_access_log_action_status', 'access_log', ['action', 'status'],
+                    if_not_exists=True)
+    op.create_index('ix_access_log_suspicious_time', 'access_log', ['access_time', 'id'],
+                    sqlite_where=sa.text('is_suspicious = 1'),
+                    postgresql_where=sa.text('is_suspicious'), if_not_exists=True)
+    op.create_index('ix_access_log_rollup_key', 'access_log_rollup',
+                    ['hour', 'action', 'status', 'is_suspicious', 'device_id', 'user_id'],
+                    unique=True, if_not_exists=True)
+
+
+def _swap_columns(table, new_columns, nullable):
+    """Remove as colunas antigas e renomeia as novas (*_new) para os nomes antigos"""
+    with op.batch_alter_table(table) as batch_op:
+        for column in new_columns:
+            batch_op.drop_column(column)
+        for column, column_type in new_columns.items():
+            batch_op.alter_column(f'{column}_new', new_column_name=column, existing_type=column_type,
+                                  nullable=column in nullable)
+
+
+def upgrade():
+    _drop_search_index()
+    op.create_table(
+        'log_action',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('value'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'log_status',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=20), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('value'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'log_user_agent',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('value'),
+        if_not_exists=True
+    )
+
+    # Valores distintos (inclusive os que só existem nos rollups)
+    op.execute('INSERT INTO log_action (value) SELECT action FROM access_log WHERE action IS NOT NULL '
+               'UNION SELECT action FROM access_log_rollup')
+    op.execute('INSERT INTO log_status (value) SELECT status FROM access_log WHERE status IS NOT NULL '
+               'UNION SELECT status FROM access_log_rollup')
+    op.execute('INSERT INTO log_user_agent (value) SELECT DISTINCT user_agent FROM access_log '
+               'WHERE user_agent IS NOT NULL')
+
+    new_columns = {'action': sa.Integer(), 'status': sa.Integer(),
+                   'user_agent': sa.Integer(), 'ip_address': sa.LargeBinary(length=16)}
+    for column, column_type in new_columns.items():
+        op.add_column('access_log', sa.Column(f'{column}_new', column_type, nullable=True))
+    for column in ('action', 'status'):
+        op.add_column('access_log_rollup', sa.Column(f'{column}_new', sa.Integer(), nullable=True))
+
+    maps = _lookup_maps()
+    _convert_rows(
+        'SELECT id, action, status, user_agent, ip_address FROM access_log '
+        'WHERE id > :last_id ORDER BY id LIMIT :limit',
+        'UPDATE access_log SET action_new = :action, status_new = :status, '
+        'user_agent_new = :user_agent, ip_address_new = :ip_address WHERE id = :id',
+        lambda row: {'id': row.id,
+                     'action': maps['action'].get(row.action),
+                     'status': maps['status'].get(row.status),
+                     'user_agent': maps['user_agent'].get(row.user_agent),
+                     'ip_address': _pack_ip(row.ip_address)})
+    # Rollups: poucas linhas, convertidas em um UPDATE
+    op.execute('UPDATE access_log_rollup SET '
+               'action_new = (SELECT id FROM log_action WHERE value = access_log_rollup.action), '
+               'status_new = (SELECT id FROM log_status WHERE value = access_log_rollup.status)')
+
+    _drop_log_indexes()
+    _swap_columns('access_log', new_columns, nullable=('user_agent', 'ip_address'))
+    _swap_columns('access_log_rollup', {'action': sa.Integer(), 'status': sa.Integer()}, nullable=())
+    _create_log_indexes()
+
+
+def downgrade():
+    _drop_search_index()
+    old_columns = {'action': sa.String(length=50), 'status': sa.String(length=20),
+                   'user_agent': sa.Text(), 'ip_address': sa.String(length=45)}
+    for column, column_type in old_columns.items():
+        op.add_column('access_log', sa.Column(f'{column}_new', column_type, nullable=True))
+    for column in ('action', 'status'):
+        op.add_column('access_log_rollup', sa.Column(f'{column}_new', old_columns[column], nullable=True))
+
+    values = {column: {row_id: value for value, row_id in ids.items()}
+              for column, ids in _lookup_maps().items()}
+    _convert_rows(
+        'SELECT id, action, status, user_agent, ip_address FROM access_log '
+        'WHERE id > :last_id ORDER BY id LIMIT :limit',
+        'UPDATE access_log SET action_new = :action, status_new = :status, '
+        'user_agent_new = :user_agent, ip_address_new = :ip_address WHERE id = :id',
+        lambda row: {'id': row.id,
+                     'action': values['action'].get(row.action),
+                     'status': values['status'].get(row.status),
+                     'user_agent': values['user_agent'].get(row.user_agent),
+                     'ip_address': _unpack_ip(row.ip_address)})
+    op.execute('UPDATE access_log_rollup SET '
+               'action_new = (SELECT value FROM log_action WHERE id = access_log_rollup.action), '
+               'status_new = (SELECT value FROM log_status WHERE id = access_log_rollup.status)')
+
+    _drop_log_indexes()
+    _swap_columns('access_log', old_columns, nullable=('user_agent', 'ip_address'))
+    _swap_columns('access_log_rollup', {'action': old_columns['action'],
+                                        'status': old_columns['status']}, nullable=())
+    _create_log_indexes()
+
+    op.drop_table('log_user_agent')
+    op.drop_table('log_status')
+    op.drop_table('log_action')
@@ -0,0 +1,54 @@
+"""Filtro por IP/CIDR (índice de IP em access_log e device.ip_packed)
+
+Revision ID: e5b1f7a3c9d2
+Revises: d4a8c6e2f1b9
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+import ipaddress
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1f7a3c9d2'
+down_revision = 'd4a8c6e2f1b9'
+branch_labels = None
+depends_on = None
+
+# Dispositivos convertidos por UPDATE em lote
+BATCH_SIZE = 10000
+
+
+def _pack_ip(value):
+    try:
+        return ipaddress.ip_address(str(value).strip()).packed if value is not None else None
+    except ValueError:
+        return None
+
+
+def upgrade():
+    op.create_index('ix_access_log_ip_time', 'access_log', ['ip_address', 'access_time'],
+                    if_not_exists=True)
+
+    op.add_column('device', sa.Column('ip_packed', sa.LargeBinary(length=16), nullable=True))
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text('SELECT id, ip_address FROM device WHERE id > :last_id '
+                                    'ORDER BY id LIMIT :limit'),
+                            {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(sa.text('UPDATE device SET ip_packed = :ip_packed WHERE id = :id'),
+                     [{'id': row.id, 'ip_packed': _pack_ip(row.ip_address)} for row in rows])
+        last_id = rows[-1].id
+    op.create_index('ix_device_ip_packed', 'device', ['ip_packed'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_device_ip_packed', table_name='device')
+    with op.batch_alter_table('device') as batch_op:
+        batch_op.drop_column('ip_packed')
+    op.drop_index('ix_access_log_ip_time', table_name='access_log')
@@ -0,0 +1,38 @@
+"""Tabela de filtros de primeiro acesso por usuário (IPs e dispositivos)
+
+Depois de aplicar, popular com: flask --app app sketches rebuild
+(sem isso, cada filtro é montado pelo histórico no primeiro acesso do usuário)
+
+Revision ID: f6c2a8d4b1e7
+Revises: e5b1f7a3c9d2
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c2a8d4b1e7'
+down_revision = 'e5b1f7a3c9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'access_sketch',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('num_bits', sa.Integer(), nullable=False),
+        sa.Column('num_hashes', sa.Integer(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('bits', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'kind'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('access_sketch')
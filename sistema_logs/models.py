@@ -8,9 +8,21 @@ Modelos inclusos:
 - UserPermission: Permissões de usuários em dispositivos
 - AccessLog: Log de acessos aos dispositivos
 - Alert: Alertas de segurança
+- AccessLogRollup: Contagens horárias pré-agregadas de AccessLog
+- AccessSketch: Filtros de IPs/dispositivos já usados por usuário (sketches.py)
+- LogAction, LogStatus, LogUserAgent: Valores de ação, status e user agent
+  referenciados por id em AccessLog (ver interning.py)
+
+AccessLog, Alert, AccessLogRollup e AccessSketch ficam no bind de logs (LOGS_BIND), que
+pode ser um banco separado (ver extensions.py e LOGS_DATABASE_URL). Por isso
+consultas não fazem JOIN entre essas tabelas e User/Device; os
+relacionamentos entre elas continuam funcionando (uma consulta por banco).
 """
 
-from extensions import db
+from extensions import db, LOGS_BIND
+from interning import InternedString, PackedIP
+from ip_ranges import pack_ip
+from sqlalchemy.orm import validates
 from flask_login import UserMixin
 from datetime import datetime
 import enum
@@ -79,6 +91,7 @@ class Device(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     ip_address = db.Column(db.String(45), nullable=False)  # IPv4 ou IPv6
+    ip_packed = db.Column(db.LargeBinary(16), index=True)  # ip_address em binário (filtro por faixa CIDR)
     device_type = db.Column(db.Enum(DeviceType), nullable=False)
     description = db.Column(db.Text)  # Descrição livre do dispositivo
     location = db.Column(db.String(200))  # Localização física
@@ -88,6 +101,12 @@ class Device(db.Model):
     # Relacionamentos (um dispositivo tem muitas permissões e logs)
     user_permissions = db.relationship('UserPermission', backref='device', lazy=True, cascade='all, delete-orphan')
     logs = db.relationship('AccessLog', backref='device', lazy=True, cascade='all, delete-orphan')
+    
+    @validates('ip_address')
+    def _sync_ip_packed(self, key, value):
+        """Mantém ip_packed igual a ip_address (NULL se não for IP válido)"""
+        self.ip_packed = pack_ip(value)
+        return value
 
 
 # ========== MODELO: USER PERMISSION ==========
@@ -107,6 +126,40 @@ class UserPermission(db.Model):
     can_read = db.Column(db.Boolean, default=True)    # Pode ler/visualizar?
     can_write = db.Column(db.Boolean, default=False)  # Pode modificar?
     can_execute = db.Column(db.Boolean, default=False)  # Pode executar ações?
+    
+    # Índices: um único registro de permissão por par usuário/dispositivo
+    __table_args__ = (
+        db.Index('ix_user_permission_user_device', 'user_id', 'device_id', unique=True),
+    )
+
+
+# ========== TABELAS DE VALORES (dicionário de AccessLog) ==========
+
+class LogAction(db.Model):
+    """Ações distintas de AccessLog (login, read, write, ...)"""
+    __tablename__ = 'log_action'
+    __table_args__ = {'info': {'bind_key': LOGS_BIND}}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(50), unique=True, nullable=False)
+
+
+class LogStatus(db.Model):
+    """Status distintos de AccessLog (success, failed, denied)"""
+    __tablename__ = 'log_status'
+    __table_args__ = {'info': {'bind_key': LOGS_BIND}}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(20), unique=True, nullable=False)
+
+
+class LogUserAgent(db.Model):
+    """User agents distintos de AccessLog"""
+    __tablename__ = 'log_user_agent'
+    __table_args__ = {'info': {'bind_key': LOGS_BIND}}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Text, unique=True, nullable=False)
 
 
 # ========== MODELO: ACCESS LOG ==========
@@ -115,17 +168,41 @@ class AccessLog(db.Model):
     """
     Modelo de log de acesso.
     Registra todo acesso de usuários aos dispositivos para auditoria e segurança.
+    
+    action, status e user_agent são gravados como ids das tabelas de valores
+    e ip_address em binário; para o código continuam sendo texto.
     """
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     device_id = db.Column(db.Integer, db.ForeignKey('device.id'), nullable=True)  # Opcional para logs de login
     access_time = db.Column(db.DateTime, default=get_brasilia_now)  # Quando aconteceu?
-    action = db.Column(db.String(50), nullable=False)  # Qual ação (login, read, write, etc)
-    status = db.Column(db.String(20), nullable=False)  # Sucesso ou falha?
-    ip_address = db.Column(db.String(45))  # IP do usuário
-    user_agent = db.Column(db.Text)  # Browser/cliente usado
+    action = db.Column(InternedString('log_action', db.String(50)), nullable=False)  # Qual ação (login, read, write, etc)
+    status = db.Column(InternedString('log_status', db.String(20)), nullable=False)  # Sucesso ou falha?
+    ip_address = db.Column(PackedIP)  # IP do usuário
+    user_agent = db.Column(InternedString('log_user_agent', db.Text()))  # Browser/cliente usado
     details = db.Column(db.Text)  # Detalhes adicionais
     is_suspicious = db.Column(db.Boolean, default=False)  # Acesso suspeito? (gera alerta)
+    alert_id = db.Column(db.Integer, db.ForeignKey('alert.id'))  # Alerta que agrupa este log
+    
+    # Índices alinhados às consultas reais (logs(), logs_stats(), dashboard()):
+    # - (access_time, id): ordenação/paginação por cursor e janelas de tempo
+    # - (user_id, access_time) e (device_id, access_time): filtros + ordenação
+    # - parcial em is_suspicious: apenas a pequena fração de linhas suspeitas
+    # - (action, status): contagem de logins falhados (comparação de inteiros)
+    # - (ip_address, access_time): filtro por IP/CIDR (faixa binária, ver ip_ranges.py)
+    # sqlite_autoincrement: ids de logs arquivados nunca são reaproveitados (archive.py)
+    __table_args__ = (
+        db.Index('ix_access_log_time_id', 'access_time', 'id'),
+        db.Index('ix_access_log_user_time', 'user_id', 'access_time'),
+        db.Index('ix_access_log_device_time', 'device_id', 'access_time'),
+        db.Index('ix_access_log_suspicious_time', 'access_time', 'id',
+                 sqlite_where=db.text('is_suspicious = 1'),
+                 postgresql_where=db.text('is_suspicious')),
+        db.Index('ix_access_log_action_status', 'action', 'status'),
+        db.Index('ix_access_log_alert', 'alert_id'),
+        db.Index('ix_access_log_ip_time', 'ip_address', 'access_time'),
+        {'info': {'bind_key': LOGS_BIND}, 'sqlite_autoincrement': True},
+    )
 
 
 # ========== MODELO: ALERT ==========
@@ -134,6 +211,10 @@ class Alert(db.Model):
     """
     Modelo de alerta de segurança.
     Alertas são criados automaticamente para acessos suspeitos ou erros.
+    
+    Eventos suspeitos repetidos do mesmo usuário, dispositivo, ação e nível
+    dentro de ALERT_COALESCE_WINDOW são agrupados em um único alerta
+    (occurrence_count, first_seen/last_seen e logs vinculados).
     """
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)  # Título do alerta
@@ -143,6 +224,94 @@ class Alert(db.Model):
     resolved_at = db.Column(db.DateTime)  # Quando foi resolvido?
     is_resolved = db.Column(db.Boolean, default=False)  # Alerta já foi tratado?
     
+    # Agrupamento de ocorrências (chave do incidente + contagem e período)
+    user_id = db.Column(db.Integer)
+    device_id = db.Column(db.Integer)
+    action = db.Column(db.String(50))
+    occurrence_count = db.Column(db.Integer, default=1)  # Eventos agrupados
+    first_seen = db.Column(db.DateTime)  # Primeiro evento do grupo
+    last_seen = db.Column(db.DateTime)   # Último evento do grupo
+    
     # Relacionamento com o log que gerou o alerta (pode ser None)
+    # post_update: o alerta é inserido antes e log_id preenchido depois,
+    # quebrando o ciclo com AccessLog.alert_id
     log_id = db.Column(db.Integer, db.ForeignKey('access_log.id'))
-    log = db.relationship('AccessLog', backref='alerts')
\ No newline at end of file
+    log = db.relationship('AccessLog', backref='alerts', foreign_keys=[log_id], post_update=True)
+    
+    # Todos os logs agrupados neste alerta
+    logs = db.relationship('AccessLog', backref='alert', lazy='dynamic', foreign_keys='AccessLog.alert_id')
+    
+    # Índices: listagem de pendentes e busca do incidente aberto de um grupo
+    __table_args__ = (
+        db.Index('ix_alert_resolved_created', 'is_resolved', 'created_at'),
+        db.Index('ix_alert_group', 'user_id', 'device_id', 'action', 'alert_level',
+                 'is_resolved', 'last_seen'),
+        {'info': {'bind_key': LOGS_BIND}},
+    )
+
+
+# ========== MODELO: ACCESS LOG ROLLUP ==========
+
+class AccessLogRollup(db.Model):
+    """
+    Contagem de logs de acesso agregada por hora.
+    Mantida incrementalmente a cada gravação de logs (ver rollups.py), permite
+    responder estatísticas e contagens por janela de tempo lendo poucas linhas.
+    
+    device_id usa 0 para logs sem dispositivo (login/logout no sistema), pois
+    NULL não participaria da chave única usada no upsert.
+    """
+    __tablename__ = 'access_log_rollup'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.DateTime, nullable=False)  # Início da hora agregada
+    action = db.Column(InternedString('log_action', db.String(50)), nullable=False)
+    status = db.Column(InternedString('log_status', db.String(20)), nullable=False)
+    is_suspicious = db.Column(db.Boolean, nullable=False, default=False)
+    device_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = sem dispositivo
+    user_id = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)  # Quantidade de logs
+    
+    __table_args__ = (
+        db.Index('ix_access_log_rollup_key', 'hour', 'action', 'status',
+                 'is_suspicious', 'device_id', 'user_id', unique=True),
+        {'info': {'bind_key': LOGS_BIND}},
+    )
+
+
+# ========== MODELO: ACCESS SKETCH ==========
+
+class AccessSketch(db.Model):
+    """
+    Filtro de Bloom dos IPs ou dispositivos já usados por um usuário
+    (kind = 'ip' ou 'device'). Mantido por sketches.py para detectar o
+    primeiro acesso a partir de um IP ou dispositivo sem consultar AccessLog.
+    """
+    __tablename__ = 'access_sketch'
+    
+    user_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True)
+    num_bits = db.Column(db.Integer, nullable=False)  # Tamanho do filtro em bits
+    num_hashes = db.Column(db.Integer, nullable=False)  # Posições por valor
+    item_count = db.Column(db.Integer, nullable=False, default=0)  # Valores (estimativa)
+    bits = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=get_brasilia_now)
+    
+    __table_args__ = {'info': {'bind_key': LOGS_BIND}}
+
+
+# ========== MODELO: DATA VERSION ==========
+
+class DataVersion(db.Model):
+    """
+    Contador de alterações de um conjunto de dados ('logs' ou 'alerts'),
+    incrementado na mesma transação de cada gravação, marcação, exclusão ou
+    arquivamento (ver data_version.py). Usado nos ETag/Last-Modified da API.
+    """
+    __tablename__ = 'data_version'
+    
+    name = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=get_brasilia_now)  # Última alteração (Brasília)
+    
+    __table_args__ = {'info': {'bind_key': LOGS_BIND}}
@@ -0,0 +1,237 @@
+"""
+Medição de tempo por requisição (página /admin/perf).
+
+Para cada requisição são registrados o endpoint, o tempo total, o tempo de
+renderização de templates e a quantidade e o tempo somado dos comandos SQL
+(eventos before/after_cursor_execute de todas as engines, inclusive o bind
+de logs). Por endpoint ficam em memória as últimas PERF_WINDOW_SIZE
+requisições, de onde saem os percentis exibidos na página.
+
+Comandos SQL mais lentos que PERF_SLOW_QUERY_MS (de qualquer origem:
+requisições, gravador em segundo plano, comandos CLI) são guardados em uma
+fila limitada; o plano de execução (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no
+PostgreSQL) só é calculado quando a página é aberta, e apenas para SELECT.
+
+Custo por requisição: algumas chamadas a perf_counter e um append em deque;
+nenhuma consulta extra. Os números são por processo (cada worker tem os seus).
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from flask import before_render_template, request, template_rendered
+from sqlalchemy import event
+
+from extensions import db
+from models import get_brasilia_now
+
+# Comando SQL lento guardado para a página (engine usada no EXPLAIN)
+SlowStatement = namedtuple('SlowStatement', 'duration statement parameters endpoint time engine')
+
+# Endpoint registrado para requisições sem rota (404) e comandos fora de requisições
+NO_ENDPOINT = '(sem rota)'
+BACKGROUND = '(fora de requisição)'
+
+
+class _RequestState:
+    """Medidas da requisição corrente (uma por thread)"""
+
+    __slots__ = ('start', 'status', 'sql_count', 'sql_time', 'render_time', 'render_start')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.status = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.render_start = []
+
+
+class RequestProfiler:
+    """
+    Coletor de tempos por requisição e de comandos SQL lentos.
+    Segue o padrão das extensões Flask (instância no módulo + init_app).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._endpoints = {}  # endpoint -> deque de (total, render, sql_count, sql_time, status)
+        self._requests = {}   # endpoint -> requisições desde o início/zeramento
+        self._slow = deque()
+        self._engines = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PERF_MONITORING', True)
+        self.window_size = app.config.get('PERF_WINDOW_SIZE', 1000)
+        self.slow_query_seconds = app.config.get('PERF_SLOW_QUERY_MS', 100) / 1000
+        self._slow = deque(maxlen=app.config.get('PERF_SLOW_QUERIES_KEPT', 200))
+        app.extensions['request_profiler'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine not in self._engines:
+                    event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                    event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+                    self._engines.add(engine)
+
+    def reset(self):
+        """Descarta as medidas acumuladas"""
+        with self._lock:
+            self._endpoints.clear()
+            self._requests.clear()
+            self._slow.clear()
+
+    # ---------- Requisições ----------
+
+    def _start_request(self):
+        self._local.state = _RequestState()
+
+    def _record_status(self, response):
+        state = getattr(self._local, 'state', None)
+        if state is not None:
+            state.status = response.status_code
+        return response
+
+    def _finish_request(self, exc):
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            return
+        self._local.state = None
+        total = time.perf_counter() - state.start
+        status = 500 if exc is not None else state.status
+        endpoint = request.endpoint or NO_ENDPOINT
+        with self._lock:
+            samples = self._endpoints.get(endpoint)
+            if samples is None:
+                samples = self._endpoints[endpoint] = deque(maxlen=self.window_size)
+            samples.append((total, state.render_time, state.sql_count, state.sql_time, status))
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+
+    def _start_render(self, app, template, context, **extra):
+        state = getattr(self._local, 'state', None)
+        if state is not None:
+            state.render_start.append(time.perf_counter())
+
+    def _finish_render(self, app, template, context, **extra):
+        state = getattr(self._local, 'state', None)
+        if state is not None and state.render_start:
+            state.render_time += time.perf_counter() - state.render_start.pop()
+
+    # ---------- Comandos SQL ----------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('profiler_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        state = getattr(self._local, 'state', None)
+        if state is not None:
+            state.sql_count += 1
+            state.sql_time += elapsed
+        if elapsed >= self.slow_query_seconds and not statement.startswith('EXPLAIN'):
+            endpoint = (request.endpoint or NO_ENDPOINT) if state is not None else BACKGROUND
+            self._slow.append(SlowStatement(elapsed, statement, None if executemany else parameters,
+                                            endpoint, get_brasilia_now(), conn.engine))
+
+    # ---------- Consulta (página /admin/perf) ----------
+
+    def endpoint_stats(self):
+        """
+        Percentis e médias por endpoint sobre a janela de requisições recentes.
+
+        Returns:
+            list: Dicts por endpoint, do maior p95 para o menor
+        """
+        with self._lock:
+            windows = {endpoint: list(samples) for endpoint, samples in self._endpoints.items()}
+            requests = dict(self._requests)
+        stats = []
+        for endpoint, samples in windows.items():
+            totals = sorted(sample[0] for sample in samples)
+            n = len(samples)
+            stats.append({
+                'endpoint': endpoint,
+                'requests': requests[endpoint],
+                'window': n,
+                'p50_ms': percentile(totals, 50) * 1000,
+                'p95_ms': percentile(totals, 95) * 1000,
+                'p99_ms': percentile(totals, 99) * 1000,
+                'max_ms': totals[-1] * 1000,
+                'render_ms': sum(sample[1] for sample in samples) / n * 1000,
+                'sql_count': sum(sample[2] for sample in samples) / n,
+                'sql_ms': sum(sample[3] for sample in samples) / n * 1000,
+                'errors': sum(1 for sample in samples if sample[4] and sample[4] >= 500),
+            })
+        return sorted(stats, key=lambda s: s['p95_ms'], reverse=True)
+
+    def slow_statements(self, limit=20):
+        """
+        Comandos mais lentos entre os guardados (um por texto SQL, o pior).
+
+        Returns:
+            list: SlowStatement, do mais lento para o mais rápido
+        """
+        worst = {}
+        for item in list(self._slow):
+            if item.statement not in worst or item.duration > worst[item.statement].duration:
+                worst[item.statement] = item
+        return sorted(worst.values(), key=lambda s: s.duration, reverse=True)[:limit]
+
+
+def percentile(sorted_values, pct):
+    """Percentil pelo posto mais próximo (valores já ordenados)"""
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def explain(slow):
+    """
+    Plano de execução de um comando lento (somente SELECT).
+
+    Returns:
+        str: Plano (uma linha por passo), ou motivo de não haver plano
+    """
+    if not slow.statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return 'Plano disponível apenas para SELECT'
+    if slow.parameters is None:
+        return 'Comando em lote (executemany)'
+    dialect = slow.engine.dialect.name
+    if dialect == 'sqlite':
+        sql = 'EXPLAIN QUERY PLAN ' + slow.statement
+    elif dialect == 'postgresql':
+        sql = 'EXPLAIN ' + slow.statement
+    else:
+        return f'EXPLAIN não suportado para {dialect}'
+    try:
+        with slow.engine.connect() as conn:
+            rows = conn.exec_driver_sql(sql, slow.parameters).fetchall()
+    except Exception as exc:
+        return f'Erro ao obter o plano: {exc}'
+    if dialect == 'sqlite':
+        # (id, parent, notused, detail): recuo pela profundidade do passo
+        depth = {0: -1}
+        lines = []
+        for row_id, parent, _, detail in rows:
+            depth[row_id] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[row_id] + detail)
+        return '\n'.join(lines)
+    return '\n'.join(row[0] for row in rows)
+
+
+# Instância única usada pela aplicação (inicializada em create_app)
+request_profiler = RequestProfiler()
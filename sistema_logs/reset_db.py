@@ -6,7 +6,7 @@ import sys
 sys.path.insert(0, os.path.dirname(__file__))
 
 from app import create_app
-from extensions import db
+from extensions import db, create_tables
 from models import User, UserRole
 from werkzeug.security import generate_password_hash
 
@@ -20,8 +20,8 @@ if os.path.exists(db_path):
 app = create_app()
 
 with app.app_context():
-    # Criar todas tabelas
-    db.create_all()
+    # Criar todas tabelas (cada uma no seu bind)
+    create_tables()
     print("✓ Tabelas criadas com sucesso")
     
     # Criar usuário admin
@@ -0,0 +1,211 @@
+"""
+Rollups horários de logs de acesso (AccessLogRollup).
+
+Responsável por:
+- Atualizar as contagens horárias a cada lote de logs gravado (update_rollups)
+- Remover as contagens de usuários/dispositivos excluídos (discard_rollups)
+- Somar contagens por janela de tempo e dimensões (rollup_count)
+- Reconstruir os rollups a partir dos logs existentes (flask rollups rebuild)
+- Comparar rollups com contagens brutas (flask rollups check)
+
+Os rollups cobrem apenas a tabela principal: logs movidos para os arquivos
+mensais são descontados no arquivamento (ver archive.py), e check/rebuild
+também consideram só a tabela principal.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+
+from extensions import db
+from interning import string_interner
+from models import AccessLog, AccessLogRollup
+
+# Dimensões agregadas (na ordem da chave única)
+ROLLUP_DIMENSIONS = ('hour', 'action', 'status', 'is_suspicious', 'device_id', 'user_id')
+
+# Comandos de linha de comando: flask rollups <comando>
+rollups_cli = AppGroup('rollups', help='Manutenção dos rollups horários de logs.')
+
+
+def truncate_hour(dt):
+    """Início da hora de um datetime (sem fuso, como é gravado no SQLite)"""
+    return dt.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def _dialect():
+    """Dialeto do banco dos rollups (pode ser o bind de logs, ver extensions.py)"""
+    return db.session.get_bind(AccessLogRollup).dialect.name
+
+
+def _hour_expression(column):
+    """Expressão SQL que trunca um DateTime para a hora, por dialeto"""
+    if _dialect() == 'postgresql':
+        return func.date_trunc('hour', column)
+    # Mesmo formato de texto usado pelo SQLAlchemy para DateTime no SQLite
+    return func.strftime('%Y-%m-%d %H:00:00.000000', column)
+
+
+def _upsert(rows):
+    """INSERT ... ON CONFLICT somando as contagens (SQLite e PostgreSQL)"""
+    if _dialect() == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(AccessLogRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_DIMENSIONS),
+        set_={'count': AccessLogRollup.count + stmt.excluded['count']}
+    )
+    db.session.execute(stmt)
+
+
+def update_rollups(logs, delta=1):
+    """
+    Soma um lote de logs às contagens horárias, na transação corrente.
+    Chamada por persist_events antes do commit.
+
+    Args:
+        logs: Objetos AccessLog (com access_time preenchido)
+        delta: 1 para somar; -1 para descontar (ex: antes de alterar
+               is_suspicious de logs já gravados, ver anomaly.py, ou ao
+               arquivar logs, ver archive.py)
+    """
+    counts = Counter(
+        (truncate_hour(log.access_time), log.action, log.status,
+         bool(log.is_suspicious), log.device_id or 0, log.user_id)
+        for log in logs
+    )
+    if counts:
+        # Ações/status novos precisam de id antes do upsert (gravado como inteiro)
+        string_interner.intern('log_action', {key[1] for key in counts})
+        string_interner.intern('log_status', {key[2] for key in counts})
+        _upsert([dict(zip(ROLLUP_DIMENSIONS, key), count=count * delta)
+                 for key, count in counts.items()])
+
+
+def discard_rollups(**filters):
+    """
+    Remove, na transação corrente, as contagens de um usuário ou dispositivo
+    cujos logs vão ser apagados em cascata (ver delete_user e a exclusão de
+    dispositivos).
+
+    Args:
+        **filters: Igualdade em dimensões (user_id=... ou device_id=...)
+    """
+    query = db.session.query(AccessLogRollup)
+    for column, value in filters.items():
+        query = query.filter(getattr(AccessLogRollup, column) == value)
+    query.delete(synchronize_session=False)
+
+
+def rollup_count(since=None, **filters):
+    """
+    Conta logs a partir dos rollups.
+    Quando since não cai no início de uma hora, a hora parcial é contada
+    diretamente em AccessLog (intervalo curto, coberto por índice).
+
+    Args:
+        since: Contar apenas logs com access_time >= since (opcional)
+        **filters: Igualdade em dimensões (action, status, is_suspicious, ...)
+
+    Returns:
+        int: Quantidade de logs
+    """
+    query = db.session.query(func.coalesce(func.sum(AccessLogRollup.count), 0))
+    for column, value in filters.items():
+        query = query.filter(getattr(AccessLogRollup, column) == value)
+    if since is None:
+        return query.scalar()
+
+    since = since.replace(tzinfo=None)
+    first_full_hour = truncate_hour(since)
+    partial = 0
+    if first_full_hour < since:
+        first_full_hour += timedelta(hours=1)
+        partial = AccessLog.query.filter(
+            AccessLog.access_time >= since,
+            AccessLog.access_time < first_full_hour,
+            *[getattr(AccessLog, column) == value for column, value in filters.items()]
+        ).count()
+    return query.filter(AccessLogRollup.hour >= first_full_hour).scalar() + partial
+
+
+def _raw_counts_select():
+    """SELECT agrupado de AccessLog nas mesmas dimensões dos rollups"""
+    hour = _hour_expression(AccessLog.access_time)
+    return (select(hour.label('hour'),
+                   AccessLog.action,
+                   AccessLog.status,
+                   func.coalesce(AccessLog.is_suspicious, False).label('is_suspicious'),
+                   func.coalesce(AccessLog.device_id, 0).label('device_id'),
+                   AccessLog.user_id,
+                   func.count().label('count'))
+            .group_by(hour, AccessLog.action, AccessLog.status,
+                      func.coalesce(AccessLog.is_suspicious, False),
+                      func.coalesce(AccessLog.device_id, 0), AccessLog.user_id))
+
+
+def _normalize_key(row):
+    """Chave comparável entre consultas (booleanos como 0/1, demais como texto)"""
+    return tuple(str(int(v)) if isinstance(v, bool) else str(v) for v in row)
+
+
+def rebuild_rollups():
+    """
+    Recria todos os rollups a partir de AccessLog (backfill) em uma transação.
+
+    Returns:
+        int: Quantidade de linhas de rollup geradas
+    """
+    db.session.query(AccessLogRollup).delete()
+    db.session.execute(
+        AccessLogRollup.__table__.insert().from_select(
+            list(ROLLUP_DIMENSIONS) + ['count'], _raw_counts_select()
+        )
+    )
+    db.session.commit()
+    return db.session.query(AccessLogRollup).count()
+
+
+def check_rollups():
+    """
+    Compara os rollups com as contagens brutas de AccessLog.
+
+    Returns:
+        list: Tuplas (chave, contagem_rollup, contagem_bruta) divergentes
+    """
+    raw = {_normalize_key(row[:-1]): row[-1]
+           for row in db.session.execute(_raw_counts_select())}
+    table = AccessLogRollup.__table__
+    stored_select = (select(_hour_expression(table.c.hour),
+                            *[table.c[d] for d in ROLLUP_DIMENSIONS[1:]],
+                            table.c.count)
+                     .where(table.c.count != 0))
+    stored = {_normalize_key(row[:-1]): row[-1]
+              for row in db.session.execute(stored_select)}
+    return [(key, stored.get(key, 0), raw.get(key, 0))
+            for key in sorted(set(raw) | set(stored))
+            if stored.get(key, 0) != raw.get(key, 0)]
+
+
+@rollups_cli.command('rebuild')
+def rebuild_command():
+    """Recria os rollups horários a partir dos logs existentes."""
+    total = rebuild_rollups()
+    click.echo(f'✓ Rollups reconstruídos: {total} linhas')
+
+
+@rollups_cli.command('check')
+def check_command():
+    """Verifica se os rollups batem com as contagens brutas."""
+    mismatches = check_rollups()
+    if not mismatches:
+        click.echo('✓ Rollups consistentes com AccessLog')
+        return
+    for key, stored, raw in mismatches[:50]:
+        click.echo(f'✗ {dict(zip(ROLLUP_DIMENSIONS, key))}: rollup={stored} bruto={raw}')
+    raise SystemExit(f'{len(mismatches)} divergência(s) encontrada(s)')
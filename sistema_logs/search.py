@@ -0,0 +1,254 @@
+"""
+Busca textual (FTS5) em logs de acesso e alertas.
+
+Índices FTS5 de conteúdo externo, mantidos por triggers no próprio banco de
+logs (inclusive nos arquivos mensais, ver archive.py), de modo que qualquer
+caminho de escrita (log_access, gravação em lote, arquivamento) os atualiza:
+- access_log_fts: AccessLog.details e AccessLog.user_agent (no banco de logs
+  o user agent é um id de log_user_agent; o índice lê o texto pela view
+  access_log_fts_content, ver interning.py)
+- alert_fts: Alert.title e Alert.description
+
+Responsável por:
+- Criar os índices e triggers que faltam (init_search, em create_app)
+- Converter o texto digitado em uma consulta FTS5 segura (fts_query)
+- Filtrar, ordenar por relevância (bm25) e destacar trechos (snippet)
+- Reconstruir os índices (flask search rebuild)
+
+Em bancos que não são SQLite, a busca usa LIKE (sem ranking nem trechos).
+"""
+
+import re
+import sqlite3
+
+import click
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+from sqlalchemy import column, func, inspect, literal_column, or_, select, table
+
+from extensions import db
+from models import AccessLog, Alert, LogUserAgent
+
+# Marcadores do trecho destacado (trocados por <mark> depois de escapar o HTML)
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+
+# Tokens com acentos e maiúsculas normalizados (busca "acao" encontra "Ação")
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Tabelas indexadas: nome do índice -> (tabela base, colunas indexadas)
+FTS_INDEXES = {
+    'access_log_fts': ('access_log', ('details', 'user_agent')),
+    'alert_fts': ('alert', ('title', 'description')),
+}
+
+# Colunas indexadas guardadas como id de uma tabela de valores (coluna -> tabela)
+FTS_LOOKUPS = {
+    'access_log_fts': {'user_agent': 'log_user_agent'},
+}
+
+# Comandos de linha de comando: flask search <comando>
+search_cli = AppGroup('search', help='Manutenção dos índices de busca textual.')
+
+
+# ========== CRIAÇÃO DOS ÍNDICES ==========
+
+def fts_ddl(index_name, lookups=True):
+    """
+    Comandos SQL que criam um índice FTS5 e os triggers que o mantêm.
+    Os triggers de UPDATE só disparam quando as colunas indexadas mudam
+    (atualizações de contagem/estado não reescrevem o índice).
+
+    Args:
+        index_name: Nome do índice (chave de FTS_INDEXES)
+        lookups: Colunas de FTS_LOOKUPS são ids (banco de logs); False nos
+                 arquivos mensais, que guardam o texto
+    """
+    base, columns = FTS_INDEXES[index_name]
+    lookup_columns = FTS_LOOKUPS.get(index_name, {}) if lookups else {}
+    cols = ', '.join(columns)
+
+    def value(row, c):
+        if c in lookup_columns:
+            return f'(SELECT value FROM {lookup_columns[c]} WHERE id = {row}.{c})'
+        return f'{row}.{c}'
+
+    def values(row):
+        return ', '.join(value(row, c) for c in columns)
+
+    delete_old = (f"INSERT INTO {index_name}({index_name}, rowid, {cols}) "
+                  f"VALUES ('delete', old.id, {values('old')});")
+    insert_new = f"INSERT INTO {index_name}(rowid, {cols}) VALUES (new.id, {values('new')});"
+    content = base
+    ddl = []
+    if lookup_columns:
+        # Conteúdo externo com o texto das colunas guardadas como id
+        content = f'{index_name}_content'
+        view_columns = ', '.join(f'{value(base, c)} AS {c}' for c in columns)
+        ddl.append(f"CREATE VIEW IF NOT EXISTS {content} AS SELECT id, {view_columns} FROM {base}")
+    return ddl + [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5({cols}, "
+        f"content='{content}', content_rowid='id', tokenize='{FTS_TOKENIZER}')",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_ai AFTER INSERT ON {base} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_ad AFTER DELETE ON {base} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_au AFTER UPDATE OF {cols} ON {base} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def fts_available():
+    """Busca FTS5 disponível (banco de logs SQLite)"""
+    return db.session.get_bind(AccessLog).dialect.name == 'sqlite'
+
+
+def ensure_fts_index(conn, index_name, lookups=True):
+    """
+    Cria o índice e os triggers se ainda não existirem. Um índice recém-criado
+    é preenchido com as linhas já existentes (uma vez, na criação).
+
+    Args:
+        conn: Conexão DB-API (sqlite3) ou Connection do SQLAlchemy
+        lookups: Ver fts_ddl (False nos arquivos mensais)
+
+    Returns:
+        bool: True se o índice foi criado agora
+    """
+    execute = getattr(conn, 'exec_driver_sql', None) or conn.execute
+    exists = execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                     (index_name,)).fetchone()
+    for sql in fts_ddl(index_name, lookups):
+        execute(sql)
+    if not exists:
+        execute(f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')")
+    return not exists
+
+
+def init_search(app):
+    """Cria os índices de busca que faltam no banco de logs (chamada em create_app)"""
+    with app.app_context():
+        if not fts_available():
+            return
+        with db.session.get_bind(AccessLog).begin() as conn:
+            for index_name in FTS_INDEXES:
+                ensure_fts_index(conn, index_name)
+
+
+# ========== CONSULTA ==========
+
+def fts_query(text):
+    """
+    Converte o texto digitado em uma consulta FTS5 sem erros de sintaxe:
+    cada palavra vira um termo entre aspas (todas obrigatórias); palavra
+    terminada em * busca por prefixo.
+
+    Returns:
+        str: Consulta FTS5, ou '' se o texto não tiver palavras
+    """
+    terms = re.findall(r'(\w+)(\*?)', text or '')
+    return ' '.join(f'"{word}"{star}' for word, star in terms)
+
+
+def _fts_table(index_name, entity):
+    """Tabela FTS no mesmo schema da entidade (banco de logs ou arquivo mensal)"""
+    schema = inspect(entity).selectable.schema
+    return table(index_name, column('rowid'), schema=schema)
+
+
+def search_logs(query, entity, text):
+    """
+    Restringe uma query de logs aos que contêm os termos buscados.
+
+    Args:
+        query: Query de AccessLog (ou entidade de arquivo mensal)
+        entity: Entidade consultada
+        text: Texto digitado no parâmetro q
+
+    Returns:
+        Query: Query filtrada (com JOIN no índice FTS quando disponível);
+               sem alteração se o texto não tiver palavras
+    """
+    if not fts_query(text):
+        return query
+    if not fts_available():
+        pattern = f'%{text}%'
+        user_agents = select(LogUserAgent.id).where(LogUserAgent.value.ilike(pattern))
+        return query.filter(or_(entity.details.ilike(pattern), entity.user_agent.in_(user_agents)))
+    fts = _fts_table('access_log_fts', entity)
+    return (query.join(fts, fts.c.rowid == entity.id)
+            .filter(literal_column('access_log_fts').op('MATCH')(fts_query(text))))
+
+
+def search_alerts(query, text):
+    """Restringe uma query de alertas aos que contêm os termos buscados"""
+    if not fts_query(text):
+        return query
+    if not fts_available():
+        pattern = f'%{text}%'
+        return query.filter(or_(Alert.title.ilike(pattern), Alert.description.ilike(pattern)))
+    fts = table('alert_fts', column('rowid'))
+    return (query.join(fts, fts.c.rowid == Alert.id)
+            .filter(literal_column('alert_fts').op('MATCH')(fts_query(text))))
+
+
+def snippet_column(index_name, tokens=12):
+    """
+    Coluna com o trecho do texto que contém os termos (snippet do FTS5),
+    rotulada 'snippet'. Só vale em queries filtradas por search_logs/search_alerts.
+    """
+    if not fts_available():
+        return literal_column('NULL').label('snippet')
+    return func.snippet(literal_column(index_name), -1, SNIPPET_START, SNIPPET_END,
+                        '…', tokens).label('snippet')
+
+
+def rank_column(index_name):
+    """Relevância bm25 (menor = mais relevante), rotulada 'relevance'"""
+    if not fts_available():
+        return literal_column('0').label('relevance')
+    return func.bm25(literal_column(index_name)).label('relevance')
+
+
+def highlight(snippet):
+    """Trecho seguro para o template: HTML escapado e termos em <mark>"""
+    if not snippet:
+        return ''
+    return Markup(str(escape(snippet))
+                  .replace(SNIPPET_START, '<mark>')
+                  .replace(SNIPPET_END, '</mark>'))
+
+
+# ========== COMANDOS CLI ==========
+
+def rebuild_search():
+    """
+    Reconstrói os índices do banco de logs e dos arquivos mensais.
+
+    Returns:
+        list: Nomes dos bancos reconstruídos
+    """
+    from archive import archive_months  # import local: archive.py importa este módulo
+
+    rebuilt = []
+    with db.session.get_bind(AccessLog).begin() as conn:
+        for index_name in FTS_INDEXES:
+            if not ensure_fts_index(conn, index_name):
+                conn.exec_driver_sql(f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')")
+    rebuilt.append('logs')
+    for source in archive_months():
+        conn = sqlite3.connect(source.path)
+        try:
+            if not ensure_fts_index(conn, 'access_log_fts', lookups=False):
+                conn.execute("INSERT INTO access_log_fts(access_log_fts) VALUES ('rebuild')")
+            conn.commit()
+        finally:
+            conn.close()
+        rebuilt.append(source.schema)
+    return rebuilt
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Reconstrói os índices de busca textual a partir das tabelas."""
+    if not fts_available():
+        raise SystemExit('Busca FTS5 disponível apenas para SQLite')
+    for name in rebuild_search():
+        click.echo(f'✓ Índice reconstruído: {name}')
@@ -0,0 +1,337 @@
+"""
+Detecção de primeiro acesso (IP novo / dispositivo novo) por usuário.
+
+Cada usuário tem dois filtros de Bloom: IPs de origem e dispositivos já
+usados em acessos bem-sucedidos. log_access() consulta e atualiza os filtros
+em memória (O(1), sem SELECT em AccessLog): um login ou acesso a partir de um
+IP ou dispositivo que o usuário nunca usou é marcado como suspeito e gera
+alerta pelo caminho normal (persist_events).
+
+- Memória limitada: cada filtro tem tamanho fixo, calculado a partir de
+  NEW_ACCESS_EXPECTED_ITEMS e NEW_ACCESS_FP_RATE, e no máximo
+  NEW_ACCESS_MAX_USERS usuários ficam em memória (LRU)
+- Falso positivo (IP novo tomado como conhecido) com probabilidade de cerca de
+  NEW_ACCESS_FP_RATE enquanto o usuário tiver até NEW_ACCESS_EXPECTED_ITEMS
+  valores; não há falso negativo (um IP conhecido nunca é tomado como novo)
+- Persistência na tabela access_sketch, gravada na mesma transação dos logs.
+  Ao gravar, os bits já salvos são somados (OR) aos da memória, então workers
+  diferentes não apagam o que o outro aprendeu
+- Usuário sem filtro salvo: filtros montados a partir do histórico de
+  AccessLog na primeira consulta; flask sketches rebuild monta todos de uma vez
+- Histórico: acessos bem-sucedidos com as ações de NEW_ACCESS_ACTIONS.
+  flask sketches rebuild lê a tabela principal e os meses arquivados
+  (archive.log_sources); a montagem na primeira consulta lê só a tabela
+  principal
+
+Usuários sem histórico (filtro vazio) não têm acessos marcados: o primeiro
+IP de um usuário novo não é suspeito.
+
+Desativada por padrão (NEW_ACCESS_DETECTION): cada acesso novo gera alerta
+HIGH. Ao ativar em uma instalação existente, executar flask sketches rebuild
+antes, para que os filtros já tenham o histórico de todos os usuários,
+inclusive os logs já arquivados (sem o rebuild, um IP visto só em meses
+arquivados é tratado como novo).
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import LargeBinary, distinct, func, select, type_coerce
+
+from archive import log_sources
+from extensions import db
+from models import AccessLog, AccessSketch, get_brasilia_now
+from ip_ranges import pack_ip
+
+# Tipos de filtro por usuário
+KINDS = ('ip', 'device')
+
+# Usuários gravados por INSERT na reconstrução completa
+REBUILD_BATCH_SIZE = 500
+
+# Comandos de linha de comando: flask sketches <comando>
+sketches_cli = AppGroup('sketches', help='Filtros de primeiro acesso por usuário.')
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre um bytearray (k posições por item, hashing duplo)"""
+
+    __slots__ = ('bits', 'num_bits', 'num_hashes')
+
+    def __init__(self, num_bits, num_hashes, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, items, fp_rate):
+        """Filtro dimensionado para items valores com a taxa de falso positivo dada"""
+        num_bits = max(8, math.ceil(-items * math.log(fp_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / items * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        """Inclui um valor. Returns: True se algum bit mudou (valor possivelmente novo)"""
+        changed = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                changed = True
+        return changed
+
+    def merge(self, bits):
+        """Soma (OR) os bits de outro filtro de mesmo tamanho"""
+        self.bits = bytearray(a | b for a, b in zip(self.bits, bits))
+
+    def is_empty(self):
+        return not any(self.bits)
+
+    def estimated_count(self):
+        """Quantidade estimada de valores (pela fração de bits ligados)"""
+        set_bits = sum(bin(byte).count('1') for byte in self.bits)
+        if set_bits >= self.num_bits:
+            return float('inf')
+        return -self.num_bits / self.num_hashes * math.log(1 - set_bits / self.num_bits)
+
+
+def sketch_key(kind, value):
+    """Chave do valor no filtro (IPs na forma binária: grafias diferentes coincidem)"""
+    if kind == 'ip':
+        return pack_ip(value)
+    return str(value).encode() if value is not None else None
+
+
+class AccessSketches:
+    """
+    Filtros de IPs e dispositivos por usuário (LRU em memória + tabela).
+    Segue o padrão das extensões Flask (instância no módulo + init_app).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._sketches = OrderedDict()  # user_id -> {kind: BloomFilter}
+        self._dirty = {}                # user_id -> {kind: BloomFilter} ainda não gravados
+        self._lock = threading.Lock()
+        self.stats = {'checked': 0, 'new': 0, 'loads': 0, 'rebuilds': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('NEW_ACCESS_DETECTION', False)
+        self.expected_items = app.config.get('NEW_ACCESS_EXPECTED_ITEMS', 256)
+        self.fp_rate = app.config.get('NEW_ACCESS_FP_RATE', 0.01)
+        self.max_users = app.config.get('NEW_ACCESS_MAX_USERS', 10000)
+        self.actions = set(app.config.get('NEW_ACCESS_ACTIONS', ('system_login', 'device_access')))
+        self.clear()
+        app.extensions['access_sketches'] = self
+
+    def new_filter(self):
+        return BloomFilter.for_capacity(self.expected_items, self.fp_rate)
+
+    def clear(self):
+        with self._lock:
+            self._sketches.clear()
+            self._dirty.clear()
+
+    # ---------- Consulta no caminho de log_access ----------
+
+    def observe(self, user_id, device_id, ip_address, action, status):
+        """
+        Verifica e registra o IP e o dispositivo de um acesso bem-sucedido.
+
+        Returns:
+            list: Descrições do que é novo para o usuário (vazia se nada, se o
+                  usuário ainda não tem histórico ou se a ação não é verificada)
+        """
+        if not self.enabled or status != 'success' or action not in self.actions:
+            return []
+        self.stats['checked'] += 1
+        sketches = self.sketches(user_id)
+        novelties = []
+        with self._lock:
+            for kind, value in (('ip', ip_address), ('device', device_id)):
+                key = sketch_key(kind, value)
+                if key is None:
+                    continue
+                sketch = sketches[kind]
+                had_history = not sketch.is_empty()
+                if sketch.add(key):
+                    self._dirty[user_id] = sketches
+                    if had_history:
+                        novelties.append(kind)
+        self.stats['new'] += len(novelties)
+        labels = {'ip': f'Primeiro acesso do usuário a partir do IP {ip_address}',
+                  'device': f'Primeiro acesso do usuário ao dispositivo {device_id}'}
+        return [labels[kind] for kind in novelties]
+
+    def sketches(self, user_id):
+        """Filtros do usuário (memória, tabela ou histórico, nessa ordem)"""
+        with self._lock:
+            sketches = self._sketches.get(user_id)
+            if sketches is not None:
+                self._sketches.move_to_end(user_id)
+                return sketches
+
+        sketches = self._dirty.get(user_id) or self._load(user_id)
+        with self._lock:
+            sketches = self._sketches.setdefault(user_id, sketches)
+            self._sketches.move_to_end(user_id)
+            while len(self._sketches) > self.max_users:
+                self._sketches.popitem(last=False)
+                self.stats['evictions'] += 1
+        return sketches
+
+    def _load(self, user_id):
+        """
+        Filtros salvos do usuário; sem filtro salvo (ou de outro tamanho), monta
+        pelo histórico da tabela principal (meses arquivados só no rebuild)
+        """
+        template = self.new_filter()
+        rows = {row.kind: row for row in AccessSketch.query.filter_by(user_id=user_id)}
+        if all(kind in rows and rows[kind].num_bits == template.num_bits
+               and rows[kind].num_hashes == template.num_hashes for kind in KINDS):
+            self.stats['loads'] += 1
+            return {kind: BloomFilter(rows[kind].num_bits, rows[kind].num_hashes, rows[kind].bits)
+                    for kind in KINDS}
+
+        self.stats['rebuilds'] += 1
+        sketches = {kind: self.new_filter() for kind in KINDS}
+        query = history_query(self.actions).where(AccessLog.__table__.c.user_id == user_id)
+        for ip_address, device_id in db.session.execute(query, bind_arguments={'mapper': AccessLog}):
+            add_history(sketches, ip_address, device_id)
+        with self._lock:
+            self._dirty[user_id] = sketches
+        return sketches
+
+    # ---------- Persistência ----------
+
+    def save(self):
+        """
+        Grava os filtros alterados na transação corrente (chamado por
+        persist_events antes do commit). Bits já salvos por outros processos
+        são somados aos da memória.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if dirty:
+            save_sketches(dirty, merge=True)
+
+
+def history_query(actions, table=None):
+    """
+    IPs e dispositivos dos acessos bem-sucedidos com as ações informadas, sem
+    repetição. Na tabela principal o IP vem binário; em um arquivo mensal
+    (table de archive.LogSource) vem em texto.
+    """
+    if table is None:
+        table = AccessLog.__table__
+    ip_column = table.c.ip_address
+    if table is AccessLog.__table__:
+        ip_column = type_coerce(ip_column, LargeBinary)
+    return (select(ip_column, table.c.device_id)
+            .where(table.c.status == 'success', table.c.action.in_(sorted(actions)))
+            .distinct())
+
+
+def add_history(sketches, ip_address, device_id):
+    if isinstance(ip_address, str):
+        ip_address = pack_ip(ip_address)
+    if ip_address is not None:
+        sketches['ip'].add(bytes(ip_address))
+    if device_id is not None:
+        sketches['device'].add(str(device_id).encode())
+
+
+def save_sketches(sketches_by_user, merge=False):
+    """
+    Grava filtros (INSERT ... ON CONFLICT), na transação corrente.
+
+    Args:
+        sketches_by_user: user_id -> {kind: BloomFilter}
+        merge: Somar (OR) os bits já salvos antes de gravar
+    """
+    user_ids = list(sketches_by_user)
+    if merge:
+        stored = AccessSketch.query.filter(AccessSketch.user_id.in_(user_ids)).all()
+        for row in stored:
+            sketch = sketches_by_user[row.user_id].get(row.kind)
+            if sketch is not None and row.num_bits == sketch.num_bits and row.num_hashes == sketch.num_hashes:
+                sketch.merge(row.bits)
+
+    if db.session.get_bind(AccessSketch).dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    now = get_brasilia_now()
+    rows = [{'user_id': user_id, 'kind': kind, 'num_bits': sketch.num_bits,
+             'num_hashes': sketch.num_hashes, 'item_count': round(min(sketch.estimated_count(), 2 ** 31 - 1)),
+             'bits': bytes(sketch.bits), 'updated_at': now}
+            for user_id, sketches in sketches_by_user.items() for kind, sketch in sketches.items()]
+    stmt = insert(AccessSketch).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'kind'],
+        set_={column: stmt.excluded[column]
+              for column in ('num_bits', 'num_hashes', 'item_count', 'bits', 'updated_at')})
+    db.session.execute(stmt)
+
+
+def rebuild_sketches():
+    """
+    Recria os filtros de todos os usuários a partir de AccessLog e dos meses
+    arquivados (uma leitura ordenada por usuário em cada fonte, gravação em
+    lotes; os meses arquivados são somados aos filtros já gravados).
+
+    Returns:
+        tuple: (usuários, usuários com mais valores que NEW_ACCESS_EXPECTED_ITEMS)
+    """
+    db.session.query(AccessSketch).delete()
+    for position, source in enumerate(log_sources()):
+        source.attach()
+        table = source.table
+        query = (history_query(access_sketches.actions, table).add_columns(table.c.user_id)
+                 .order_by(table.c.user_id))
+        batch = {}
+        for ip_address, device_id, user_id in db.session.execute(query, bind_arguments={'mapper': AccessLog}):
+            if user_id not in batch:
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    save_sketches(batch, merge=position > 0)
+                    batch = {}
+                batch[user_id] = {kind: access_sketches.new_filter() for kind in KINDS}
+            add_history(batch[user_id], ip_address, device_id)
+        if batch:
+            save_sketches(batch, merge=position > 0)
+
+    users = db.session.query(func.count(distinct(AccessSketch.user_id))).scalar()
+    saturated = (db.session.query(func.count(distinct(AccessSketch.user_id)))
+                 .filter(AccessSketch.item_count > access_sketches.expected_items).scalar())
+    db.session.commit()
+    access_sketches.clear()
+    return users, saturated
+
+
+@sketches_cli.command('rebuild')
+def rebuild_command():
+    """Recria os filtros de primeiro acesso a partir dos logs existentes."""
+    users, saturated = rebuild_sketches()
+    click.echo(f'✓ Filtros recriados para {users} usuário(s)')
+    if saturated:
+        click.echo(f'  {saturated} usuário(s) com mais valores que NEW_ACCESS_EXPECTED_ITEMS '
+                   f'(taxa de falso positivo acima da configurada)')
+
+
+# Instância única usada por log_access() (inicializada em create_app)
+access_sketches = AccessSketches()
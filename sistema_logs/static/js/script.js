@@ -4,7 +4,7 @@
  * 
  * Funcionalidades:
  * - Inicialização de tooltips e confirmações
- * - Filtros de data e auto-refresh
+ * - Filtros de data e atualização ao vivo (Server-Sent Events)
  * - Exportação de tabelas para CSV
  * - Fetch de dados via AJAX
  * - Sistema de notificações
@@ -33,8 +33,8 @@ function initializeApp() {
     // Inicializar filtros de data nos formulários
     initializeDateFilters();
     
-    // Inicializar auto-refresh (se a página tiver o atributo data-auto-refresh)
-    initializeAutoRefresh();
+    // Inicializar atualização ao vivo (tabelas com o atributo data-live-stream)
+    initializeLiveStreams();
 }
 
 /**
@@ -86,23 +86,137 @@ function initializeDateFilters() {
     }
 }
 
+/* ========== ATUALIZAÇÃO AO VIVO (SSE) ========== */
+
 /**
- * Auto-refresh de páginas que precisam de dados em tempo real
- * Usa atributo data-auto-refresh na página
- * Exemplo: <div data-auto-refresh data-refresh-interval="30000">
+ * Conecta as tabelas com atributo data-live-stream ao endpoint de eventos
+ * (/logs/stream) e insere os logs novos no topo, sem recarregar a página.
+ * Exemplo: <table data-live-stream="/logs/stream?suspicious=true"
+ *                 data-live-columns="id,user,device,action,status,ip,time,details"
+ *                 data-live-limit="50">
+ * Alertas novos (admin, parâmetro alerts=1) exibem uma notificação e somam 1
+ * nos elementos com data-live-counter="alerts".
+ * Em queda de conexão o navegador reconecta sozinho e recebe o que perdeu.
  */
-function initializeAutoRefresh() {
-    // Verifica se a página tem atributo de auto-refresh
-    if (document.querySelector('[data-auto-refresh]')) {
-        // Intervalo padrão: 30 segundos (30000ms)
-        const refreshInterval = document.querySelector('[data-auto-refresh]').getAttribute('data-refresh-interval') || 30000;
-        setInterval(() => {
-            // Só atualiza se a aba está visível (não recarrega em background)
-            if (!document.hidden) {
-                window.location.reload();
+function initializeLiveStreams() {
+    if (!window.EventSource) {
+        return;
+    }
+    document.querySelectorAll('[data-live-stream]').forEach(table => {
+        const source = new EventSource(table.getAttribute('data-live-stream'));
+        const columns = (table.getAttribute('data-live-columns') || '').split(',');
+        const limit = parseInt(table.getAttribute('data-live-limit') || '0', 10);
+        const tbody = table.querySelector('tbody');
+        
+        source.addEventListener('log', event => {
+            const log = JSON.parse(event.data);
+            tbody.insertBefore(buildLogRow(log, columns), tbody.firstChild);
+            // Manter no máximo "limit" linhas na tabela
+            while (limit && tbody.rows.length > limit) {
+                tbody.deleteRow(-1);
             }
-        }, refreshInterval);
+            document.querySelectorAll('[data-live-empty]').forEach(el => el.remove());
+        });
+        
+        source.addEventListener('alert', event => {
+            const alert = JSON.parse(event.data);
+            document.querySelectorAll('[data-live-counter="alerts"]').forEach(el => {
+                el.textContent = (parseInt(el.textContent, 10) || 0) + 1;
+            });
+            showNotification(`<i class="bi bi-exclamation-triangle"></i> ${escapeHtml(alert.title)}`, 'warning');
+        });
+        
+        window.addEventListener('beforeunload', () => source.close());
+    });
+}
+
+/**
+ * Monta a linha <tr> de um log recebido ao vivo (mesmo visual das tabelas)
+ * @param {object} log - Log recebido do servidor
+ * @param {string[]} columns - Colunas da tabela, na ordem
+ * @returns {HTMLTableRowElement} Linha pronta para inserir
+ */
+function buildLogRow(log, columns) {
+    const row = document.createElement('tr');
+    if (log.is_suspicious) {
+        row.className = 'table-warning';
     }
+    
+    // Elemento com classe e texto (texto nunca é interpretado como HTML)
+    const el = (tag, className, text) => {
+        const node = document.createElement(tag);
+        if (className) node.className = className;
+        if (text !== undefined) node.textContent = text;
+        return node;
+    };
+    
+    columns.forEach(column => {
+        const cell = document.createElement('td');
+        switch (column) {
+            case 'id':
+                cell.appendChild(el('small', 'text-muted', `#${log.id}`));
+                break;
+            case 'user':
+                cell.appendChild(el('strong', '', log.username || ''));
+                if (log.is_suspicious) {
+                    const icon = el('i', 'bi bi-exclamation-triangle-fill text-warning');
+                    icon.title = 'Atividade Suspeita';
+                    cell.append(' ', icon);
+                }
+                break;
+            case 'device':
+                cell.textContent = log.device_name || 'Sistema';
+                break;
+            case 'action':
+                cell.appendChild(el('span', 'badge bg-secondary', log.action));
+                break;
+            case 'status':
+                cell.appendChild(el('span', `badge ${log.status === 'success' ? 'bg-success' : 'bg-danger'}`, log.status));
+                break;
+            case 'ip':
+                cell.appendChild(el('code', '', log.ip_address || ''));
+                break;
+            case 'time':
+            case 'time_short':
+                cell.textContent = formatLogTime(log.access_time, column === 'time');
+                break;
+            case 'details':
+                if (log.details) {
+                    const button = el('button', 'btn btn-sm btn-outline-info');
+                    button.title = log.details;
+                    button.setAttribute('data-bs-toggle', 'tooltip');
+                    button.appendChild(el('i', 'bi bi-info-circle'));
+                    cell.appendChild(button);
+                    new bootstrap.Tooltip(button);
+                }
+                break;
+        }
+        row.appendChild(cell);
+    });
+    return row;
+}
+
+/**
+ * Formata o horário de um log (ISO, já no fuso de Brasília) como dd/mm/aaaa hh:mm[:ss]
+ * @param {string} iso - Data/hora em ISO (ex: 2026-10-17T14:05:09.123456)
+ * @param {boolean} withSeconds - Incluir segundos
+ * @returns {string} Data/hora formatada
+ */
+function formatLogTime(iso, withSeconds = true) {
+    const [date, time] = iso.split('T');
+    const [year, month, day] = date.split('-');
+    return `${day}/${month}/${year} ${time.substring(0, withSeconds ? 8 : 5)}`;
+}
+
+/**
+ * Escapa texto para inserção segura em HTML
+ * @param {string} text - Texto a escapar
+ * @returns {string} Texto escapado
+ */
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text || '';
+    return div.innerHTML;
 }
 
 /* ========== EXPORTAÇÃO DE TABELAS ========== */
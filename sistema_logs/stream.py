@@ -0,0 +1,302 @@
+"""
+Transmissão ao vivo de logs e alertas (Server-Sent Events, rota /logs/stream).
+
+Uma única thread por processo (LiveStream) consulta os logs e alertas novos
+a cada LIVE_STREAM_POLL_INTERVAL segundos e distribui cada evento para as
+filas dos assinantes conectados (fan-out): o custo no banco é uma consulta
+por intervalo, independente de quantas abas estão abertas. Cada assinante
+tem um filtro (LogFilter) com os mesmos critérios e a mesma restrição de
+visibilidade da tela de logs.
+
+Os eventos recentes ficam em memória (LIVE_STREAM_BACKLOG) para reenviar o
+que o navegador perdeu ao reconectar (cabeçalho Last-Event-ID). Um assinante
+lento, cuja fila enche, é desconectado e reconecta a partir do backlog.
+
+Cada conexão SSE ocupa uma thread (ou greenlet) do servidor enquanto estiver
+aberta: em produção, use workers com threads ou gevent.
+
+Configurações (config.py): LIVE_STREAM_POLL_INTERVAL, LIVE_STREAM_HEARTBEAT,
+LIVE_STREAM_QUEUE_SIZE, LIVE_STREAM_BACKLOG, LIVE_STREAM_MAX_SUBSCRIBERS.
+"""
+
+import ipaddress
+import json
+import os
+import queue
+import re
+import threading
+import unicodedata
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from extensions import db
+from models import AccessLog, Alert
+
+
+def _normalize(text):
+    """Texto sem acentos e em minúsculas (mesma normalização do índice FTS5)"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+class LogFilter:
+    """
+    Filtros da tela de logs avaliados em memória sobre cada evento.
+    Construído a partir dos parâmetros GET (mesmos de filtered_logs_query).
+    """
+
+    def __init__(self, args, user_id, is_admin):
+        self.is_admin = is_admin
+        # Usuários comuns veem apenas seus próprios logs
+        self.user_id = args.get('user_id', type=int) if is_admin else user_id
+        self.device_id = args.get('device_id', type=int)
+        self.suspicious_only = args.get('suspicious', type=bool)
+        self.alerts = is_admin and args.get('alerts', type=bool)  # alertas: apenas admin
+        self.date_from = self.date_to = None
+        if args.get('date_from'):
+            self.date_from = datetime.strptime(args['date_from'], '%Y-%m-%d')
+        if args.get('date_to'):
+            self.date_to = datetime.strptime(args['date_to'], '%Y-%m-%d') + timedelta(days=1)
+        # ValueError se inválido (a rota responde 400)
+        ip = args.get('ip', '').strip()
+        self.network = ipaddress.ip_network(ip, strict=False) if ip else None
+        # Termos da busca textual (todos obrigatórios; terminados em * = prefixo)
+        self.terms = [(_normalize(word), bool(star))
+                      for word, star in re.findall(r'(\w+)(\*?)', args.get('q', ''))]
+
+    def matches_log(self, log):
+        """Verifica se um evento de log (dict) passa nos filtros"""
+        if self.user_id and log['user_id'] != self.user_id:
+            return False
+        if self.device_id and log['device_id'] != self.device_id:
+            return False
+        if self.suspicious_only and not log['is_suspicious']:
+            return False
+        access_time = datetime.fromisoformat(log['access_time'])
+        if self.date_from and access_time < self.date_from:
+            return False
+        if self.date_to and access_time > self.date_to:
+            return False
+        if self.network is not None:
+            try:
+                if ipaddress.ip_address(log['ip_address'] or '') not in self.network:
+                    return False
+            except ValueError:
+                return False
+        if self.terms:
+            words = set(re.findall(r'\w+', _normalize(f"{log['details']} {log['user_agent']}")))
+            for term, prefix in self.terms:
+                if not (any(w.startswith(term) for w in words) if prefix else term in words):
+                    return False
+        return True
+
+    def matches(self, kind, payload):
+        if kind == 'alert':
+            return self.alerts
+        return self.matches_log(payload)
+
+
+class Subscriber:
+    """Uma conexão SSE: fila própria de eventos e o filtro do navegador"""
+
+    def __init__(self, log_filter, queue_size):
+        self.filter = log_filter
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = False  # fila encheu (cliente lento): conexão encerrada
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped = True
+
+    def get(self, timeout):
+        """Próximo evento, ou None se nada chegou dentro de timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LiveStream:
+    """
+    Distribuidor de eventos ao vivo (uma thread de consulta por processo).
+    Segue o padrão das extensões Flask (instância no módulo + init_app).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._position = None  # (último id de log, último id de alerta) já distribuídos
+        self._backlog = deque()
+        self.stats = {'subscribers': 0, 'polls': 0, 'events': 0, 'dropped': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('LIVE_STREAM_POLL_INTERVAL', 1.0)
+        self.heartbeat = app.config.get('LIVE_STREAM_HEARTBEAT', 15)
+        self.queue_size = app.config.get('LIVE_STREAM_QUEUE_SIZE', 500)
+        self.max_subscribers = app.config.get('LIVE_STREAM_MAX_SUBSCRIBERS', 1000)
+        self._backlog = deque(maxlen=app.config.get('LIVE_STREAM_BACKLOG', 1000))
+        app.extensions['live_stream'] = self
+
+    # ---------- Assinantes ----------
+
+    def subscribe(self, log_filter, last_event_id=None):
+        """
+        Registra uma conexão. Com last_event_id (reconexão), os eventos do
+        backlog posteriores a ele já entram na fila.
+
+        Returns:
+            Subscriber, ou None se o limite de conexões foi atingido
+        """
+        subscriber = Subscriber(log_filter, self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+            self.stats['subscribers'] = len(self._subscribers)
+            since = parse_event_id(last_event_id)
+            if since is not None:
+                for event in self._backlog:
+                    if _is_after(event, since) and log_filter.matches(event['kind'], event['data']):
+                        subscriber.push(event)
+        self._ensure_started()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            self.stats['subscribers'] = len(self._subscribers)
+            if subscriber.dropped:
+                self.stats['dropped'] += 1
+
+    # ---------- Thread de consulta ----------
+
+    def _ensure_started(self):
+        """Inicia a thread sob demanda (também após fork de workers)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._position = None
+            self._thread = threading.Thread(target=self._run, name='live-stream', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            if not self._subscribers:
+                # Sem assinantes: nada é consultado; a posição recomeça do fim
+                self._position = None
+                continue
+            with self.app.app_context():
+                try:
+                    self.poll()
+                except Exception:
+                    self.app.logger.exception('Falha ao consultar eventos ao vivo')
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        """Uma rodada: busca logs e alertas novos e distribui aos assinantes"""
+        self.stats['polls'] += 1
+        if self._position is None:
+            self._position = (db.session.query(func.coalesce(func.max(AccessLog.id), 0)).scalar(),
+                              db.session.query(func.coalesce(func.max(Alert.id), 0)).scalar())
+            return
+        last_log, last_alert = self._position
+        events = []
+        for payload in load_log_events(last_log):
+            last_log = payload['id']
+            events.append(self._event('log', payload, (last_log, last_alert)))
+        for payload in load_alert_events(last_alert):
+            last_alert = payload['id']
+            events.append(self._event('alert', payload, (last_log, last_alert)))
+        self._position = (last_log, last_alert)
+        if events:
+            self.publish(events)
+
+    @staticmethod
+    def _event(kind, payload, position):
+        return {'kind': kind, 'data': payload, 'id': f'{position[0]}.{position[1]}'}
+
+    def publish(self, events):
+        """Entrega os eventos a cada assinante cujo filtro aceita"""
+        with self._lock:
+            self._backlog.extend(events)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for event in events:
+                if subscriber.filter.matches(event['kind'], event['data']):
+                    subscriber.push(event)
+        self.stats['events'] += len(events)
+
+
+def parse_event_id(event_id):
+    """Converte o id de evento ('<log>.<alerta>') em tupla, ou None se inválido"""
+    try:
+        log_id, alert_id = (event_id or '').split('.')
+        return int(log_id), int(alert_id)
+    except ValueError:
+        return None
+
+
+def _is_after(event, position):
+    """Evento posterior à posição (último log e alerta já recebidos)"""
+    kind = 0 if event['kind'] == 'log' else 1
+    return event['data']['id'] > position[kind]
+
+
+def format_sse(event):
+    """Serializa um evento no formato text/event-stream"""
+    data = json.dumps(event['data'], ensure_ascii=False, default=str)
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {data}\n\n"
+
+
+# ========== CARGA DOS EVENTOS ==========
+
+# Máximo de linhas de cada tipo por rodada (o restante sai na rodada seguinte)
+POLL_BATCH_SIZE = 500
+
+
+def load_log_events(after_id):
+    """Logs com id > after_id como dicts (com nomes de usuário e dispositivo)"""
+    # Import local: o blueprint de logs importa este módulo
+    from blueprints.logs import log_listing_query, with_names
+
+    rows = (log_listing_query(AccessLog.query.filter(AccessLog.id > after_id),
+                              extra_columns=('user_agent',))
+            .order_by(AccessLog.id).limit(POLL_BATCH_SIZE).all())
+    return [{'id': log.id, 'user_id': log.user_id, 'username': log.username,
+             'device_id': log.device_id, 'device_name': log.device_name,
+             'action': log.action, 'status': log.status, 'ip_address': log.ip_address,
+             'access_time': log.access_time.isoformat(), 'details': log.details,
+             'user_agent': log.user_agent, 'is_suspicious': bool(log.is_suspicious)}
+            for log in with_names(rows)]
+
+
+def load_alert_events(after_id):
+    """Alertas com id > after_id como dicts"""
+    alerts = (Alert.query.filter(Alert.id > after_id)
+              .order_by(Alert.id).limit(POLL_BATCH_SIZE).all())
+    return [{'id': alert.id, 'title': alert.title, 'alert_level': alert.alert_level.value,
+             'user_id': alert.user_id, 'device_id': alert.device_id,
+             'created_at': alert.created_at.isoformat() if alert.created_at else None}
+            for alert in alerts]
+
+
+# Instância única usada pela rota /logs/stream (inicializada em create_app)
+live_stream = LiveStream()
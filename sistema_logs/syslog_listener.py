@@ -0,0 +1,400 @@
+"""
+Receptor de syslog (RFC 3164 e RFC 5424, UDP e TCP) que grava em AccessLog.
+
+Processo separado da aplicação web: os dispositivos cadastrados enviam seus
+logs para cá, cada mensagem é associada ao Device pelo IP de origem e
+convertida em um evento de acesso pelos padrões de SYSLOG_PATTERNS
+(expressões regulares com grupos nomeados user, ip, action, status).
+
+Recepção e interpretação rodam no loop asyncio, sem acesso ao banco; os
+eventos são acumulados e gravados em lotes (ingest_events, mesma validação e
+gravação de /api/v1/ingest) por uma única thread. Se a gravação não
+acompanha e há mais de SYSLOG_QUEUE_SIZE eventos pendentes, as mensagens
+novas são descartadas e contadas (stats['dropped']) em vez de bloquear a
+recepção.
+
+Configurações (config.py): SYSLOG_HOST, SYSLOG_PORT, SYSLOG_TCP,
+SYSLOG_PATTERNS, SYSLOG_DEFAULT_USER, SYSLOG_ACCEPT_UNKNOWN_DEVICES,
+SYSLOG_BATCH_SIZE, SYSLOG_FLUSH_INTERVAL, SYSLOG_QUEUE_SIZE,
+SYSLOG_REFRESH_INTERVAL.
+
+Uso (a partir da pasta sistema_logs):
+    python syslog_listener.py                        # escuta UDP e TCP
+    python syslog_listener.py --port 5514 --no-tcp
+    python syslog_listener.py send 'Failed password for admin from 10.0.0.9 port 22 ssh2' --count 1000
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import signal
+import socket
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+from models import Device, User, brasilia_tz
+from ip_ranges import pack_ip
+from ingest import ingest_events
+
+# Mensagem interpretada (timestamp só no RFC 5424; no RFC 3164 vale a hora de recepção)
+SyslogMessage = namedtuple('SyslogMessage', 'facility severity timestamp hostname app_name text')
+
+# <PRI>1 TIMESTAMP HOSTNAME APP-NAME PROCID MSGID STRUCTURED-DATA [MSG]
+RFC5424 = re.compile(r'<(\d{1,3})>1 (\S+) (\S+) (\S+) \S+ \S+ '
+                     r'(?:-|(?:\[(?:[^\]\\]|\\.)*\])+)(?: (.*))?$', re.DOTALL)
+# <PRI>Mmm dd hh:mm:ss HOSTNAME TAG[PID]: MSG (cabeçalho opcional)
+RFC3164 = re.compile(r'<(\d{1,3})>(?:[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d (\S+) )?(.*)$', re.DOTALL)
+RFC3164_TAG = re.compile(r'([\w\-./]{1,48})(?:\[[^\]]*\])?: ?(.*)$', re.DOTALL)
+
+# Tamanho máximo de uma mensagem TCP (octet counting ou linha)
+MAX_MESSAGE_SIZE = 64 * 1024
+
+# Buffer de recepção UDP do kernel: absorve rajadas enquanto o loop interpreta
+# (limitado pelo sistema, ex: net.core.rmem_max no Linux)
+UDP_RECEIVE_BUFFER = 8 * 1024 * 1024
+
+
+def parse_syslog(data):
+    """
+    Interpreta uma mensagem syslog.
+
+    Args:
+        data: Bytes recebidos (um datagrama UDP ou um quadro TCP)
+
+    Returns:
+        SyslogMessage, ou None se não for syslog válido
+    """
+    text = data.decode('utf-8', 'replace').rstrip('\r\n\x00')
+    match = RFC5424.match(text)
+    if match:
+        pri, timestamp, hostname, app_name, message = match.groups()
+        return SyslogMessage(int(pri) >> 3, int(pri) & 7,
+                             None if timestamp == '-' else timestamp,
+                             None if hostname == '-' else hostname,
+                             None if app_name == '-' else app_name,
+                             (message or '').lstrip('\ufeff'))
+    match = RFC3164.match(text)
+    if match:
+        pri, hostname, message = match.groups()
+        app_name = None
+        tag = RFC3164_TAG.match(message)
+        if tag:
+            app_name, message = tag.groups()
+        return SyslogMessage(int(pri) >> 3, int(pri) & 7, None, hostname, app_name, message)
+    return None
+
+
+def compile_patterns(patterns):
+    """
+    Compila SYSLOG_PATTERNS.
+
+    Cada padrão é um dict com:
+        regex: Expressão regular (grupos nomeados opcionais: user, ip, action, status)
+        action, status: Valores gravados (os grupos de mesmo nome têm precedência)
+        app: Nome do programa (APP-NAME/TAG) ao qual o padrão se aplica (opcional)
+        suspicious: Marca o evento como suspeito (gera alerta)
+    """
+    return [dict(pattern, regex=re.compile(pattern['regex'])) for pattern in patterns]
+
+
+def _sender_ip(address):
+    """IP do remetente (IPv4 mapeado em IPv6 volta a ser IPv4)"""
+    return address[7:] if address.startswith('::ffff:') and '.' in address else address
+
+
+class SyslogReceiver:
+    """
+    Recebe mensagens (chamado pelos protocolos UDP/TCP no loop asyncio),
+    converte em eventos e entrega os lotes à thread de gravação.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.patterns = compile_patterns(config['SYSLOG_PATTERNS'])
+        self.default_user = config.get('SYSLOG_DEFAULT_USER')
+        self.accept_unknown_devices = config.get('SYSLOG_ACCEPT_UNKNOWN_DEVICES', False)
+        self.batch_size = config.get('SYSLOG_BATCH_SIZE', 1000)
+        self.flush_interval = config.get('SYSLOG_FLUSH_INTERVAL', 0.5)
+        self.queue_size = config.get('SYSLOG_QUEUE_SIZE', 50000)
+        self.refresh_interval = config.get('SYSLOG_REFRESH_INTERVAL', 60)
+        # Uma única thread grava no banco (lotes em ordem, sem disputar o lock do SQLite)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='syslog-writer')
+        self._buffer = []
+        self._pending = 0     # eventos aceitos e ainda não gravados
+        self._writes = set()  # lotes em gravação
+        self._devices = {}    # IP binário -> device_id
+        self._users = {}      # username -> user_id
+        self.stats = {'received': 0, 'invalid': 0, 'unmatched': 0, 'unknown_device': 0,
+                      'unknown_user': 0, 'dropped': 0, 'written': 0, 'rejected': 0, 'errors': 0}
+
+    # ---------- Cadastro de dispositivos e usuários ----------
+
+    def load_directory(self):
+        """Lê IPs de dispositivos e nomes de usuários (roda na thread de gravação)"""
+        with self.app.app_context():
+            try:
+                devices = {ip: device_id for device_id, ip in
+                           db.session.query(Device.id, Device.ip_packed)
+                           .filter(Device.is_active.isnot(False), Device.ip_packed.isnot(None))}
+                users = dict(db.session.query(User.username, User.id))
+            finally:
+                db.session.remove()
+        # Troca inteira dos dicts: o loop nunca vê um cadastro pela metade
+        self._devices, self._users = devices, users
+
+    def refresh_directory(self):
+        """Recarga periódica do cadastro (falhas não param o receptor)"""
+        try:
+            self.load_directory()
+        except Exception:
+            self.app.logger.exception('Falha ao recarregar dispositivos e usuários do syslog')
+
+    # ---------- Recepção (loop asyncio) ----------
+
+    def handle(self, data, address):
+        """Converte uma mensagem em evento e acumula no lote corrente"""
+        self.stats['received'] += 1
+        # Sobrecarga: descarta antes de interpretar (não acumula nem bloqueia)
+        if self._pending >= self.queue_size:
+            self.stats['dropped'] += 1
+            return
+        message = parse_syslog(data)
+        if message is None:
+            self.stats['invalid'] += 1
+            return
+        sender = _sender_ip(address)
+        device_id = self._devices.get(pack_ip(sender))
+        if device_id is None and not self.accept_unknown_devices:
+            self.stats['unknown_device'] += 1
+            return
+        event = self.to_event(message, sender, device_id)
+        if event is None:
+            return
+        self._pending += 1
+        self._buffer.append(event)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def to_event(self, message, sender, device_id):
+        """
+        Evento de acesso (formato de ingest_events) para uma mensagem, pelo
+        primeiro padrão que casar.
+
+        Returns:
+            dict, ou None se nenhum padrão casou ou o usuário é desconhecido
+        """
+        for pattern in self.patterns:
+            if pattern.get('app') and pattern['app'] != message.app_name:
+                continue
+            match = pattern['regex'].search(message.text)
+            if match:
+                break
+        else:
+            self.stats['unmatched'] += 1
+            return None
+
+        groups = match.groupdict()
+        user_id = self._users.get(groups.get('user')) or self._users.get(self.default_user)
+        if user_id is None:
+            self.stats['unknown_user'] += 1
+            return None
+        return {
+            'user_id': user_id,
+            'device_id': device_id,
+            'action': groups.get('action') or pattern['action'],
+            'status': groups.get('status') or pattern['status'],
+            'ip_address': groups.get('ip') if pack_ip(groups.get('ip')) else sender,
+            'user_agent': f'syslog/{message.app_name}' if message.app_name else 'syslog',
+            'details': message.text,
+            'access_time': message.timestamp or datetime.now(brasilia_tz).isoformat(),
+            'is_suspicious': bool(pattern.get('suspicious')),
+        }
+
+    def flush(self):
+        """Entrega o lote corrente à thread de gravação (não bloqueia o loop)"""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch)
+        self._writes.add(future)
+        future.add_done_callback(lambda f: self._written(f, len(batch)))
+
+    def _written(self, future, size):
+        self._writes.discard(future)
+        self._pending -= size
+
+    def _write(self, batch):
+        """Grava um lote (thread de gravação)"""
+        with self.app.app_context():
+            try:
+                result = ingest_events(batch)
+                self.stats['written'] += result['accepted']
+                self.stats['rejected'] += result['rejected']
+            except Exception:
+                self.stats['errors'] += len(batch)
+                self.app.logger.exception('Falha ao gravar lote de %d mensagens syslog', len(batch))
+            finally:
+                db.session.remove()
+
+    async def run_periodic(self, stop):
+        """Grava lotes parciais a cada SYSLOG_FLUSH_INTERVAL e recarrega o cadastro"""
+        loop = asyncio.get_running_loop()
+        next_refresh = loop.time() + self.refresh_interval
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush()
+            if loop.time() >= next_refresh:
+                next_refresh = loop.time() + self.refresh_interval
+                loop.run_in_executor(self._executor, self.refresh_directory)
+                self.app.logger.info('syslog: %s', self.stats)
+
+    async def drain(self):
+        """Grava o que restou (encerramento)"""
+        self.flush()
+        if self._writes:
+            await asyncio.wait(list(self._writes))
+        self._executor.shutdown(wait=True)
+
+
+# ========== PROTOCOLOS (UDP E TCP) ==========
+
+class SyslogUDPProtocol(asyncio.DatagramProtocol):
+    """Um datagrama = uma mensagem"""
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+
+    def datagram_received(self, data, addr):
+        self.receiver.handle(data, addr[0])
+
+
+async def handle_tcp(receiver, reader, writer):
+    """
+    Conexão TCP (RFC 6587): quadros com contagem de octetos ('123 <34>1 ...')
+    ou mensagens separadas por quebra de linha.
+    """
+    address = writer.get_extra_info('peername')[0]
+    try:
+        while True:
+            first = await reader.read(1)
+            if not first:
+                break
+            if first.isdigit():
+                length = int(first + await reader.readuntil(b' '))
+                if length > MAX_MESSAGE_SIZE:
+                    receiver.stats['invalid'] += 1
+                    break
+                frame = await reader.readexactly(length)
+            else:
+                frame = first + await reader.readuntil(b'\n')
+            receiver.handle(frame, address)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+        # Conexão encerrada no meio de um quadro, ou quadro inválido
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(app, host, port, tcp=True):
+    """Escuta UDP (e TCP) até receber SIGINT/SIGTERM"""
+    receiver = SyslogReceiver(app)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(receiver._executor, receiver.load_directory)
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    udp = socket.socket(family, socket.SOCK_DGRAM)
+    udp.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER)
+    udp.bind((host, port))
+    transport, _ = await loop.create_datagram_endpoint(lambda: SyslogUDPProtocol(receiver), sock=udp)
+    server = None
+    if tcp:
+        server = await asyncio.start_server(lambda r, w: handle_tcp(receiver, r, w),
+                                            host, port, limit=MAX_MESSAGE_SIZE)
+    print(f'Recebendo syslog em {host}:{port} (UDP{" e TCP" if tcp else ""}); '
+          f'{len(receiver._devices)} dispositivo(s) cadastrado(s)')
+
+    await receiver.run_periodic(stop)
+    transport.close()
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    await receiver.drain()
+    print(f'Encerrado: {receiver.stats}')
+    return receiver.stats
+
+
+# ========== ENVIO DE TESTE ==========
+
+def send_messages(host, port, message, count=1, tcp=False, app_name='sshd'):
+    """
+    Envia mensagens RFC 5424 de teste (mensagens iniciadas por '<' vão como estão).
+
+    Returns:
+        float: Mensagens por segundo
+    """
+    hostname = socket.gethostname()
+    start = time.perf_counter()
+    if tcp:
+        sock = socket.create_connection((host, port))
+    else:
+        sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _ in range(count):
+            line = message if message.startswith('<') else (
+                f'<38>1 {datetime.now(brasilia_tz).isoformat()} {hostname} {app_name} - - - {message}')
+            data = line.encode()
+            if tcp:
+                sock.sendall(f'{len(data)} '.encode() + data)
+            else:
+                sock.sendto(data, (host, port))
+    finally:
+        sock.close()
+    return count / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Receptor de syslog do Sistema de Logs')
+    parser.add_argument('--host', help='Endereço de escuta/destino (padrão: SYSLOG_HOST)')
+    parser.add_argument('--port', type=int, help='Porta UDP/TCP (padrão: SYSLOG_PORT)')
+    parser.add_argument('--no-tcp', action='store_true', help='Escutar apenas UDP')
+    sub = parser.add_subparsers(dest='command')
+    send = sub.add_parser('send', help='Envia mensagens de teste para um receptor')
+    send.add_argument('message')
+    send.add_argument('--count', type=int, default=1)
+    send.add_argument('--tcp', action='store_true', help='Enviar por TCP (padrão: UDP)')
+    send.add_argument('--app-name', default='sshd')
+    args = parser.parse_args(argv)
+
+    if args.command == 'send':
+        from config import Config
+        host = args.host or Config.SYSLOG_HOST
+        if host in ('0.0.0.0', '::'):
+            host = '127.0.0.1'
+        rate = send_messages(host, args.port or Config.SYSLOG_PORT, args.message,
+                             args.count, args.tcp, args.app_name)
+        print(f'{args.count} mensagem(ns) enviada(s) ({rate:,.0f}/s)')
+        return
+
+    from app import create_app
+    app = create_app()
+    asyncio.run(serve(app, args.host or app.config['SYSLOG_HOST'], args.port or app.config['SYSLOG_PORT'],
+                      tcp=app.config['SYSLOG_TCP'] and not args.no_tcp))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+"""
+Configuração comum dos testes: os módulos da aplicação são importados pelo
+nome (app, models, ...), como quando executada a partir de sistema_logs/.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,134 @@
+"""
+Testes da listagem de logs (/logs e dashboard) sem N+1.
+
+A quantidade de comandos SQL por página não pode depender da quantidade de
+linhas exibidas: nomes de usuário e dispositivo vêm de uma consulta IN por
+tabela (with_names), não de um carregamento lazy por linha. Os testes rodam
+com o banco em memória, com e sem o bind separado de logs.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from blueprints.logs import log_listing_query, with_names
+from cache import dashboard_cache, permission_cache
+from config import TestingConfig, config
+from extensions import db
+from models import AccessLog, Device, DeviceType, User, UserRole
+
+
+class StatementCounter:
+    """Conta os comandos SQL executados em todas as engines da aplicação"""
+
+    def __init__(self):
+        self.count = 0
+        self._engines = list(db.engines.values())
+
+    def _before_cursor_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        for engine in self._engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self._engines:
+            event.remove(engine, 'before_cursor_execute', self._before_cursor_execute)
+
+
+@pytest.fixture(params=[False, True], ids=['banco-unico', 'bind-de-logs'])
+def make_app(request, monkeypatch):
+    """Cria aplicações de teste em memória com usuários, dispositivos e logs"""
+
+    class MemoryConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        SQLALCHEMY_BINDS = {'logs': 'sqlite://'} if request.param else {}
+        WTF_CSRF_ENABLED = False
+
+    monkeypatch.setitem(config, 'memory', MemoryConfig)
+    apps = []
+
+    def factory(rows):
+        app = create_app('memory')
+        with app.app_context():
+            db.session.add_all([
+                User(username='admin', email='admin@teste', role=UserRole.ADMIN,
+                     password_hash=generate_password_hash('admin123')),
+                User(username='bob', email='bob@teste', role=UserRole.USER,
+                     password_hash=generate_password_hash('bob')),
+                Device(name='srv-1', ip_address='10.0.0.1', device_type=DeviceType.SERVER),
+                Device(name='srv-2', ip_address='10.0.0.2', device_type=DeviceType.SERVER),
+            ])
+            db.session.commit()
+            start = datetime(2026, 10, 1, 12)
+            db.session.add_all([
+                AccessLog(user_id=1 + i % 2, device_id=(None, 1, 2)[i % 3], action='device_access',
+                          status='success', ip_address='10.0.0.9',
+                          access_time=start + timedelta(seconds=i))
+                for i in range(rows)
+            ])
+            db.session.commit()
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def statements_for(app, url):
+    """Comandos SQL de um GET autenticado como admin (depois de um aquecimento)"""
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    assert client.get(url).status_code == 200
+    with app.app_context():
+        dashboard_cache.clear()
+        permission_cache.clear()
+        with StatementCounter() as counter:
+            response = client.get(url)
+    assert response.status_code == 200
+    return counter.count
+
+
+@pytest.mark.parametrize('url', ['/logs?per_page=500', '/'])
+def test_statements_per_page_do_not_depend_on_rows(make_app, url):
+    few = statements_for(make_app(10), url)
+    many = statements_for(make_app(500), url)
+    assert few == many
+
+
+def test_logs_page_lists_names(make_app):
+    app = make_app(30)
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    html = client.get('/logs?per_page=500').get_data(as_text=True)
+    assert 'bob' in html and 'srv-1' in html and 'srv-2' in html
+
+
+def test_with_names_uses_one_query_per_table(make_app):
+    app = make_app(500)
+    with app.app_context():
+        rows = (log_listing_query(AccessLog.query)
+                .order_by(AccessLog.access_time, AccessLog.id).all())
+        names = {}
+        with StatementCounter() as counter:
+            logs = with_names(rows, names)
+        assert counter.count == 2  # usuários + dispositivos
+        assert len(logs) == 500
+        assert {log.username for log in logs} == {'admin', 'bob'}
+        assert {log.device_name for log in logs} == {None, 'srv-1', 'srv-2'}
+        assert all(log.device_name is None for log in logs if log.device_id is None)
+
+        # Lotes seguintes (exportação) reaproveitam os nomes já buscados
+        with StatementCounter() as counter:
+            with_names(rows[:100], names)
+        assert counter.count == 0
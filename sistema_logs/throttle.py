@@ -0,0 +1,225 @@
+"""
+Limitação de tentativas de login (janela deslizante).
+
+Conta falhas de login por nome de usuário e por IP de origem dentro de uma
+janela de tempo. Ao passar do limite, a chave fica bloqueada por um tempo que
+dobra a cada novo bloqueio consecutivo (backoff). Tentativas bloqueadas são
+rejeitadas antes de check_password_hash e antes de qualquer escrita no banco.
+
+Armazenamento:
+- Memória (padrão): contadores por processo, limitados a
+  LOGIN_THROTTLE_MAX_KEYS chaves (LRU)
+- SQLite (LOGIN_THROTTLE_STORAGE = caminho do arquivo): contadores
+  compartilhados entre workers, em um arquivo separado do banco principal.
+  A cada PURGE_EVERY falhas registradas por processo, falhas fora da janela
+  e bloqueios vencidos há mais de uma janela são apagados (de todas as
+  chaves), para o arquivo não crescer com ataques a muitos usuários/IPs
+
+Configurações (config.py): LOGIN_THROTTLE_ENABLED, LOGIN_THROTTLE_WINDOW,
+LOGIN_THROTTLE_MAX_PER_USER, LOGIN_THROTTLE_MAX_PER_IP,
+LOGIN_THROTTLE_LOCKOUT, LOGIN_THROTTLE_MAX_LOCKOUT, LOGIN_THROTTLE_STORAGE.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Falhas registradas (por processo) entre limpezas do armazenamento SQLite
+PURGE_EVERY = 1000
+
+
+class MemoryThrottleStore:
+    """Falhas e bloqueios em memória, por processo"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._failures = OrderedDict()  # chave -> deque de timestamps
+        self._locks = {}                # chave -> (bloqueado_até, nível)
+        self._lock = threading.Lock()
+
+    def add_failure(self, key, now, window):
+        """Registra uma falha e retorna quantas existem dentro da janela"""
+        with self._lock:
+            events = self._failures.pop(key, None) or deque()
+            events.append(now)
+            while events and events[0] <= now - window:
+                events.popleft()
+            self._failures[key] = events
+            while len(self._failures) > self.max_keys:
+                old_key, _ = self._failures.popitem(last=False)
+                self._locks.pop(old_key, None)
+            return len(events)
+
+    def get_lock(self, key):
+        """Retorna (bloqueado_até, nível) ou (0, 0) se nunca bloqueado"""
+        return self._locks.get(key, (0, 0))
+
+    def set_lock(self, key, until, level):
+        with self._lock:
+            self._locks[key] = (until, level)
+
+    def reset(self, key):
+        """Apaga falhas e bloqueios de uma chave (ex: login bem-sucedido)"""
+        with self._lock:
+            self._failures.pop(key, None)
+            self._locks.pop(key, None)
+
+
+class SqliteThrottleStore:
+    """Falhas e bloqueios em um arquivo SQLite compartilhado entre processos"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._added = 0  # falhas desde a última limpeza (aproximado entre threads)
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS throttle_failure (key TEXT NOT NULL, ts REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_throttle_failure_key_ts ON throttle_failure (key, ts)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_throttle_failure_ts ON throttle_failure (ts)')
+        conn.execute('CREATE TABLE IF NOT EXISTS throttle_lock '
+                     '(key TEXT PRIMARY KEY, until REAL NOT NULL, level INTEGER NOT NULL)')
+
+    def _conn(self):
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add_failure(self, key, now, window):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM throttle_failure WHERE key = ? AND ts <= ?', (key, now - window))
+            conn.execute('INSERT INTO throttle_failure (key, ts) VALUES (?, ?)', (key, now))
+            count = conn.execute('SELECT COUNT(*) FROM throttle_failure WHERE key = ?', (key,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._added += 1
+        if self._added >= PURGE_EVERY:
+            self._added = 0
+            self.purge(now, window)
+        return count
+
+    def purge(self, now, window):
+        """
+        Apaga falhas fora da janela e bloqueios vencidos há mais de uma janela
+        (nível de backoff já voltaria a zero), de todas as chaves.
+        """
+        conn = self._conn()
+        conn.execute('DELETE FROM throttle_failure WHERE ts <= ?', (now - window,))
+        conn.execute('DELETE FROM throttle_lock WHERE until < ?', (now - window,))
+
+    def get_lock(self, key):
+        row = self._conn().execute('SELECT until, level FROM throttle_lock WHERE key = ?', (key,)).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def set_lock(self, key, until, level):
+        self._conn().execute(
+            'INSERT INTO throttle_lock (key, until, level) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET until = excluded.until, level = excluded.level',
+            (key, until, level))
+
+    def reset(self, key):
+        conn = self._conn()
+        conn.execute('DELETE FROM throttle_failure WHERE key = ?', (key,))
+        conn.execute('DELETE FROM throttle_lock WHERE key = ?', (key,))
+
+
+class LoginThrottle:
+    """
+    Limitador de tentativas de login por usuário e por IP.
+    Segue o padrão das extensões Flask (instância no módulo + init_app).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.store = MemoryThrottleStore()
+        self._lock = threading.Lock()
+        self.stats = {'checked': 0, 'rejected': 0, 'failures': 0, 'lockouts': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lê limites e tipo de armazenamento da configuração"""
+        self.enabled = app.config.get('LOGIN_THROTTLE_ENABLED', True)
+        self.window = app.config.get('LOGIN_THROTTLE_WINDOW', 300)
+        self.max_per_user = app.config.get('LOGIN_THROTTLE_MAX_PER_USER', 5)
+        self.max_per_ip = app.config.get('LOGIN_THROTTLE_MAX_PER_IP', 20)
+        self.lockout = app.config.get('LOGIN_THROTTLE_LOCKOUT', 60)
+        self.max_lockout = app.config.get('LOGIN_THROTTLE_MAX_LOCKOUT', 3600)
+        storage = app.config.get('LOGIN_THROTTLE_STORAGE')
+        if storage:
+            self.store = SqliteThrottleStore(storage)
+        else:
+            self.store = MemoryThrottleStore(app.config.get('LOGIN_THROTTLE_MAX_KEYS', 100000))
+        app.extensions['login_throttle'] = self
+
+    @staticmethod
+    def _keys(username, ip_address):
+        """Chaves contadas: usuário (sem diferenciar maiúsculas) e IP"""
+        return (f'user:{(username or "").strip().lower()}', f'ip:{ip_address or "-"}')
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def retry_after(self, username, ip_address, now=None):
+        """
+        Verifica se a tentativa deve ser rejeitada (operação barata, sem banco).
+
+        Returns:
+            int: Segundos até a liberação (0 se a tentativa é permitida)
+        """
+        if not self.enabled:
+            return 0
+        now = now or time.time()
+        self._count('checked')
+        remaining = max(self.store.get_lock(key)[0] - now for key in self._keys(username, ip_address))
+        if remaining > 0:
+            self._count('rejected')
+            return int(remaining) + 1
+        return 0
+
+    def record_failure(self, username, ip_address, now=None):
+        """
+        Registra uma falha de login e bloqueia as chaves que passaram do limite.
+        O tempo de bloqueio dobra a cada bloqueio seguido, até o máximo.
+
+        Returns:
+            list: Chaves bloqueadas por esta falha (vazia se nenhuma)
+        """
+        if not self.enabled:
+            return []
+        now = now or time.time()
+        self._count('failures')
+        locked = []
+        user_key, ip_key = self._keys(username, ip_address)
+        for key, limit in ((user_key, self.max_per_user), (ip_key, self.max_per_ip)):
+            if self.store.add_failure(key, now, self.window) < limit:
+                continue
+            until, level = self.store.get_lock(key)
+            if until > now:
+                continue
+            # Nível volta a zero se o último bloqueio terminou há mais de uma janela
+            level = level + 1 if now - until < self.window else 1
+            duration = min(self.lockout * 2 ** (level - 1), self.max_lockout)
+            self.store.set_lock(key, now + duration, level)
+            self._count('lockouts')
+            locked.append(key)
+        return locked
+
+    def record_success(self, username):
+        """Zera falhas e bloqueios do usuário após login bem-sucedido"""
+        if self.enabled:
+            self.store.reset(self._keys(username, None)[0])
+
+
+# Instância única usada por auth.login (inicializada em create_app)
+login_throttle = LoginThrottle()